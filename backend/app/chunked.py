@@ -0,0 +1,289 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dedup import row_hashes
+from .encoders import encode_method, vocabulary_from_counts
+from .jobs import report
+from .kernels import ScaleAccumulator, _py, impute_method, robust_params, scale_method
+from .pipeline import expands, optimize, plan_entry, run_step, step_reads, step_writes, validate
+from .sketches import FrequentItems, QuantileSketch
+from .transforms import HISTORY_ACTIONS, fit_step, needs_fit
+
+logger = logging.getLogger("dataprepper")
+
+# Distinct values a median or mode fit counts exactly; past it the fit falls back to a
+# sketch (KLL quantiles, frequent items) so memory stays bounded on unique-valued columns
+EXACT_DISTINCT_LIMIT = 100_000
+
+# A fresh iterator of row chunks on every call (each pass re-reads the source)
+ChunkSource = Callable[[], Iterable[pd.DataFrame]]
+
+
+class ColumnAggregate:
+    """Mergeable statistics of one column, updated chunk by chunk.
+
+    Moments (count, mean, M2) merge exactly with Chan's formula; value counts are
+    exact and, when `bounded`, give way to sketches past EXACT_DISTINCT_LIMIT.
+    """
+
+    def __init__(self, name: str, moments: bool = False, counts: bool = False, bounded: bool = False):
+        self.name = name
+        self.moments = moments
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min: Any = None
+        self.max: Any = None
+        self.counts: Optional[pd.Series] = pd.Series(dtype='float64') if counts else None
+        self.bounded = bounded
+        self.quantiles: Optional[QuantileSketch] = None
+        self.frequent: Optional[FrequentItems] = None
+
+    def update(self, col: pd.Series):
+        values = col.dropna()
+        if self.moments and len(values):
+            if not pd.api.types.is_numeric_dtype(values.dtype):
+                raise ValueError(f"Column '{self.name}' is not numeric")
+            x = values.to_numpy(dtype='float64')
+            n, mean = len(x), float(x.mean())
+            self._merge_moments(n, mean, float(((x - mean) ** 2).sum()))
+            low, high = values.min(), values.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        if self.quantiles is not None:
+            self.quantiles.update(values.to_numpy(dtype='float64'))
+            self.frequent.update(values)
+        elif self.counts is not None:
+            self.counts = self.counts.add(values.value_counts(), fill_value=0)
+            if self.bounded and len(self.counts) > EXACT_DISTINCT_LIMIT:
+                self._to_sketches()
+
+    def _merge_moments(self, n: int, mean: float, m2: float):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def _to_sketches(self):
+        logger.warning(f"chunked fit: '{self.name}' has over {EXACT_DISTINCT_LIMIT} distinct values; using sketches")
+        self.frequent = FrequentItems()
+        self.frequent.counts = {key: int(cnt) for key, cnt in self.counts.items()}
+        self.frequent.merge(FrequentItems())  # merging trims the summary to capacity
+        self.quantiles = QuantileSketch()
+        if pd.api.types.is_numeric_dtype(self.counts.index.dtype):
+            for start in range(0, len(self.counts), EXACT_DISTINCT_LIMIT):
+                part = self.counts.iloc[start:start + EXACT_DISTINCT_LIMIT]
+                self.quantiles.update(np.repeat(part.index.to_numpy(dtype='float64'), part.to_numpy(dtype='int64')))
+        self.counts = None
+
+    def std(self) -> float:
+        # Population std, as transforms.fit_step computes it
+        return (self.m2 / self.count) ** 0.5 if self.count else float('nan')
+
+    def quantile(self, q: float):
+        """Quantile with linear interpolation between neighbouring values, like Series.quantile."""
+        if self.quantiles is not None:
+            return self.quantiles.quantile(q)
+        if self.counts is None or not len(self.counts):
+            return float('nan')
+        counts = self.counts.sort_index()
+        cum = counts.cumsum().to_numpy()
+        position = (int(cum[-1]) - 1) * q
+        below = int(position)
+        lower = counts.index[int(np.searchsorted(cum, below, side='right'))]
+        upper = counts.index[int(np.searchsorted(cum, min(below + 1, int(cum[-1]) - 1), side='right'))]
+        return float(lower + (upper - lower) * (position - below))
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def mode(self):
+        if self.frequent is not None:
+            return self.frequent.top(1)[0][0]
+        if self.counts is None or not len(self.counts):
+            return None
+        # Ties go to the smallest value, like Series.mode()[0]
+        return _sorted(self.counts.index[self.counts == self.counts.max()])[0]
+
+
+def _sorted(values) -> List[Any]:
+    values = list(values)
+    try:
+        return sorted(values)
+    except TypeError:
+        return values
+
+
+def _aggregates(step):
+    """The aggregates one step's fit needs: per column, or one accumulator for a scaler."""
+    action = step['action']
+    if action == 'impute':
+        method = impute_method(step['params'])
+        return {col: ColumnAggregate(col, moments=method == 'mean', counts=method != 'mean', bounded=True)
+                for col in step['columns']}
+    if action == 'encode':
+        encode_method(step['params'])
+        return {col: ColumnAggregate(col, counts=True) for col in step['columns']}
+    method = scale_method(step['params'])
+    if method == 'robust':
+        return {col: ColumnAggregate(col, counts=True, bounded=True) for col in step['columns']}
+    return ScaleAccumulator(step['columns'], method)
+
+
+def _gather(aggregates, chunk: pd.DataFrame):
+    if isinstance(aggregates, ScaleAccumulator):
+        aggregates.update(chunk)
+        return
+    for col, agg in aggregates.items():
+        agg.update(chunk[col])
+
+
+def _finish(step, aggregates):
+    """Fitted values in the form transforms.fit_step produces."""
+    action = step['action']
+    if action == 'impute':
+        finish = {'mean': lambda a: a.mean if a.count else float('nan'), 'median': ColumnAggregate.median,
+                  'mode': ColumnAggregate.mode}[impute_method(step['params'])]
+        step['fitted'] = {'values': {col: _py(finish(agg)) for col, agg in aggregates.items()}}
+    elif action == 'encode':
+        vocabularies = {col: vocabulary_from_counts(agg.counts, step['params']) for col, agg in aggregates.items()}
+        step['fitted'] = {'categories': {col: v['categories'] for col, v in vocabularies.items()}}
+        if encode_method(step['params']) in ('frequency', 'count'):
+            step['fitted']['counts'] = {col: v['counts'] for col, v in vocabularies.items()}
+    elif isinstance(aggregates, ScaleAccumulator):
+        step['fitted'] = {'params': aggregates.fitted()}
+    else:
+        step['fitted'] = {'params': {col: robust_params(agg.quantile(0.25), agg.median(), agg.quantile(0.75))
+                                     for col, agg in aggregates.items()}}
+
+
+class StreamingDedup:
+    """drop_duplicates(keep='first') across chunks, remembering a 64-bit hash per distinct row.
+
+    The hashes are held in a set, so each chunk costs time in its own length rather than
+    in the number of rows seen so far; memory grows with the number of distinct rows, not
+    with chunk size. keep='last'/'none' depend on rows not read yet; crud.drop_duplicates
+    handles those with two passes (see dedup.find_duplicates).
+    """
+
+    def __init__(self, subset: Optional[List[str]] = None, keep: str = 'first'):
+        if keep != 'first':
+            raise ValueError(f"keep='{keep}' is not supported when streaming a pipeline; use keep='first'")
+        self.subset = subset or None
+        self.seen: set = set()
+
+    def __call__(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        hashes = row_hashes(chunk, self.subset)
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        keep &= np.fromiter((h not in self.seen for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        self.seen.update(hashes[keep].tolist())
+        return chunk[keep]
+
+
+def _dedup(step) -> StreamingDedup:
+    return StreamingDedup(step['columns'], step['params'].get('keep', 'first'))
+
+
+def _stage(steps, pending) -> List[Tuple[int, str]]:
+    """What one pass does: ('apply', i) for fitted steps, ('gather', i) for steps fitted in this
+    pass; stops before the first step whose input depends on a step not fitted yet."""
+    actions, blocked = [], set()
+    for i, step in enumerate(steps):
+        reads = step_reads(step)
+        if blocked and (reads is None or reads & blocked or step_writes(step) & blocked):
+            break
+        if i in pending:
+            actions.append((i, 'gather'))
+            blocked |= step_writes(step)
+            if expands(step):
+                break  # later column names depend on its vocabulary
+        else:
+            actions.append((i, 'apply'))
+    last = max(n for n, (_, kind) in enumerate(actions) if kind == 'gather')
+    return actions[:last + 1]
+
+
+def fit_chunked(chunks: ChunkSource, steps: List[Dict[str, Any]]) -> int:
+    """Fit `steps` from row chunks with mergeable aggregates; returns the passes made.
+
+    Each pass applies the steps fitted so far and gathers statistics for every step
+    whose input does not depend on a step still unfitted, so a typical pipeline is
+    fitted in one pass (a scaler after an imputation of the same column takes two).
+    """
+    for step in steps:
+        if step['action'] in HISTORY_ACTIONS and not needs_fit(step):
+            fit_step(None, step)
+    pending = {i for i, step in enumerate(steps) if needs_fit(step)}
+    passes = 0
+    while pending:
+        stage = _stage(steps, pending)
+        aggregates = {i: _aggregates(steps[i]) for i, kind in stage if kind == 'gather'}
+        dedup = {i: _dedup(steps[i]) for i, kind in stage if steps[i]['action'] == 'drop_duplicates'}
+        passes += 1
+        for chunk in chunks():
+            report(f'fit pass {passes}', advance=len(chunk))
+            for i, kind in stage:
+                if kind == 'gather':
+                    _gather(aggregates[i], chunk)
+                elif i in dedup:
+                    chunk = dedup[i](chunk)
+                else:
+                    chunk = run_step(chunk, steps[i])[0]
+        for i, aggs in aggregates.items():
+            _finish(steps[i], aggs)
+        pending -= set(aggregates)
+    return passes
+
+
+def transform_chunks(chunks: Iterable[pd.DataFrame], plan: List[Dict[str, Any]],
+                     stats: Optional[List[Dict[str, Any]]] = None) -> Iterator[pd.DataFrame]:
+    """Apply fitted `plan` steps to each chunk in turn (one streaming pass).
+
+    With `stats` (one dict per step), time spent, rows out and the last note are accumulated.
+    """
+    dedup = {i: _dedup(step) for i, step in enumerate(plan) if step['action'] == 'drop_duplicates'}
+    for chunk in chunks:
+        report('transform', advance=len(chunk))
+        for i, step in enumerate(plan):
+            began = time.perf_counter()
+            if i in dedup:
+                chunk, note = dedup[i](chunk), None
+            else:
+                chunk, note = run_step(chunk, step)
+            if stats is not None:
+                stats[i]['seconds'] += time.perf_counter() - began
+                stats[i]['rows'] += len(chunk)
+                stats[i]['note'] = note
+        yield chunk
+
+
+def run_pipeline_chunked(chunks: ChunkSource, steps: List[Dict[str, Any]], optimized: bool = True,
+                         rows: int = 5) -> Tuple[pd.DataFrame, int, Dict[str, Any]]:
+    """pipeline.run_pipeline out of core: fit passes, then one transform pass over chunks.
+
+    Only the first `rows` result rows are kept; returns them, the result's row count
+    and the same report as run_pipeline (with the number of passes).
+    """
+    start = time.perf_counter()
+    columns = list(next(iter(chunks())).columns)
+    validate(steps, columns)
+    passes = fit_chunked(chunks, steps)
+    fitted = time.perf_counter()
+    plan, removed = optimize(steps, columns) if optimized else (steps, [])
+    stats = [{'seconds': 0.0, 'rows': 0, 'note': None} for _ in plan]
+    head, n_rows = [], 0
+    for chunk in transform_chunks(chunks(), plan, stats):
+        if n_rows < rows:
+            head.append(chunk.head(rows - n_rows))
+        n_rows += len(chunk)
+    done = time.perf_counter()
+    logger.info(f"chunked pipeline: {len(steps)} steps as {len(plan)}, {passes} fit passes, {done - start:.3f}s")
+    result = pd.concat(head, ignore_index=True) if head else pd.DataFrame(columns=columns)
+    return result, n_rows, {
+        'plan': [plan_entry(step, s['note'], s['rows'], s['seconds']) for step, s in zip(plan, stats)],
+        'removed': removed, 'passes': passes + 1,
+        'timings': {'fit_ms': round((fitted - start) * 1000, 3), 'run_ms': round((done - fitted) * 1000, 3)},
+    }
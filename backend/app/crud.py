@@ -1,170 +1,347 @@
+import numpy as np
 import pandas as pd
 from typing import Tuple, List, Any, Dict
 from io import TextIOBase, BufferedReader
 import uuid
 import hashlib
+import json
 import time
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from .history import Snapshot, SessionHistory
+from .transforms import make_step, fit_step, apply_step, needs_fit
+from .profiling import profile_frame
+from .sketches import approximate_stats, frame_chunks, SKETCH_CHUNK_ROWS
+from .sampling import sample_csv
+from . import ingest
+from .filters import IndexCache, Query, mask, parse_where, where_from_params
+from .pipeline import make_pipeline, run_pipeline, to_artifact, from_artifact, required_columns
+from .chunked import fit_chunked, run_pipeline_chunked
+from .dedup import drop_rows, find_duplicates
+from .export import export_chunks, validate_format, EXPORT_CHUNK_ROWS
+from .store import SESSION_BACKEND, MemoryBudget, open_store, open_metadata
+from .executor import run_stateless
+from .jobs import current_job, report, share_state
 
-dropped_columns_cache: Dict[str, Dict[str, list]] = {}
-# Session history: session_id -> list of DataFrame CSV strings (stack)
-session_history = {}
+DATA_DIR = os.environ.get('DATAPREPPER_DATA_DIR', os.path.join(tempfile.gettempdir(), 'dataprepper'))
+# Datasets, histories and dropped columns share one memory budget; least recently used
+# entries spill to disk and idle ones expire. With DATAPREPPER_SESSION_BACKEND=shared they
+# live in DATA_DIR/shared instead, so every uvicorn worker sees every session (see store.py).
+memory_budget = MemoryBudget()
 
-# Helper to serialize DataFrame to CSV string
-def df_to_csv_str(df):
-    from io import StringIO
-    buf = StringIO()
-    df.to_csv(buf, index=False)
-    return buf.getvalue()
+def _forget_session(session_id):
+    stats_cache.pop(session_id, None)
+    sort_cache.pop(session_id, None)
+    column_indexes.pop(session_id, None)
+    query_cache.pop(session_id, None)
+    session_locks.pop(session_id, None)
+    session_datasets.pop(session_id, None)
 
-# Helper to load DataFrame from CSV string
-def df_from_csv_str(csv_str):
-    from io import StringIO
-    return pd.read_csv(StringIO(csv_str))
+def _forget_dataset(dataset_id):
+    column_indexes.pop(dataset_id, None)
+    dataset_samples.pop(dataset_id, None)
+    path = dataset_files.pop(dataset_id, None)
+    if path and os.path.exists(path):
+        os.remove(path)
 
-def preview_csv(file: BufferedReader, rows: int) -> Tuple[List[str], List[List[Any]]]:
-    """Read first `rows` lines from CSV file-like and return columns and row data."""
+# Dropped columns: op_id -> Snapshot of the dropped columns (typed, not Python lists)
+dropped_columns_cache = open_store('dropped', memory_budget, DATA_DIR)
+# Session history: session_id -> operation log with checkpoints (undo/redo)
+session_history = open_store('session', memory_budget, DATA_DIR, on_expire=_forget_session)
+# Dataset registry: dataset_id -> Snapshot of the parsed upload (uploaded once, shared by reference)
+datasets = open_store('dataset', memory_budget, DATA_DIR, on_expire=_forget_dataset)
+# Session -> dataset_id the session was created from
+session_datasets = open_metadata('session_datasets', DATA_DIR)
+if SESSION_BACKEND == 'shared':
+    # Any worker can then poll, cancel and fetch a job, not only the one running it
+    share_state(open_metadata('jobs', DATA_DIR))
+# Column stats cache: session_id -> {column version: stats}, least recently used first.
+# Unchanged columns keep their version across steps, so only touched columns are recomputed.
+stats_cache: Dict[str, "OrderedDict[str, dict]"] = {}
+# Roughly how many full states' worth of column stats a session keeps
+STATS_CACHE_STATES = 10
+# Sort permutations for /rows: session_id -> {(column version, descending): row numbers},
+# least recently used first; a column keeps its permutation until a step changes it
+sort_cache: Dict[str, "OrderedDict[Tuple[str, bool], Any]"] = {}
+SORT_CACHE_COLUMNS = 8
+# Filter indexes: session or dataset id -> IndexCache of ColumnIndex per column version,
+# built lazily by the first filter on a column and kept until a step changes the column
+column_indexes: Dict[str, IndexCache] = {}
+# Matching rows of recent /rows filters: session_id -> {(expression, versions, sort): row numbers},
+# so scrolling through a filtered view evaluates the filter once
+query_cache: Dict[str, "OrderedDict[Tuple[str, ...], Any]"] = {}
+QUERY_CACHE_ENTRIES = 4
+# Largest window /rows serves at once
+MAX_WINDOW_ROWS = 10_000
+# Requests run on executor threads: those on one session take turns, other sessions run in parallel
+session_locks: Dict[str, threading.Lock] = {}
+_session_locks_guard = threading.Lock()
+# Sampled datasets: dataset_id -> sample description, and the spooled full upload for export
+dataset_samples = open_metadata('dataset_samples', DATA_DIR)
+dataset_files = open_metadata('dataset_files', DATA_DIR)
+# Rows per chunk when a job parses a whole upload
+LOAD_CHUNK_ROWS = 100_000
+# Uploads at least this large are processed out of core: read in LOAD_CHUNK_ROWS chunks,
+# fitted with mergeable aggregates and previewed from the first matching chunks
+CHUNKED_MIN_BYTES = int(float(os.environ.get('DATAPREPPER_CHUNKED_MB', 256)) * 1024 * 1024)
+# Fitted pipelines saved from sessions, one JSON file each; they outlive sessions and
+# restarts so the same preparation can be replayed on new files
+PIPELINE_DIR = os.path.join(DATA_DIR, 'pipelines')
+
+def register_dataset(file, sample_size=None, seed=0, stratify_by=None, delimiter=None, encoding=None,
+                     compact=None) -> Tuple[str, pd.DataFrame]:
+    """Parse an uploaded CSV once and keep the frame in memory under a new dataset_id.
+
+    With `sample_size`, only a uniform (or `stratify_by`-stratified) row sample taken in
+    one streaming pass is kept in memory; the full upload is spooled to disk for export.
+    Compressed uploads are read transparently; delimiter and encoding are sniffed unless given.
+    With `compact` (default DATAPREPPER_COMPACT_DTYPES, off) integers and text get smaller dtypes.
+    """
+    dataset_id = str(uuid.uuid4())
+    if sample_size:
+        df, total_rows = sample_csv(file, sample_size, seed, stratify_by, delimiter=delimiter, encoding=encoding)
+        dataset_samples[dataset_id] = {
+            'sample_size': len(df), 'total_rows': total_rows, 'seed': seed, 'stratify_by': stratify_by,
+        }
+        dataset_files[dataset_id] = spool_upload(file, dataset_id)
+    else:
+        df = ingest.read_csv(file, delimiter=delimiter, encoding=encoding)
+    if ingest.COMPACT_DTYPES if compact is None else compact:
+        df = ingest.compact_frame(df)
+    datasets[dataset_id] = Snapshot.from_frame(df)
+    return dataset_id, df
+
+def spool_upload(file, dataset_id) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"{dataset_id}.csv")
+    file.seek(0)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(file, out)
+    return path
+
+def sample_info(dataset_id=None, session_id=None):
+    """Sample description if the dataset (or the session's dataset) is a sample, else None."""
+    if dataset_id is None and session_id is not None:
+        dataset_id = session_datasets.get(session_id)
+    return dataset_samples.get(dataset_id) if dataset_id else None
+
+def get_dataset(dataset_id: str) -> pd.DataFrame:
+    return dataset_snapshot(dataset_id).to_frame()
+
+def dataset_snapshot(dataset_id: str) -> Snapshot:
+    snapshot = datasets.get(dataset_id)
+    if snapshot is None:
+        raise ValueError(f"Unknown dataset_id: {dataset_id}")
+    return snapshot
+
+def load_frame(source, nrows=None) -> pd.DataFrame:
+    """Return a DataFrame for `source`: a registered DataFrame or a CSV file-like."""
+    if source is None:
+        raise ValueError("No data source: provide a file or dataset_id.")
+    if isinstance(source, pd.DataFrame):
+        df = source if nrows is None else source.head(nrows)
+        # Shallow copy: column assignments never write through to the registered frame
+        return df.copy(deep=False)
+    if nrows is None and current_job() is not None:
+        # Inside a job: parse in chunks so progress is reported and cancel takes effect
+        chunks = []
+        for chunk in ingest.iter_csv(source, LOAD_CHUNK_ROWS):
+            report('parse', advance=len(chunk))
+            chunks.append(chunk)
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    return ingest.read_csv(source, nrows=nrows)
+
+def preview_csv(file: BufferedReader, rows: int) -> pd.DataFrame:
+    """First `rows` rows of a CSV file-like (or registered frame).
+
+    Like every preview function, this returns the typed slice; serialize.py turns it
+    into JSON or Arrow, sanitizing only these rows.
+    """
     # pandas can read file-like objects directly
-    df = pd.read_csv(file, nrows=rows)
-    columns = df.columns.tolist()
-    data = df.values.tolist()
-    return columns, data
+    return load_frame(file, nrows=rows)
 
-def impute_missing(file, columns, method, value=None, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    for col in columns:
-        if method == 'mean':
-            df[col] = df[col].fillna(df[col].mean())
-        elif method == 'median':
-            df[col] = df[col].fillna(df[col].median())
-        elif method == 'mode':
-            df[col] = df[col].fillna(df[col].mode()[0])
-        elif method == 'constant':
-            df[col] = df[col].fillna(value)
-        else:
-            raise ValueError(f"Unknown imputation method: {method}")
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
-
-def encode_categorical(file, columns, method, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    if method == 'onehot':
-        df = pd.get_dummies(df, columns=columns)
-    elif method == 'ordinal':
-        for col in columns:
-            df[col] = df[col].astype('category').cat.codes
+def is_chunked(source) -> bool:
+    """True if `source` is an upload large enough to process chunk by chunk."""
+    return source is not None and not isinstance(source, pd.DataFrame) and ingest.file_size(source) >= CHUNKED_MIN_BYTES
+
+def chunk_source(source, columns=None, chunk_rows=LOAD_CHUNK_ROWS):
+    """Callable returning a fresh iterator of row chunks of `source` (optionally only `columns`)."""
+    if isinstance(source, pd.DataFrame):
+        frame = source if columns is None else source[list(columns)]
+        return lambda: frame_chunks(frame, chunk_rows)
+    return lambda: ingest.iter_csv(source, chunk_rows, usecols=list(columns) if columns is not None else None)
+
+def head_of(chunks, rows) -> pd.DataFrame:
+    """First `rows` rows of a chunk stream, reading no further than needed."""
+    parts, kept = [], 0
+    for chunk in chunks:
+        parts.append(chunk.head(rows - kept))
+        kept += len(parts[-1])
+        if kept >= rows:
+            break
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def load_columns(source, columns) -> pd.DataFrame:
+    """Full data for `columns` only; fitting a step never needs the rest of the file."""
+    if isinstance(source, pd.DataFrame):
+        return source[list(columns)]
+    return ingest.read_csv(source, usecols=list(columns))
+
+def lazy_preview(source, action, columns, params, rows=5, versions=None):
+    """Preview a single step by transforming only the first `rows` rows.
+
+    The full data is read only for the columns whose global statistics the step
+    needs (mean/median/mode fill, category vocabulary, scaler parameters).
+    `versions` (a registered dataset's column versions) lets vocabularies be reused.
+    """
+    step = make_step(action, columns, params)
+    if needs_fit(step) and is_chunked(source):
+        fit_chunked(chunk_source(source, step['columns']), [step])
     else:
-        raise ValueError(f"Unknown encoding method: {method}")
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+        fit_step(load_columns(source, step['columns']) if needs_fit(step) else None, step, versions)
+    df, _, _ = apply_step(load_frame(source, nrows=rows), step)
+    return df
+
+def impute_missing(file, columns, method, value=None, rows=5):
+    return lazy_preview(file, 'impute', columns, {'method': method, 'value': value}, rows)
+
+def encode_categorical(file, columns, method, rows=5, top_k=None, n_features=None, dataset_id=None):
+    params = {'method': method}
+    if top_k is not None:
+        params['top_k'] = int(top_k)
+    if n_features is not None:
+        params['n_features'] = int(n_features)
+    versions = dataset_snapshot(dataset_id).versions if dataset_id else None
+    return lazy_preview(file, 'encode', columns, params, rows, versions)
 
 def scale_numeric(file, columns, method, rows=5):
-    import pandas as pd
-    import numpy as np
-    from sklearn.preprocessing import MinMaxScaler, StandardScaler
-    df = pd.read_csv(file)
-    scaler = MinMaxScaler() if method == 'minmax' else StandardScaler()
-    df[columns] = scaler.fit_transform(df[columns])
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+    return lazy_preview(file, 'scale', columns, {'method': method}, rows)
 
 def drop_columns(file, columns, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    df = df.drop(columns=columns)
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+    return lazy_preview(file, 'drop', columns, {}, rows)
 
 def drop_columns_with_cache(file, columns, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    dropped = {col: df[col].tolist() for col in columns if col in df.columns}
-    df = df.drop(columns=columns)
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
+    df = load_frame(file)
+    dropped = Snapshot.from_frame(df[[col for col in columns if col in df.columns]])
+    preview = df.drop(columns=columns).head(rows)
     op_id = str(uuid.uuid4())
     dropped_columns_cache[op_id] = dropped
-    return preview.columns.tolist(), preview.values.tolist(), op_id
+    return preview, op_id
 
 def restore_dropped_columns(file, op_id, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
+    df = load_frame(file)
     dropped = dropped_columns_cache.get(op_id)
-    if not dropped:
+    if not dropped or not dropped.columns:
         raise ValueError("No dropped columns found for this operation ID.")
-    for col, data in dropped.items():
+    for col in dropped.columns:
+        data = dropped.data[col]
         # Restore only if lengths match
         if len(data) == len(df):
-            df[col] = data
+            # Positional, like the list restore; .array keeps the column's dtype
+            df[col] = data.array
         else:
             raise ValueError(f"Cannot restore column '{col}': row count mismatch.")
-    for col in dropped:
-        if col not in df.columns:
-            df[col] = dropped[col]
-    # Convert NaN/inf/-inf to None for JSON serialization
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
-
-def filter_rows(file, column, value=None, min_value=None, max_value=None, regex=None, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    if value is not None:
-        df = df[df[column] == value]
-    if min_value is not None:
-        df = df[df[column] >= min_value]
-    if max_value is not None:
-        df = df[df[column] <= max_value]
-    if regex is not None:
-        df = df[df[column].astype(str).str.contains(regex, na=False)]
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+    return df.head(rows)
+
+def query_snapshot(owner_id, snapshot: Snapshot, where) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Row numbers of `snapshot` matching a filter expression, and the plan that found them.
+
+    Conditions are answered from the owner's (session's or dataset's) column indexes,
+    which are built on first use and shared by every later filter on the same columns.
+    """
+    indexes = column_indexes.setdefault(owner_id, IndexCache())
+
+    def index_of(column):
+        if column not in snapshot.data:
+            raise ValueError(f"Unknown filter column: {column}")
+        return indexes.get(snapshot.versions[column], snapshot.data[column])
+
+    query = Query(index_of, len(snapshot))
+    return query.rows(where), query.plan
+
+def filter_rows(file, column=None, value=None, min_value=None, max_value=None, regex=None, rows=5,
+                where=None, dataset_id=None):
+    """Preview of the rows matching the conditions on `column`, or a compound `where` expression.
+
+    A registered dataset is filtered through its column indexes; uploads are scanned.
+    Returns the preview and the number of matching rows (None when only the head was read).
+    """
+    where = parse_where(where) if where is not None else where_from_params(column, value, min_value, max_value, regex)
+    if dataset_id is not None:
+        matched, _ = query_snapshot(dataset_id, dataset_snapshot(dataset_id), where)
+        return dataset_snapshot(dataset_id).take(matched[:rows]).reset_index(drop=True), len(matched)
+    if is_chunked(file):
+        return head_of((chunk[mask(where, chunk)] for chunk in chunk_source(file)()), rows).head(rows), None
+    df = load_frame(file)
+    df = df[mask(where, df)]
+    return df.head(rows), len(df)
 
 def rename_columns(file, rename_map, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    df = df.rename(columns=rename_map)
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+    return lazy_preview(file, 'rename', [], {'rename_map': rename_map}, rows)
 
 def change_dtypes(file, dtype_map, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    for col, dtype in dtype_map.items():
-        if dtype == 'datetime':
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-        else:
-            df[col] = df[col].astype(dtype, errors='ignore')
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
-
-def drop_duplicates(file, subset=None, rows=5):
-    import pandas as pd
-    import numpy as np
-    df = pd.read_csv(file)
-    if subset:
-        df = df.drop_duplicates(subset=subset)
+    return lazy_preview(file, 'change_dtypes', list(dtype_map), {'dtype_map': dtype_map}, rows)
+
+def drop_duplicates(file, subset=None, rows=5, keep='first', verify=False):
+    """Preview of the rows left after dropping duplicates, and the duplicate report.
+
+    Duplicates are found from vectorized row hashes of the `subset` columns only (see
+    dedup.py), chunk by chunk for large uploads; the preview then reads just the first
+    surviving rows.
+    """
+    if is_chunked(file):
+        drop, summary = find_duplicates(chunk_source(file, subset), subset, keep, verify)
+        return head_of(drop_rows(chunk_source(file)(), drop), rows), summary
+    df = load_frame(file)
+    drop, summary = find_duplicates(lambda: [df], subset, keep, verify)
+    return next(drop_rows([df], drop)).head(rows), summary
+
+def duplicate_stats(file=None, session_id=None, subset=None, verify=False):
+    """Duplicate count and ratio of a session's current state, a registered dataset or an
+    upload, without dropping anything (see dedup.find_duplicates)."""
+    if session_id is not None and session_id in session_history:
+        with session_lock(session_id):
+            frame = session_history[session_id].state().to_frame()
+    elif session_id is not None and session_id in session_datasets:
+        frame = get_dataset(session_datasets[session_id])
+    elif is_chunked(file):
+        return find_duplicates(chunk_source(file, subset), subset, verify=verify)[1]
     else:
-        df = df.drop_duplicates()
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    return preview.columns.tolist(), preview.values.tolist()
+        frame = load_frame(file)
+    return find_duplicates(lambda: [frame], subset, verify=verify)[1]
+
+def pipeline_preview(source, steps, optimized=True, rows=5):
+    """Run an ordered list of steps in one pass over the parsed source (see pipeline.py);
+    large uploads are fitted and transformed chunk by chunk instead (see chunked.py).
+
+    Returns the preview rows, the result's row count and the executed plan with timings.
+    """
+    start = time.perf_counter()
+    if is_chunked(source):
+        # Parsing is interleaved with the passes over the file
+        df, n_rows, summary = run_pipeline_chunked(chunk_source(source), make_pipeline(steps), optimized, rows)
+        parsed = start
+    else:
+        df = load_frame(source)
+        parsed = time.perf_counter()
+        df, summary = run_pipeline(df, make_pipeline(steps), optimized)
+        n_rows = len(df)
+    summary['timings'] = {'parse_ms': round((parsed - start) * 1000, 3), **summary['timings'],
+                          'total_ms': round((time.perf_counter() - start) * 1000, 3)}
+    return df.head(rows), n_rows, summary
+
+@contextmanager
+def session_lock(session_id):
+    """Serialize work on one session and keep its history in memory meanwhile; with the
+    shared backend the store's lock also serializes it across worker processes."""
+    with _session_locks_guard:
+        lock = session_locks.setdefault(session_id, threading.Lock())
+    with lock, session_history.pinned(session_id):
+        yield
 
 def generate_session_id(file):
     file.seek(0)
@@ -175,154 +352,243 @@ def generate_session_id(file):
 
 # On session creation, store the initial file state
 def create_session(file):
-    df = pd.read_csv(file)
+    df = ingest.read_csv(file)
+    if ingest.COMPACT_DTYPES:
+        df = ingest.compact_frame(df)
     file.seek(0)
     session_id = generate_session_id(file)
-    session_history[session_id] = [df_to_csv_str(df)]
+    session_history[session_id] = SessionHistory(Snapshot.from_frame(df))
     return session_id
 
-# Apply transformation to the latest DataFrame in history, push new state
+# Sessions created from a registered dataset never need the file re-uploaded
+def create_dataset_session(dataset_id):
+    base = dataset_snapshot(dataset_id)
+    session_id = f"{dataset_id}_{int(time.time())}"
+    session_datasets[session_id] = dataset_id
+    # The dataset snapshot is the base state: its columns are shared, not copied
+    session_history[session_id] = SessionHistory(base)
+    return session_id
+
+def session_source(session_id, file=None):
+    """Base data for a session: its registered dataset if any, else the given file/frame."""
+    dataset_id = session_datasets.get(session_id)
+    if dataset_id is not None:
+        return get_dataset(dataset_id)
+    if file is None:
+        raise ValueError("Session has no registered dataset; provide a file or dataset_id.")
+    return file
+
+def get_session_history(session_id, file=None) -> SessionHistory:
+    history = session_history.get(session_id)
+    if history is None:
+        # First transformation: the base state comes from the session's dataset or file
+        history = SessionHistory(Snapshot.from_frame(load_frame(session_source(session_id, file))))
+        session_history[session_id] = history
+    return history
+
+def _history_preview(history, rows):
+    return history.preview(rows), history.can_undo, history.can_redo
+
+# Apply transformation to the current state and record it in the session's log
 def apply_transformation(file, session_id, action, columns, params, rows=5):
-    import numpy as np
-    stack = session_history.setdefault(session_id, [])
-    if not stack:
-        # If stack is empty, initialize from file
-        df = pd.read_csv(file)
-    else:
-        df = df_from_csv_str(stack[-1])
-    # ...existing transformation logic...
-    if action == 'drop':
-        df = df.drop(columns=columns)
-    elif action == 'impute':
-        method = params.get('method', 'mean')
-        value = params.get('value', None)
-        for col in columns:
-            if method == 'mean':
-                df[col] = df[col].fillna(df[col].mean())
-            elif method == 'median':
-                df[col] = df[col].fillna(df[col].median())
-            elif method == 'mode':
-                df[col] = df[col].fillna(df[col].mode()[0])
-            elif method == 'constant':
-                df[col] = df[col].fillna(value)
-            else:
-                raise ValueError(f"Unknown imputation method: {method}")
-    # TODO: Add support for encode, scale, etc.
-    else:
-        raise ValueError(f"Unsupported action for history: {action}")
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    # Push new state to stack
-    stack.append(df_to_csv_str(df))
-    preview = df.head(rows)
-    can_undo = len(stack) > 0
-    return preview.columns.tolist(), preview.values.tolist(), can_undo
-
-# Undo: pop the last state, return the previous one
+    with session_lock(session_id):
+        history = get_session_history(session_id, file)
+        history.apply(action, columns, params)
+        session_history.refresh(session_id)
+        return _history_preview(history, rows)
+
+# Undo: step back one record (drops/renames are inverted directly, others replayed from a checkpoint)
 def undo_last_transformation(file, session_id, rows=5):
-    import numpy as np
-    stack = session_history.get(session_id, [])
-    if not stack or len(stack) == 0:
-        raise ValueError("No history to undo.")
-    stack.pop()  # Remove last state
-    if len(stack):
-        df = df_from_csv_str(stack[len(stack)-1])
-    else:
-        df = pd.read_csv(file)
-    df = df.replace([np.nan, np.inf, -np.inf], None)
-    preview = df.head(rows)
-    can_undo = len(stack) > 0
-    return preview.columns.tolist(), preview.values.tolist(), can_undo
-
-def get_column_stats(file, session_id=None):
-    import pandas as pd
-    import numpy as np
-    df = None
-    if session_id is not None and session_id in session_history and session_history[session_id]:
-        df = df_from_csv_str(session_history[session_id][-1])
-    else:
-        df = pd.read_csv(file)
+    with session_lock(session_id):
+        history = session_history.get(session_id)
+        if history is None:
+            raise ValueError("No history to undo.")
+        history.undo()
+        session_history.refresh(session_id)
+        return _history_preview(history, rows)
+
+# Redo: re-apply the next undone record with its original fitted values
+def redo_transformation(session_id, rows=5):
+    with session_lock(session_id):
+        history = session_history.get(session_id)
+        if history is None:
+            raise ValueError("No history to redo.")
+        history.redo()
+        session_history.refresh(session_id)
+        return _history_preview(history, rows)
+
+def session_column_stats(session_id):
+    """Stats for the session's current state, profiling only columns whose version is not cached."""
+    snapshot = session_history[session_id].state()
+    # state() may have materialized pending records
+    session_history.refresh(session_id)
+    cache = stats_cache.setdefault(session_id, OrderedDict())
+    missing = [col for col in snapshot.columns if snapshot.versions[col] not in cache]
+    if missing:
+        fresh = run_stateless(profile_frame, snapshot.select(missing).to_frame())
+        for col in missing:
+            cache[snapshot.versions[col]] = fresh[col]
     stats = {}
-    n_rows = len(df)
-    for col in df.columns:
-        col_data = df[col]
-        col_stats = {
-            'count': int(col_data.count()),
-            'missing_pct': float(col_data.isnull().mean() * 100),
-            'unique': int(col_data.nunique()),
-        }
-        # Data issue scores
-        data_issues = {}
-        # Recommendations
-        recommendations = []
-        # Missingness
-        missingness = float(col_data.isnull().mean())
-        data_issues['missing'] = missingness  # 0-1
-        if missingness > 0.5:
-            recommendations.append('Consider dropping this column due to excessive missing data.')
-        elif 0.1 < missingness <= 0.5:
-            recommendations.append('Consider imputing missing values.')
-        # Constant value
-        if n_rows > 0:
-            value_counts = col_data.value_counts(dropna=False)
-            most_common_pct = float(value_counts.iloc[0] / n_rows) if not value_counts.empty else 0.0
+    for col in snapshot.columns:
+        version = snapshot.versions[col]
+        cache.move_to_end(version)
+        stats[col] = cache[version]
+    while len(cache) > STATS_CACHE_STATES * max(len(snapshot.columns), 1):
+        cache.popitem(last=False)
+    return stats
+
+def session_rows(session_id, offset=0, limit=100, sort=None, descending=False, where=None):
+    """Rows offset..offset+limit of the session's current state, optionally in `sort` order
+    and limited to the rows matching a filter expression `where`.
+
+    Served by position from the stored columns, so a window costs O(limit); the sort
+    permutation is computed once per column version and reused while scrolling, and a
+    filter's matching rows are kept for the next windows of the same view.
+    Returns the window (indexed by row number), the total row count (of matching rows
+    with `where`) and the filter plan (None without `where`).
+    """
+    if offset < 0 or not 0 < limit <= MAX_WINDOW_ROWS:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_WINDOW_ROWS}")
+    with session_lock(session_id):
+        snapshot = get_session_history(session_id).state()
+        session_history.refresh(session_id)
+        if sort is not None and sort not in snapshot.data:
+            raise ValueError(f"Unknown sort column: {sort}")
+        order = _sort_order(session_id, snapshot, sort, descending) if sort is not None else None
+        if where is None:
+            rows = slice(offset, offset + limit) if order is None else order[offset:offset + limit]
+            return snapshot.take(rows), len(snapshot), None
+        where = parse_where(where)
+        key = (json.dumps(where, sort_keys=True), *sorted(snapshot.versions.items()), str(sort), str(bool(descending)))
+        cache = query_cache.setdefault(session_id, OrderedDict())
+        if key in cache:
+            matched, plan = cache[key]
         else:
-            most_common_pct = 0.0
-        data_issues['constant'] = most_common_pct  # 0-1
-        if most_common_pct > 0.95:
-            recommendations.append('Consider dropping this column as it is nearly constant.')
-        # High cardinality
-        cardinality = float(col_data.nunique() / n_rows) if n_rows > 0 else 0.0
-        data_issues['high_cardinality'] = cardinality  # 0-1
-        if cardinality > 0.8:
-            recommendations.append('Consider dropping or encoding this column due to high cardinality.')
-        # Outlier risk (for numerics)
-        if pd.api.types.is_numeric_dtype(col_data):
-            col_stats.update({
-                'mean': float(col_data.mean()) if col_data.count() else None,
-                'median': float(col_data.median()) if col_data.count() else None,
-                'std': float(col_data.std()) if col_data.count() else None,
-                'min': float(col_data.min()) if col_data.count() else None,
-                'max': float(col_data.max()) if col_data.count() else None,
-            })
-            # Outlier risk: % of values > 3 std from mean
-            if col_data.count() > 0 and col_data.std() is not None and col_data.std() > 0:
-                outlier_mask = (np.abs(col_data - col_data.mean()) > 3 * col_data.std())
-                outlier_risk = float(outlier_mask.sum() / col_data.count())
-            else:
-                outlier_risk = 0.0
-            data_issues['outlier'] = outlier_risk  # 0-1
-            if outlier_risk > 0.1:
-                recommendations.append('Consider scaling or transforming this column due to high outlier risk.')
-            # Add histogram for numeric columns
-            try:
-                clean_col = col_data.dropna().astype(float)
-                if len(clean_col) > 0:
-                    hist_counts, hist_edges = np.histogram(clean_col, bins=20)
-                    col_stats['histogram'] = {
-                        'bin_edges': hist_edges.tolist(),
-                        'counts': hist_counts.tolist()
-                    }
-                else:
-                    col_stats['histogram'] = {'bin_edges': [], 'counts': []}
-            except Exception:
-                col_stats['histogram'] = {'bin_edges': [], 'counts': []}
+            matched, plan = query_snapshot(session_id, snapshot, where)
+            if order is not None:
+                matched = order[np.isin(order, matched, assume_unique=True)]
+            cache[key] = matched, plan
+            while len(cache) > QUERY_CACHE_ENTRIES:
+                cache.popitem(last=False)
+        cache.move_to_end(key)
+        return snapshot.take(matched[offset:offset + limit]), len(matched), plan
+
+def _sort_order(session_id, snapshot: Snapshot, sort, descending) -> np.ndarray:
+    cache = sort_cache.setdefault(session_id, OrderedDict())
+    key = (snapshot.versions[sort], bool(descending))
+    if key not in cache:
+        cache[key] = snapshot.sort_order(sort, descending)
+        while len(cache) > SORT_CACHE_COLUMNS:
+            cache.popitem(last=False)
+    cache.move_to_end(key)
+    return cache[key]
+
+def get_column_stats(file, session_id=None, approximate=False):
+    """Column stats; with `approximate`, mergeable sketches built over row chunks in parallel."""
+    if session_id is not None and session_id in session_history:
+        with session_lock(session_id):
+            if approximate:
+                return approximate_stats(frame_chunks(session_history[session_id].state().to_frame()))
+            return session_column_stats(session_id)
+    if session_id is not None and session_id in session_datasets:
+        df = get_dataset(session_datasets[session_id])
+    elif approximate and file is not None and not isinstance(file, pd.DataFrame):
+        # Stream the upload chunk by chunk; it is never loaded whole
+        return approximate_stats(ingest.iter_csv(file, SKETCH_CHUNK_ROWS))
+    else:
+        df = load_frame(file)
+    return approximate_stats(frame_chunks(df)) if approximate else run_stateless(profile_frame, df)
+
+def column_memory(dataset_id=None, session_id=None):
+    """Bytes and dtype per column of a session's current state or a registered dataset.
+
+    None for a plain upload, which is never held in memory as a whole.
+    """
+    if session_id is not None and session_id in session_history:
+        with session_lock(session_id):
+            snapshot = session_history[session_id].state()
+    elif session_id is not None and session_id in session_datasets:
+        snapshot = dataset_snapshot(session_datasets[session_id])
+    elif dataset_id:
+        snapshot = dataset_snapshot(dataset_id)
+    else:
+        return None
+    sizes = snapshot.memory()
+    columns = {
+        col: {'bytes': sizes[snapshot.versions[col]], 'dtype': str(snapshot.data[col].dtype)} for col in snapshot.columns
+    }
+    return {'columns': columns, 'total_bytes': sum(c['bytes'] for c in columns.values())}
+
+def replay_file(path, steps, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Apply fitted `steps` to a CSV on disk one chunk at a time."""
+    for chunk in ingest.iter_csv(path, chunk_rows):
+        report('export', advance=len(chunk))
+        for step in steps:
+            chunk, _, _ = apply_step(chunk, step)
+        yield chunk
+
+def export_session(session_id, fmt='csv', compression=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """The session's current state serialized as `fmt`, as an iterator of byte chunks.
+
+    Sessions on a sampled dataset replay their fitted steps over the spooled full upload,
+    so the export has every row, not just the sample.
+    """
+    validate_format(fmt, compression)
+    with session_lock(session_id):
+        history = get_session_history(session_id)
+        dataset_id = session_datasets.get(session_id)
+        path = dataset_files.get(dataset_id) if dataset_id else None
+        if path:
+            steps = history.steps()
         else:
-            top = col_data.mode().iloc[0] if not col_data.mode().empty else None
-            freq = int((col_data == top).sum()) if top is not None else 0
-            col_stats.update({
-                'top': str(top) if top is not None else None,
-                'freq': freq
-            })
-            data_issues['outlier'] = None  # Not applicable
-            # Add value counts for categorical columns (top 20)
-            try:
-                value_counts = col_data.value_counts(dropna=False).head(20)
-                col_stats['value_counts'] = [
-                    {'value': str(idx), 'count': int(cnt)} for idx, cnt in value_counts.items()
-                ]
-            except Exception:
-                col_stats['value_counts'] = []
-        col_stats['data_issues'] = data_issues
-        col_stats['recommendations'] = recommendations
-        stats[col] = col_stats
-    return stats
\ No newline at end of file
+            snapshot = history.state()
+            session_history.refresh(session_id)
+    chunks = replay_file(path, steps, chunk_rows) if path else frame_chunks(snapshot.to_frame(), chunk_rows)
+    return export_chunks(chunks, fmt, compression)
+
+
+def save_session_pipeline(session_id):
+    """Save the session's fitted steps as a pipeline artifact; returns it with its pipeline_id."""
+    with session_lock(session_id):
+        steps = get_session_history(session_id).steps()
+    artifact = {'pipeline_id': str(uuid.uuid4()), **to_artifact(steps)}
+    os.makedirs(PIPELINE_DIR, exist_ok=True)
+    path = os.path.join(PIPELINE_DIR, f"{artifact['pipeline_id']}.json")
+    with open(path + '.tmp', 'w') as out:
+        json.dump(artifact, out)
+    os.replace(path + '.tmp', path)
+    return artifact
+
+def load_pipeline(pipeline_id):
+    path = os.path.join(PIPELINE_DIR, f"{os.path.basename(pipeline_id)}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown pipeline_id: {pipeline_id}")
+    with open(path) as f:
+        return json.load(f)
+
+def apply_pipeline(file, pipeline_id=None, artifact=None, fmt='csv', compression=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Stream a CSV through a fitted pipeline (saved, or given as an artifact) chunk by chunk.
+
+    Nothing is refitted: fill values, vocabularies and scaler parameters come from the
+    artifact. The upload is spooled to disk first, so memory stays at one chunk however
+    large the file is.
+    """
+    validate_format(fmt, compression)
+    steps = from_artifact(artifact if artifact is not None else load_pipeline(pipeline_id))
+    path = spool_upload(file, f"apply_{uuid.uuid4()}")
+    try:
+        header = ingest.read_csv(path, nrows=0).columns
+        missing = [col for col in required_columns(steps) if col not in header]
+        if missing:
+            raise ValueError(f"Input is missing column(s) the pipeline needs: {missing}")
+    except Exception:
+        os.remove(path)
+        raise
+
+    def chunks():
+        try:
+            yield from replay_file(path, steps, chunk_rows)
+        finally:
+            os.remove(path)
+
+    return export_chunks(chunks(), fmt, compression)
@@ -0,0 +1,197 @@
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .jobs import report
+
+logger = logging.getLogger("dataprepper")
+
+# keep= values: which occurrence of a duplicated row survives ('none' drops them all, like keep=False)
+KEEP = ('first', 'last', 'none')
+# Row hashes (16 bytes each with the row number) held in memory before they spill to disk
+DEDUP_MEMORY_ROWS = int(os.environ.get('DATAPREPPER_DEDUP_MEMORY_ROWS', 8_000_000))
+# Spilled hashes are split into 2**SPILL_BITS files by their top bits; each is checked on its own
+SPILL_BITS = 6
+
+ENTRY = np.dtype([('hash', '<u8'), ('row', '<i8')])
+
+
+def _numbers(col: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """A numeric column as (integer, rest) pairs that are equal exactly when the values are:
+    whole numbers go in the int64 part with rest 0.0, anything else (fractions, NaN, missing,
+    inf) in the float part. CSV chunks infer types separately ("1" is int64 in one chunk and
+    float64 in one with a gap), and going through float64 would merge ints above 2**53."""
+    if isinstance(col.dtype, np.dtype) and col.dtype.kind in 'iu':
+        return col.to_numpy().astype(np.int64, copy=False), np.zeros(len(col))
+    if pd.api.types.is_integer_dtype(col.dtype):
+        missing = col.isna().to_numpy()
+        return col.to_numpy(dtype=np.int64, na_value=0), np.where(missing, np.nan, 0.0)
+    values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        whole = np.isfinite(values) & (values == np.floor(values)) & (np.abs(values) < 2.0 ** 63)
+    return np.where(whole, values, 0).astype(np.int64), np.where(whole, 0.0, values)
+
+
+def canonical(df: pd.DataFrame, subset: Optional[List[str]] = None) -> pd.DataFrame:
+    """The `subset` columns in a form that hashes the same whichever dtype a chunk inferred."""
+    columns = {}
+    for name in (subset or df.columns):
+        col = df[name]
+        if isinstance(col.dtype, pd.SparseDtype):
+            col = col.sparse.to_dense()
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype(object)
+        if pd.api.types.is_numeric_dtype(col.dtype) and not pd.api.types.is_bool_dtype(col.dtype):
+            columns[(name, 'int')], columns[(name, 'rest')] = _numbers(col)
+        else:
+            columns[(name, 'value')] = col.reset_index(drop=True)
+    return pd.DataFrame(columns, copy=False)
+
+
+def row_hashes(df: pd.DataFrame, subset: Optional[List[str]] = None) -> np.ndarray:
+    """64-bit hash of each row's `subset` values, computed column-wise (no per-row Python)."""
+    return pd.util.hash_pandas_object(canonical(df, subset), index=False).to_numpy()
+
+
+def _marks(entries: np.ndarray, keep: str) -> Tuple[np.ndarray, np.ndarray, int]:
+    """(rows to drop, rows sharing their hash with another row, number of such hash groups)."""
+    entries = np.sort(entries, order=['hash', 'row'], kind='stable')
+    hashes, rows = entries['hash'], entries['row']
+    starts = np.r_[True, hashes[1:] != hashes[:-1]] if len(hashes) else np.empty(0, dtype=bool)
+    ends = np.r_[starts[1:], True] if len(hashes) else starts
+    single = starts & ends
+    drop = rows[~{'first': starts, 'last': ends, 'none': single}[keep]]
+    return drop, rows[~single], int((starts & ~ends).sum())
+
+
+class RowHashes:
+    """Hash of every row of a stream, with its row number; sorted in memory, or partitioned
+    into files under `spill_dir` once more than `memory_rows` are held, so a huge input costs
+    one partition's worth of memory at a time."""
+
+    def __init__(self, memory_rows: int = DEDUP_MEMORY_ROWS, spill_dir: Optional[str] = None):
+        self.memory_rows = memory_rows
+        self.spill_dir = spill_dir
+        self.parts: List[np.ndarray] = []
+        self.held = 0
+        self.rows = 0
+        self.directory: Optional[str] = None
+
+    def add(self, hashes: np.ndarray):
+        entries = np.empty(len(hashes), dtype=ENTRY)
+        entries['hash'] = hashes
+        entries['row'] = np.arange(self.rows, self.rows + len(hashes))
+        self.rows += len(hashes)
+        self.parts.append(entries)
+        self.held += len(entries)
+        if self.held > self.memory_rows:
+            self._spill()
+
+    def _spill(self):
+        if not self.parts:
+            return
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='dedup-', dir=self.spill_dir)
+            logger.info(f"dedup: over {self.memory_rows} rows, spilling hashes to {self.directory}")
+        entries = np.concatenate(self.parts)
+        partition = (entries['hash'] >> np.uint64(64 - SPILL_BITS)).astype(np.int64)
+        order = np.argsort(partition, kind='stable')
+        bounds = np.searchsorted(partition[order], np.arange((1 << SPILL_BITS) + 1))
+        for p in range(1 << SPILL_BITS):
+            if bounds[p + 1] > bounds[p]:
+                with open(os.path.join(self.directory, f'{p}.bin'), 'ab') as f:
+                    entries[order[bounds[p]:bounds[p + 1]]].tofile(f)
+        self.parts, self.held = [], 0
+
+    def _partitions(self) -> Iterator[np.ndarray]:
+        if self.directory is None:
+            yield np.concatenate(self.parts) if self.parts else np.empty(0, dtype=ENTRY)
+            return
+        self._spill()
+        for p in range(1 << SPILL_BITS):
+            path = os.path.join(self.directory, f'{p}.bin')
+            if os.path.exists(path):
+                yield np.fromfile(path, dtype=ENTRY)
+
+    def marks(self, keep: str) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Sorted rows to drop, sorted rows whose hash is shared, and the number of shared hashes."""
+        drops, shared, groups = [], [], 0
+        for entries in self._partitions():
+            drop, candidates, n = _marks(entries, keep)
+            drops.append(drop)
+            shared.append(candidates)
+            groups += n
+        return np.sort(np.concatenate(drops)), np.sort(np.concatenate(shared)), groups
+
+    @property
+    def spilled(self) -> bool:
+        return self.directory is not None
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+def rows_in(chunk_start: int, length: int, rows: np.ndarray) -> np.ndarray:
+    """Positions within a chunk of the sorted global row numbers `rows`."""
+    lo, hi = np.searchsorted(rows, [chunk_start, chunk_start + length])
+    return rows[lo:hi] - chunk_start
+
+
+def find_duplicates(chunks: Callable[[], Iterable[pd.DataFrame]], subset: Optional[List[str]] = None,
+                    keep: str = 'first', verify: bool = False,
+                    memory_rows: int = DEDUP_MEMORY_ROWS) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Rows a drop_duplicates(subset, keep) would remove from a chunk stream, and a report.
+
+    One pass hashes the subset columns of each chunk. With `verify`, a second pass reads
+    back only the rows whose hash is shared and compares their values, so a 64-bit hash
+    collision can never drop a distinct row. Returns the sorted row numbers to drop and
+    {rows, duplicate_rows, duplicate_ratio, duplicate_groups, dropped_rows, keep, verified, spilled};
+    duplicate_rows counts the rows that repeat an earlier one (what keep='first' drops).
+    """
+    if keep not in KEEP:
+        raise ValueError(f"keep must be one of {KEEP}")
+    hashes = RowHashes(memory_rows)
+    try:
+        for chunk in chunks():
+            report('hash rows', advance=len(chunk))
+            hashes.add(row_hashes(chunk, subset))
+        drop, shared, groups = hashes.marks(keep)
+        first, _, _ = hashes.marks('first') if keep != 'first' else (drop, None, None)
+        spilled = hashes.spilled
+    finally:
+        hashes.close()
+    if verify and len(shared):
+        candidates, start = [], 0
+        for chunk in chunks():
+            picked = rows_in(start, len(chunk), shared)
+            # Python objects compare the original values exactly (and 1 == 1.0 across chunk dtypes)
+            candidates.append(chunk.iloc[picked][subset or chunk.columns].astype(object).set_axis(picked + start))
+            start += len(chunk)
+        candidates = pd.concat(candidates)
+        marked = candidates.duplicated(keep=False if keep == 'none' else keep)
+        drop = np.sort(candidates.index[marked.to_numpy()].to_numpy(dtype=np.int64))
+        first = np.sort(candidates.index[candidates.duplicated(keep='first').to_numpy()].to_numpy(dtype=np.int64))
+        groups = int(candidates[candidates.duplicated(keep=False)].drop_duplicates().shape[0])
+    n = hashes.rows
+    return drop, {
+        'rows': n, 'duplicate_rows': int(len(first)), 'duplicate_ratio': len(first) / n if n else 0.0,
+        'duplicate_groups': groups, 'dropped_rows': int(len(drop)), 'keep': keep, 'verified': bool(verify),
+        'spilled': spilled,
+    }
+
+
+def drop_rows(chunks: Iterable[pd.DataFrame], drop: np.ndarray) -> Iterator[pd.DataFrame]:
+    """The chunks without the (sorted, global) row numbers in `drop`."""
+    start = 0
+    for chunk in chunks:
+        keep = np.ones(len(chunk), dtype=bool)
+        keep[rows_in(start, len(chunk), drop)] = False
+        start += len(chunk)
+        yield chunk[keep]
@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .kernels import _py
+
+# Methods of the 'encode' action
+ENCODE_METHODS = ('onehot', 'ordinal', 'topk', 'hash', 'frequency', 'count')
+# Methods that replace each column with indicator columns
+EXPANDING_METHODS = ('onehot', 'topk', 'hash')
+# Categories top-k keeps by default; the rest share the "<column>_other" indicator
+DEFAULT_TOP_K = 20
+OTHER = 'other'
+# Indicator columns ("<column>_hash<i>") the hashing encoder spreads a column over by default
+DEFAULT_HASH_FEATURES = 32
+# Indicators are stored sparse: memory grows with the rows, not with rows x categories
+INDICATOR_DTYPE = pd.SparseDtype(bool, False)
+# Fitted vocabularies kept per (column version, method, top_k), least recently used dropped first
+VOCABULARY_CACHE_ENTRIES = 64
+
+vocabulary_cache: 'OrderedDict[Tuple[Any, ...], Dict[str, Any]]' = OrderedDict()
+_vocabulary_lock = threading.Lock()
+
+
+def encode_method(params: Dict[str, Any]) -> str:
+    method = params.get('method', 'onehot')
+    if method not in ENCODE_METHODS:
+        raise ValueError(f"Unknown encoding method: {method}")
+    return method
+
+
+def _positive(params: Dict[str, Any], key: str, default: int) -> int:
+    value = int(params.get(key) or default)
+    if value < 1:
+        raise ValueError(f"{key} must be at least 1")
+    return value
+
+
+def _categorical(col: pd.Series, categories: List[Any]) -> pd.Categorical:
+    """`col` over a fitted vocabulary; values outside it (new data) become missing."""
+    return pd.Categorical(col.where(col.isin(categories)), categories=categories)
+
+
+def _sorted(index: pd.Index) -> pd.Index:
+    try:
+        return index.sort_values()
+    except TypeError:
+        return index
+
+
+def vocabulary_from_counts(counts: pd.Series, params: Dict[str, Any]) -> Dict[str, Any]:
+    """A column's vocabulary from its value counts: the categories in value order (top-k:
+    most frequent first, ties by value) and, for frequency/count encoding, their counts."""
+    method = encode_method(params)
+    counts = counts.reindex(_sorted(counts.index))
+    if method == 'topk':
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable').head(_positive(params, 'top_k', DEFAULT_TOP_K))
+    vocabulary = {'categories': [_py(v) for v in counts.index]}
+    if method in ('frequency', 'count'):
+        vocabulary['counts'] = [int(c) for c in counts]
+    return vocabulary
+
+
+def fit_column(col: pd.Series, params: Dict[str, Any], version: Optional[str] = None) -> Dict[str, Any]:
+    """Vocabulary of one column, counted once per column version and reused after that."""
+    method = encode_method(params)
+    key = (version, 'onehot' if method == 'ordinal' else method,
+           _positive(params, 'top_k', DEFAULT_TOP_K) if method == 'topk' else None)
+    if version is not None:
+        with _vocabulary_lock:
+            if key in vocabulary_cache:
+                vocabulary_cache.move_to_end(key)
+                return vocabulary_cache[key]
+    vocabulary = vocabulary_from_counts(col.value_counts(dropna=True, sort=False), params)
+    if version is not None:
+        with _vocabulary_lock:
+            vocabulary_cache[key] = vocabulary
+            while len(vocabulary_cache) > VOCABULARY_CACHE_ENTRIES:
+                vocabulary_cache.popitem(last=False)
+    return vocabulary
+
+
+def fit_encoder(df: pd.DataFrame, columns: List[str], params: Dict[str, Any],
+                versions: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Fitted values of an 'encode' step: {'categories': {column: [...]}} (and 'counts' for
+    frequency/count encoding); nothing for hashing, which has no vocabulary."""
+    method = encode_method(params)
+    if method == 'hash':
+        return {}
+    vocabularies = {col: fit_column(df[col], params, (versions or {}).get(col)) for col in columns}
+    fitted = {'categories': {col: v['categories'] for col, v in vocabularies.items()}}
+    if method in ('frequency', 'count'):
+        fitted['counts'] = {col: v['counts'] for col, v in vocabularies.items()}
+    return fitted
+
+
+def generated_columns(step: Dict[str, Any], col: str) -> Optional[List[str]]:
+    """Indicator columns an expanding step turns `col` into; None until its vocabulary is fitted."""
+    method = encode_method(step['params'])
+    if method == 'hash':
+        return [f"{col}_hash{i}" for i in range(_positive(step['params'], 'n_features', DEFAULT_HASH_FEATURES))]
+    categories = step['fitted'].get('categories')
+    if categories is None:
+        return None
+    names = [f"{col}_{cat}" for cat in categories[col]]
+    return names + [f"{col}_{OTHER}"] if method == 'topk' else names
+
+
+def hash_codes(col: pd.Series, n_features: int) -> np.ndarray:
+    """Bucket of each value's text (stable across processes; missing values get -1)."""
+    present = col.notna().to_numpy()
+    codes = np.full(len(col), -1, dtype=np.int64)
+    texts = col[present].astype(str).to_numpy(dtype=object)
+    codes[present] = (pd.util.hash_array(texts) % np.uint64(n_features)).astype(np.int64)
+    return codes
+
+
+def indicators(codes: np.ndarray, names: List[str], index: pd.Index) -> pd.DataFrame:
+    """Sparse boolean column per name, true in the rows whose code is its position (-1: none)."""
+    rows = np.flatnonzero(codes >= 0)
+    # One CSC matrix for all the names: building each SparseArray from a dense mask would
+    # scan every row once per category
+    matrix = sparse.csc_matrix((np.ones(len(rows), dtype=bool), (rows, codes[rows])), shape=(len(index), len(names)))
+    return pd.DataFrame.sparse.from_spmatrix(matrix, index=index, columns=names)
+
+
+def dense_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with sparse indicator columns densified, for writers without a sparse type (Arrow)."""
+    sparse = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+    if not sparse:
+        return df
+    return df.astype({col: df[col].dtype.subtype for col in sparse})
+
+
+def _codes(col: pd.Series, step: Dict[str, Any]) -> np.ndarray:
+    method, params = encode_method(step['params']), step['params']
+    if method == 'hash':
+        return hash_codes(col, _positive(params, 'n_features', DEFAULT_HASH_FEATURES))
+    categories = step['fitted']['categories'][col.name]
+    codes = _categorical(col, categories).codes.astype(np.int64)
+    if method == 'topk':
+        # Present values outside the top k go to the "other" indicator
+        codes[(codes < 0) & col.notna().to_numpy()] = len(categories)
+    return codes
+
+
+def apply_encoder(df: pd.DataFrame, step: Dict[str, Any]) -> Tuple[pd.DataFrame, List[str]]:
+    """Encode the step's columns; returns the frame and the columns changed or added.
+
+    Expanding methods drop each column and append its indicators at the end, like
+    pd.get_dummies, but stored sparse.
+    """
+    columns, fitted = step['columns'], step['fitted']
+    method = encode_method(step['params'])
+    if method == 'ordinal':
+        for col in columns:
+            df[col] = _categorical(df[col], fitted['categories'][col]).codes
+        return df, list(columns)
+    if method in ('frequency', 'count'):
+        for col in columns:
+            counts = np.asarray(fitted['counts'][col], dtype='float64' if method == 'frequency' else 'int64')
+            if method == 'frequency':
+                counts = counts / max(counts.sum(), 1)
+            # Unseen and missing values (code -1) take the appended 0
+            df[col] = np.append(counts, 0)[_categorical(df[col], fitted['categories'][col]).codes]
+        return df, list(columns)
+    added = [indicators(_codes(df[col], step), generated_columns(step, col), df.index) for col in columns]
+    df = pd.concat([df.drop(columns=columns), *added], axis=1)
+    return df, [name for frame in added for name in frame.columns]
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("dataprepper")
+
+# Concurrency limits per lane; DATAPREPPER_PROCESS_WORKERS=0 keeps profiling in threads
+CPU_WORKERS = int(os.environ.get('DATAPREPPER_CPU_WORKERS', os.cpu_count() or 1))
+IO_WORKERS = int(os.environ.get('DATAPREPPER_IO_WORKERS', 4))
+PROCESS_WORKERS = int(os.environ.get('DATAPREPPER_PROCESS_WORKERS', 0))
+# Requests allowed to wait for a worker; beyond that a lane answers 429
+QUEUE_SIZE = int(os.environ.get('DATAPREPPER_QUEUE_SIZE', 16))
+# Seconds a request may wait plus run before it answers 503
+REQUEST_TIMEOUT = float(os.environ.get('DATAPREPPER_REQUEST_TIMEOUT', 120))
+
+
+class ExecutorBusy(Exception):
+    """A lane is saturated (429) or a request timed out (503)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Lane:
+    """Bounded executor: at most `workers` jobs run and `queue_size` wait; the rest are rejected.
+
+    A timed-out job cannot be interrupted, so it keeps its slot until it finishes;
+    admission counts it, which keeps a lane of stuck jobs from accepting more work.
+    """
+
+    def __init__(self, name: str, make_pool: Callable[[], Executor], workers: int, queue_size: int = QUEUE_SIZE,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.name = name
+        self.make_pool = make_pool
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = self.make_pool()
+            return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_size:
+                logger.warning(f"executor {self.name}: saturated ({self.in_flight} in flight)")
+                raise ExecutorBusy(429, f"Server busy ({self.name} queue full); retry shortly.")
+            self.in_flight += 1
+        try:
+            future = self.pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # only succeeds if it has not started yet
+            logger.warning(f"executor {self.name}: request timed out after {timeout or self.timeout}s")
+            raise ExecutorBusy(503, f"Request timed out after {timeout or self.timeout:g}s.", retry_after=5)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Session state lives in this process, so transforms run on threads (pandas and numpy
+# release the GIL in their kernels); only stateless work such as profiling a frame is
+# sent to the process lane.
+cpu_lane = Lane('cpu', lambda: ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix='cpu'), CPU_WORKERS)
+io_lane = Lane('io', lambda: ThreadPoolExecutor(IO_WORKERS, thread_name_prefix='io'), IO_WORKERS)
+process_lane = Lane('process', lambda: ProcessPoolExecutor(PROCESS_WORKERS), PROCESS_WORKERS)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    return await cpu_lane.run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    return await io_lane.run(fn, *args, **kwargs)
+
+
+def run_stateless(fn: Callable, *args) -> Any:
+    """Run a picklable, state-free function in the process lane (in this thread if it is disabled).
+
+    Called from a cpu-lane thread, which blocks until the result is back.
+    """
+    if PROCESS_WORKERS <= 0:
+        return fn(*args)
+    return process_lane.submit(fn, *args).result(timeout=process_lane.timeout)
+
+
+def shutdown():
+    for lane in (cpu_lane, io_lane, process_lane):
+        lane.shutdown()
@@ -0,0 +1,114 @@
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+
+from .encoders import dense_columns
+
+# Rows serialized per chunk (per Parquet row group / Arrow record batch)
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_FORMATS = ('csv', 'parquet', 'feather', 'arrow')
+CSV_COMPRESSION = ('gzip', 'zstd')
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'gzip': 'application/gzip',
+    'zstd': 'application/zstd',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+EXTENSIONS = {'csv': 'csv', 'gzip': 'csv.gz', 'zstd': 'csv.zst', 'parquet': 'parquet', 'feather': 'feather', 'arrow': 'arrow'}
+
+
+class _Drain:
+    """Write-only file-like that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def validate_format(fmt: str, compression: Optional[str] = None):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if compression and (fmt != 'csv' or compression not in CSV_COMPRESSION):
+        raise ValueError(f"Unsupported compression for {fmt}: {compression}")
+
+
+def media_type(fmt: str, compression: Optional[str] = None) -> str:
+    return MEDIA_TYPES[compression or fmt]
+
+
+def file_extension(fmt: str, compression: Optional[str] = None) -> str:
+    return EXTENSIONS[compression or fmt]
+
+
+def _arrow_table(chunk: pd.DataFrame, schema=None):
+    import pyarrow as pa
+    table = pa.Table.from_pandas(dense_columns(chunk), preserve_index=False)
+    if schema is None or table.schema.equals(schema):
+        return table
+    # Later chunks can infer other types (an int column with a missing value reads as float)
+    return pa.table([table.column(field.name).cast(field.type, safe=False) for field in schema], schema=schema)
+
+
+def export_chunks(chunks: Iterable[pd.DataFrame], fmt: str = 'csv', compression: Optional[str] = None) -> Iterator[bytes]:
+    """Serialize row chunks incrementally, yielding bytes as each chunk is written.
+
+    Only one chunk and its encoded bytes are held at a time, so memory stays flat
+    however large the result is.
+    """
+    validate_format(fmt, compression)
+    import pyarrow as pa
+    drain = _Drain()
+    if fmt == 'csv':
+        out = pa.CompressedOutputStream(pa.PythonFile(drain, mode='w'), compression) if compression else drain
+        header = True
+        for chunk in chunks:
+            out.write(chunk.to_csv(index=False, header=header).encode())
+            header = False
+            yield drain.drain()
+        out.close()
+        yield drain.drain()
+        return
+    writer, schema = None, None
+    for chunk in chunks:
+        table = _arrow_table(chunk, schema)
+        if writer is None:
+            schema = table.schema
+            if fmt == 'parquet':
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(drain, schema)
+            else:
+                import pyarrow.ipc as ipc
+                writer = ipc.new_file(pa.PythonFile(drain, mode='w'), schema)
+        writer.write_table(table)
+        yield drain.drain()
+    if writer is not None:
+        writer.close()
+    yield drain.drain()
+
@@ -0,0 +1,335 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Comparison operators of a filter condition {"column", "op", "value" | "values" | "min"/"max"}
+OPS = ('eq', 'ne', 'lt', 'le', 'gt', 'ge', 'between', 'in', 'regex', 'isnull', 'notnull')
+# Column indexes kept (one per column version), least recently used dropped first
+INDEX_CACHE_COLUMNS = 32
+# Regex results remembered per column index
+PATTERN_CACHE = 16
+# In an AND, once candidates are this many times fewer than the next condition's matches,
+# the condition is checked on the candidate rows instead of looked up in its index
+PROBE_RATIO = 4
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str) -> 're.Pattern':
+    return re.compile(pattern)
+
+
+def where_from_params(column: str, value=None, min_value=None, max_value=None, regex=None) -> Dict[str, Any]:
+    """The single-column filter of /filter_rows as a filter expression."""
+    conditions = []
+    if value is not None:
+        conditions.append({'column': column, 'op': 'eq', 'value': value})
+    if min_value is not None:
+        conditions.append({'column': column, 'op': 'ge', 'value': min_value})
+    if max_value is not None:
+        conditions.append({'column': column, 'op': 'le', 'value': max_value})
+    if regex is not None:
+        conditions.append({'column': column, 'op': 'regex', 'value': regex})
+    return {'and': conditions}
+
+
+def parse_where(where) -> Dict[str, Any]:
+    """Validate a filter expression (JSON text or dict): a condition or {"and"|"or": [expressions]}."""
+    if isinstance(where, str):
+        where = json.loads(where)
+    if not isinstance(where, dict):
+        raise ValueError("A filter expression must be an object")
+    for key in ('and', 'or'):
+        if key in where:
+            if not isinstance(where[key], list):
+                raise ValueError(f"'{key}' takes a list of expressions")
+            return {key: [parse_where(child) for child in where[key]]}
+    if where.get('op') not in OPS:
+        raise ValueError(f"Unknown filter operator: {where.get('op')!r}")
+    if not isinstance(where.get('column'), str):
+        raise ValueError("A filter condition needs a column")
+    if where['op'] == 'between' and ('min' not in where or 'max' not in where):
+        raise ValueError("'between' needs min and max")
+    if where['op'] == 'in' and not isinstance(where.get('values'), list):
+        raise ValueError("'in' needs a list of values")
+    if where['op'] in ('eq', 'ne', 'lt', 'le', 'gt', 'ge', 'regex') and where.get('value') is None:
+        raise ValueError(f"'{where['op']}' needs a value")
+    return dict(where)
+
+
+def columns_of(where: Dict[str, Any]) -> List[str]:
+    if 'and' in where or 'or' in where:
+        return sorted({col for child in where.get('and', where.get('or')) for col in columns_of(child)})
+    return [where['column']]
+
+
+def by_value(col: pd.Series) -> pd.Series:
+    """`col` with categoricals decoded to their values, which compare and sort by value
+    rather than by category code."""
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        return col
+    dtype = col.cat.categories.dtype
+    if dtype.kind in 'iub' and col.hasnans:
+        # Integer and boolean categories can't hold the missing values
+        return col.astype('float64' if dtype.kind in 'iu' else object)
+    return col.astype(dtype)
+
+
+def coerce(value: Any, col: pd.Series) -> Any:
+    """`value` (often form text) as the column's type, so "5" matches a numeric 5."""
+    dtype = by_value(col).dtype
+    if pd.api.types.is_bool_dtype(dtype) and isinstance(value, str):
+        if value.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError(f"Cannot compare '{col.name}' with {value!r}")
+        return value.lower() in ('true', '1')
+    if pd.api.types.is_numeric_dtype(dtype) and isinstance(value, str):
+        try:
+            return pd.to_numeric(value)
+        except ValueError:
+            raise ValueError(f"Cannot compare numeric column '{col.name}' with {value!r}")
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.Timestamp(value)
+    if pd.api.types.is_string_dtype(dtype) and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def _search(uniques, pattern: str) -> np.ndarray:
+    """Which distinct values (as text) the regex finds a match in."""
+    compiled = compile_pattern(pattern)
+    return np.fromiter((compiled.search(str(u)) is not None for u in uniques), dtype=bool, count=len(uniques))
+
+
+def _condition_mask(cond: Dict[str, Any], col: pd.Series) -> np.ndarray:
+    op, values = cond['op'], by_value(col)
+    present = values.notna().to_numpy()
+    if op == 'isnull':
+        return ~present
+    if op == 'notnull':
+        return present
+    if op == 'regex':
+        # Each distinct value is searched once
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        return np.append(_search(uniques, cond['value']), False)[codes]
+    if op == 'in':
+        return values.isin([coerce(v, col) for v in cond['values']]).to_numpy(dtype=bool)
+    if op == 'between':
+        lo, hi = coerce(cond['min'], col), coerce(cond['max'], col)
+        return ((values >= lo) & (values <= hi)).fillna(False).to_numpy(dtype=bool)
+    value = coerce(cond['value'], col)
+    compare = {'eq': values.__eq__, 'ne': values.__ne__, 'lt': values.__lt__, 'le': values.__le__,
+               'gt': values.__gt__, 'ge': values.__ge__}[op]
+    # Missing values never match (SQL semantics, also for 'ne')
+    return compare(value).fillna(False).to_numpy(dtype=bool) & present
+
+
+def mask(where: Dict[str, Any], df: pd.DataFrame) -> np.ndarray:
+    """Boolean row mask of a filter expression over a frame (a full scan, no index)."""
+    if 'and' in where:
+        result = np.ones(len(df), dtype=bool)
+        for child in where['and']:
+            result &= mask(child, df)
+        return result
+    if 'or' in where:
+        result = np.zeros(len(df), dtype=bool)
+        for child in where['or']:
+            result |= mask(child, df)
+        return result
+    if where['column'] not in df.columns:
+        raise ValueError(f"Unknown filter column: {where['column']}")
+    return _condition_mask(where, df[where['column']])
+
+
+class ColumnIndex:
+    """Lookup structures over one immutable column version, each built on first use.
+
+    - codes: the column factorized, with rows grouped by value, for equality, IN and
+      null tests (and regexes, which only run over the distinct values);
+    - order: row numbers in value order with the sorted values, for range queries.
+
+    Every lookup returns sorted row numbers and can count its matches without them.
+    """
+
+    def __init__(self, col: pd.Series):
+        self.col = col
+        self._lock = threading.Lock()
+        self._groups: Optional[Tuple[np.ndarray, pd.Index, np.ndarray, np.ndarray]] = None
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._patterns: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+
+    def groups(self):
+        """(row numbers grouped by value, distinct values, group starts, group sizes);
+        group 0 holds the missing values."""
+        with self._lock:
+            if self._groups is None:
+                codes, uniques = pd.factorize(by_value(self.col), use_na_sentinel=True)
+                sizes = np.bincount(codes + 1, minlength=len(uniques) + 1)
+                starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+                self._groups = (np.argsort(codes + 1, kind='stable'), pd.Index(uniques), starts, sizes)
+            return self._groups
+
+    def sorted(self):
+        """(row numbers of present values in value order, the values in that order)."""
+        with self._lock:
+            if self._sorted is None:
+                values = by_value(self.col).reset_index(drop=True)
+                order = values.sort_values(kind='stable', na_position='last').index.to_numpy(dtype=np.int64)
+                order = order[:int(values.notna().sum())]
+                self._sorted = (order, values.to_numpy()[order])
+            return self._sorted
+
+    def _codes(self, cond) -> np.ndarray:
+        """Group numbers (1-based; 0 is missing) an equality, IN, null or regex condition selects."""
+        op = cond['op']
+        _, uniques, _, sizes = self.groups()
+        if op == 'isnull':
+            return np.array([0])
+        if op == 'notnull':
+            return np.arange(1, len(sizes))
+        if op == 'regex':
+            return self._regex_codes(cond['value'], uniques)
+        wanted = [coerce(v, self.col) for v in (cond['values'] if op == 'in' else [cond['value']])]
+        codes = uniques.get_indexer(wanted)
+        return np.unique(codes[codes >= 0]) + 1
+
+    def _regex_codes(self, pattern: str, uniques: pd.Index) -> np.ndarray:
+        with self._lock:
+            if pattern in self._patterns:
+                self._patterns.move_to_end(pattern)
+                return self._patterns[pattern]
+        codes = np.flatnonzero(_search(uniques, pattern)) + 1
+        with self._lock:
+            self._patterns[pattern] = codes
+            while len(self._patterns) > PATTERN_CACHE:
+                self._patterns.popitem(last=False)
+        return codes
+
+    def _range(self, cond) -> Tuple[int, int]:
+        _, values = self.sorted()
+        op = cond['op']
+        lo, hi = 0, len(values)
+        low = cond['min'] if op == 'between' else cond['value'] if op in ('gt', 'ge') else None
+        high = cond['max'] if op == 'between' else cond['value'] if op in ('lt', 'le') else None
+        if low is not None:
+            lo = int(np.searchsorted(values, coerce(low, self.col), side='right' if op == 'gt' else 'left'))
+        if high is not None:
+            hi = int(np.searchsorted(values, coerce(high, self.col), side='left' if op == 'lt' else 'right'))
+        return lo, max(lo, hi)
+
+    def count(self, cond) -> int:
+        if cond['op'] in ('lt', 'le', 'gt', 'ge', 'between'):
+            lo, hi = self._range(cond)
+            return hi - lo
+        sizes = self.groups()[3]
+        if cond['op'] == 'ne':
+            return int(sizes[1:].sum() - sizes[self._codes({**cond, 'op': 'eq'})].sum())
+        return int(sizes[self._codes(cond)].sum())
+
+    def rows(self, cond) -> np.ndarray:
+        """Sorted row numbers matching a condition on this column."""
+        if cond['op'] in ('lt', 'le', 'gt', 'ge', 'between'):
+            lo, hi = self._range(cond)
+            return np.sort(self.sorted()[0][lo:hi])
+        if cond['op'] == 'ne':
+            excluded = self._codes({**cond, 'op': 'eq'})
+            codes = np.setdiff1d(np.arange(1, len(self.groups()[3])), excluded)
+        else:
+            codes = self._codes(cond)
+        grouped, _, starts, sizes = self.groups()
+        if not len(codes):
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([grouped[starts[c]:starts[c] + sizes[c]] for c in codes]))
+
+
+class IndexCache:
+    """ColumnIndex per column version; versions are immutable, so entries never go stale."""
+
+    def __init__(self, capacity: int = INDEX_CACHE_COLUMNS):
+        self.capacity = capacity
+        self._indexes: 'OrderedDict[str, ColumnIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: str, col: pd.Series) -> ColumnIndex:
+        with self._lock:
+            index = self._indexes.get(version)
+            if index is None:
+                index = self._indexes[version] = ColumnIndex(col)
+                while len(self._indexes) > self.capacity:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(version)
+            return index
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+
+def describe(cond: Dict[str, Any]) -> str:
+    if 'and' in cond or 'or' in cond:
+        key = 'and' if 'and' in cond else 'or'
+        return f"({f' {key.upper()} '.join(describe(child) for child in cond[key])})"
+    operand = cond.get('value', cond.get('values', [cond.get('min'), cond.get('max')]))
+    return f"{cond['column']} {cond['op']}" + ('' if cond['op'] in ('isnull', 'notnull') else f" {operand!r}")
+
+
+class Query:
+    """Evaluate a filter expression over indexed columns.
+
+    `index_of(column)` returns the ColumnIndex of a column. AND children run in order
+    of increasing match count (exact, from the indexes), stopping early when nothing
+    is left; once the candidates are few, later conditions are checked on just those
+    rows instead of through their index. `plan` records what ran.
+    """
+
+    def __init__(self, index_of: Callable[[str], ColumnIndex], n_rows: int):
+        self.index_of = index_of
+        self.n_rows = n_rows
+        self.plan: List[Dict[str, Any]] = []
+
+    def estimate(self, where) -> int:
+        if 'and' in where:
+            return min((self.estimate(child) for child in where['and']), default=self.n_rows)
+        if 'or' in where:
+            return min(self.n_rows, sum(self.estimate(child) for child in where['or']))
+        return self.index_of(where['column']).count(where)
+
+    def rows(self, where) -> np.ndarray:
+        """Sorted row numbers matching `where`."""
+        if 'and' in where:
+            children = sorted(where['and'], key=self.estimate)
+            if not children:
+                return np.arange(self.n_rows)
+            result = self.rows(children[0])
+            for child in children[1:]:
+                if not len(result):
+                    self.plan.append({'condition': describe(child), 'via': 'skipped', 'rows': 0})
+                elif len(result) * PROBE_RATIO < self.estimate(child):
+                    result = result[self.probe(child, result)]
+                else:
+                    result = np.intersect1d(result, self.rows(child), assume_unique=True)
+            return result
+        if 'or' in where:
+            result = np.empty(0, dtype=np.int64)
+            for child in where['or']:
+                result = np.union1d(result, self.rows(child))
+            return result
+        rows = self.index_of(where['column']).rows(where)
+        self.plan.append({'condition': describe(where), 'via': 'index', 'rows': int(len(rows))})
+        return rows
+
+    def probe(self, where, candidates: np.ndarray) -> np.ndarray:
+        """Mask over `candidates` of the rows matching `where`, checked row by row."""
+        if 'and' in where or 'or' in where:
+            combine, result = (np.logical_and, np.ones(len(candidates), dtype=bool)) if 'and' in where \
+                else (np.logical_or, np.zeros(len(candidates), dtype=bool))
+            for child in where.get('and', where.get('or')):
+                result = combine(result, self.probe(child, candidates))
+            return result
+        col = self.index_of(where['column']).col.take(candidates)
+        matched = _condition_mask(where, col)
+        self.plan.append({'condition': describe(where), 'via': 'probe', 'rows': int(matched.sum())})
+        return matched
@@ -0,0 +1,332 @@
+import hashlib
+import uuid
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .filters import by_value
+from .jobs import report
+from .transforms import apply_step, fit_step, make_step, needs_fit
+
+
+def new_version(tag: Optional[str] = None, *parts: str) -> str:
+    """Fresh column version; with a `tag` the version is derived deterministically from it and `parts`."""
+    if tag is None:
+        return uuid.uuid4().hex
+    return hashlib.blake2b('\0'.join((tag,) + parts).encode(), digest_size=16).hexdigest()
+
+
+# Column data of every live snapshot by version. A snapshot unpickled from a spill file takes
+# the Series other entries still hold for its versions, so a dataset and its sessions keep
+# sharing buffers after a page-in instead of each holding its own copy
+_live_columns: 'weakref.WeakValueDictionary[str, pd.Series]' = weakref.WeakValueDictionary()
+
+
+class Snapshot:
+    """Immutable, typed column store for one session state.
+
+    Each column is kept as a pandas Series (dtype preserved) tagged with a version
+    token. Deriving a new snapshot reuses the Series and token of every column the
+    transformation did not touch, so undo states share unchanged columns.
+    """
+
+    __slots__ = ('columns', 'data', 'versions', 'sizes')
+
+    def __init__(self, columns: Tuple[str, ...], data: Dict[str, pd.Series], versions: Dict[str, str],
+                 sizes: Optional[Dict[str, int]] = None):
+        self.columns = columns
+        self.data = data
+        self.versions = versions
+        # Memoized bytes per column version (versions are immutable, so sizes never go stale)
+        self.sizes = {v: sizes[v] for v in versions.values() if v in sizes} if sizes else {}
+        for col in columns:
+            _live_columns.setdefault(versions[col], data[col])
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        data = state['data']
+        for col, version in state['versions'].items():
+            data[col] = _live_columns.setdefault(version, data[col])
+        for slot in self.__slots__:
+            setattr(self, slot, state[slot])
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'Snapshot':
+        df = _default_index(df)
+        columns = tuple(df.columns)
+        return cls(columns, {col: df[col] for col in columns}, {col: new_version() for col in columns})
+
+    def derive(self, df: pd.DataFrame, changed: Optional[Iterable[str]] = None,
+               renamed: Optional[Dict[str, str]] = None, tag: Optional[str] = None) -> 'Snapshot':
+        """Snapshot of `df`, sharing columns not listed in `changed` (None means every column changed).
+
+        `renamed` maps old to new names so renamed columns keep their data and version.
+        With a `tag` (the id of the step that produced `df`), new versions are derived
+        from the tag and the parent version, so replaying a step yields the same versions.
+        """
+        changed = set(df.columns if changed is None else changed)
+        origin = {new: old for old, new in (renamed or {}).items()}
+        df = _default_index(df)
+        columns = tuple(df.columns)
+        data, versions = {}, {}
+        for col in columns:
+            source = origin.get(col, col)
+            if col not in changed and source in self.data and len(self.data[source]) == len(df):
+                data[col] = self.data[source]
+                versions[col] = self.versions[source]
+            else:
+                data[col] = df[col]
+                versions[col] = new_version(tag, self.versions.get(source, ''), col)
+        return Snapshot(columns, data, versions, self.sizes)
+
+    def select(self, columns: Iterable[str]) -> 'Snapshot':
+        columns = tuple(columns)
+        return Snapshot(columns, {c: self.data[c] for c in columns}, {c: self.versions[c] for c in columns}, self.sizes)
+
+    def rename(self, mapping: Dict[str, str]) -> 'Snapshot':
+        columns = tuple(mapping.get(c, c) for c in self.columns)
+        data = {mapping.get(c, c): self.data[c] for c in self.columns}
+        versions = {mapping.get(c, c): self.versions[c] for c in self.columns}
+        return Snapshot(columns, data, versions, self.sizes)
+
+    def restore(self, dropped: 'Snapshot', order: Iterable[str]) -> 'Snapshot':
+        """Put previously dropped columns back, in the original column `order`."""
+        columns = tuple(order)
+        data = {**self.data, **dropped.data}
+        versions = {**self.versions, **dropped.versions}
+        return Snapshot(columns, {c: data[c] for c in columns}, {c: versions[c] for c in columns},
+                        {**self.sizes, **dropped.sizes})
+
+    def head(self, rows: int) -> pd.DataFrame:
+        # From the arrays: aligning thousands of Series (one-hot indicators) costs more than copying rows
+        rows = max(0, min(rows, len(self)))
+        return pd.DataFrame({col: self.data[col].array[:rows] for col in self.columns}, index=pd.RangeIndex(rows))
+
+    def take(self, positions) -> pd.DataFrame:
+        """Rows at `positions` (a slice or an array of row numbers), indexed by row number;
+        costs O(len(positions)) whatever the snapshot's size."""
+        if isinstance(positions, slice):
+            return pd.DataFrame({col: self.data[col].iloc[positions] for col in self.columns}, copy=False)
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({col: self.data[col].take(positions) for col in self.columns}, copy=False)
+
+    def sort_order(self, column: str, descending: bool = False) -> np.ndarray:
+        """Row numbers in `column` order (stable, missing values last)."""
+        col = self.data[column]
+        if isinstance(col.dtype, pd.CategoricalDtype) and not col.cat.ordered:
+            col = by_value(col)
+        order = col.sort_values(ascending=not descending, kind='stable', na_position='last').index
+        return np.asarray(order, dtype=np.int64)
+
+    def to_frame(self) -> pd.DataFrame:
+        # copy=False: the frame references the stored columns; pandas copy-on-write
+        # keeps later column assignments from writing back into the snapshot
+        return pd.DataFrame({col: self.data[col] for col in self.columns}, copy=False)
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def memory(self) -> Dict[str, int]:
+        """Bytes held per column version (deep, so string contents are counted)."""
+        for col in self.columns:
+            version = self.versions[col]
+            if version not in self.sizes:
+                self.sizes[version] = int(self.data[col].memory_usage(index=False, deep=True))
+        return {self.versions[col]: self.sizes[self.versions[col]] for col in self.columns}
+
+    def nbytes(self, seen: Optional[set] = None) -> int:
+        """Memory held by this snapshot; columns whose version is in `seen` are not counted again."""
+        seen = set() if seen is None else seen
+        total = 0
+        for version, size in self.memory().items():
+            if version not in seen:
+                seen.add(version)
+                total += size
+        return total
+
+
+# Materialize a checkpoint every CHECKPOINT_EVERY steps, keep at most MAX_CHECKPOINTS
+# of them besides the base, and fold steps older than MAX_STEPS into the base state.
+CHECKPOINT_EVERY = 5
+MAX_CHECKPOINTS = 4
+MAX_STEPS = 50
+# Rows used to validate a step before it is recorded
+PREVIEW_CHECK_ROWS = 100
+
+
+class SessionHistory:
+    """Undo/redo log for one session.
+
+    History is a list of transformation records (action, columns, params, fitted
+    values) plus materialized checkpoints: step 0 is the base data and every
+    CHECKPOINT_EVERY-th state is kept. Any state is rebuilt by replaying records
+    from the nearest checkpoint; drops and renames are undone directly.
+
+    Evaluation is lazy: records are only replayed over the full data when state()
+    is asked for (stats, export) or a step needs a global statistic to fit.
+    Previews apply the pending records to the first rows only.
+    """
+
+    def __init__(self, base: Snapshot, checkpoint_every: int = CHECKPOINT_EVERY,
+                 max_checkpoints: int = MAX_CHECKPOINTS, max_steps: int = MAX_STEPS):
+        self.records: List[Dict[str, Any]] = []
+        # Steps folded into the base by _trim, kept so the full log can replay over other data
+        self.folded: List[Dict[str, Any]] = []
+        self.cursor = 0
+        self.checkpoints: Dict[int, Snapshot] = {0: base}
+        self.checkpoint_every = checkpoint_every
+        self.max_checkpoints = max_checkpoints
+        self.max_steps = max_steps
+        # Last materialized state; records between it and the cursor are pending
+        self._current = base
+        self._current_step = 0
+
+    @property
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.records)
+
+    def state(self) -> Snapshot:
+        """Full snapshot at the cursor, replaying pending records."""
+        self._rewind()
+        while self._current_step < self.cursor:
+            report('replay', total=self.cursor, processed=self._current_step, unit='steps')
+            self._current = self._replay(self._current, self.records[self._current_step])
+            self._current_step += 1
+            self._checkpoint()
+        return self._current
+
+    def preview(self, rows: int) -> pd.DataFrame:
+        """First `rows` rows of the state at the cursor, computed without materializing it."""
+        self._rewind()
+        df = self._current.head(rows)
+        for record in self.records[self._current_step:self.cursor]:
+            df, _, _ = apply_step(df, record)
+        return df
+
+    def apply(self, action: str, columns: List[str], params: Dict[str, Any]):
+        record = make_step(action, columns, params)
+        head = self.preview(PREVIEW_CHECK_ROWS)
+        # Only steps that need a global statistic (mean, vocabulary, ...) see the full data
+        if needs_fit(record):
+            state = self.state()
+            fit_step(state.to_frame(), record, state.versions)
+        else:
+            fit_step(head, record)
+        # Fail here rather than on the next replay if the step cannot apply
+        apply_step(head, record)
+        # Applying after an undo discards the redo branch
+        del self.records[self.cursor:]
+        self.checkpoints = {s: snap for s, snap in self.checkpoints.items() if s <= self.cursor}
+        self.records.append(record)
+        self.cursor += 1
+        self._trim()
+
+    def undo(self):
+        if not self.can_undo:
+            raise ValueError("No history to undo.")
+        record = self.records[self.cursor - 1]
+        if self._current_step == self.cursor and 'restore' in record:
+            # Cheap inverses: no replay needed
+            dropped, order = record['restore']
+            self._current = self._current.restore(dropped, order)
+            self._current_step -= 1
+        elif self._current_step == self.cursor and record.get('inverse') is not None:
+            self._current = self._current.rename(record['inverse'])
+            self._current_step -= 1
+        self.cursor -= 1
+
+    def redo(self):
+        if not self.can_redo:
+            raise ValueError("No history to redo.")
+        self.cursor += 1
+
+    def steps(self) -> List[Dict[str, Any]]:
+        """Every fitted step from the original data to the cursor."""
+        return self.folded + self.records[:self.cursor]
+
+    def snapshots(self) -> List[Snapshot]:
+        """Every snapshot the history keeps alive."""
+        snapshots = list(self.checkpoints.values()) + [self._current]
+        return snapshots + [r['restore'][0] for r in self.records if 'restore' in r]
+
+    def memory(self) -> Dict[str, int]:
+        memory: Dict[str, int] = {}
+        for snapshot in self.snapshots():
+            memory.update(snapshot.memory())
+        return memory
+
+    def nbytes(self) -> int:
+        return history_nbytes(self.snapshots())
+
+    def _rewind(self):
+        # The materialized state is past the cursor (after undo): fall back to a checkpoint
+        if self._current_step > self.cursor:
+            self._current_step = max(s for s in self.checkpoints if s <= self.cursor)
+            self._current = self.checkpoints[self._current_step]
+
+    def _replay(self, snapshot: Snapshot, record: Dict[str, Any]) -> Snapshot:
+        if record['action'] == 'drop':
+            record['restore'] = (snapshot.select(c for c in snapshot.columns if c in record['columns']), snapshot.columns)
+        elif record['action'] == 'rename':
+            record['inverse'] = rename_inverse(snapshot.columns, record['params'].get('rename_map', {}))
+        df, changed, renamed = apply_step(snapshot.to_frame(), record)
+        return snapshot.derive(df, changed, renamed, tag=record['id'])
+
+    def _checkpoint(self):
+        if self._current_step % self.checkpoint_every == 0:
+            self.checkpoints[self._current_step] = self._current
+        extra = sorted(s for s in self.checkpoints if s > 0)
+        for step in extra[:-self.max_checkpoints] if self.max_checkpoints else extra:
+            del self.checkpoints[step]
+
+    def _trim(self):
+        excess = len(self.records) - self.max_steps
+        if excess <= 0 or self.cursor < excess:
+            return
+        # Fold the oldest steps into a new base state
+        saved = self.cursor, self._current, self._current_step
+        self.cursor = excess
+        base = self.state()
+        self.cursor, self._current, self._current_step = saved
+        if self._current_step < excess:
+            self._current, self._current_step = base, excess
+        for record in self.records[:excess]:
+            record.pop('restore', None)
+            record.pop('inverse', None)
+            self.folded.append(record)
+        del self.records[:excess]
+        self.checkpoints = {s - excess: snap for s, snap in self.checkpoints.items() if s > excess}
+        self.checkpoints[0] = base
+        self.cursor -= excess
+        self._current_step -= excess
+
+
+def rename_inverse(columns: Iterable[str], rename_map: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """{new: old} undoing `rename_map` on `columns`: only the names that were present, and
+    None if the rename made two columns share a name (undo then replays from a checkpoint)."""
+    columns = list(columns)
+    effective = {old: new for old, new in rename_map.items() if old in columns and old != new}
+    renamed = [effective.get(c, c) for c in columns]
+    if len(set(renamed)) < len(renamed):
+        return None
+    return {new: old for old, new in effective.items()}
+
+
+def history_nbytes(snapshots: Iterable[Snapshot]) -> int:
+    """Memory held by a list of snapshots, counting each shared column once."""
+    seen: set = set()
+    return sum(snapshot.nbytes(seen) for snapshot in snapshots)
+
+
+def _default_index(df: pd.DataFrame) -> pd.DataFrame:
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        return df
+    return df.reset_index(drop=True)
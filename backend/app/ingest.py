@@ -0,0 +1,229 @@
+import bz2
+import codecs
+import csv
+import gzip
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("dataprepper")
+
+# Parser for whole-file reads: 'pyarrow' (multithreaded) or 'c' (pandas' C parser).
+# Previews (nrows) and chunked reads always use the C parser.
+INGEST_ENGINE = os.environ.get('DATAPREPPER_INGEST_ENGINE', 'pyarrow')
+# Fixed delimiter/encoding for every upload; unset means sniff them from the first bytes
+CSV_DELIMITER = os.environ.get('DATAPREPPER_CSV_DELIMITER') or None
+CSV_ENCODING = os.environ.get('DATAPREPPER_CSV_ENCODING') or None
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 50
+SNIFF_DELIMITERS = ',;\t|'
+
+# Magic bytes of the compressed formats read transparently
+MAGIC = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\x28\xb5\x2f\xfd': 'zstd'}
+ENGINES = ('pyarrow', 'c')
+# Registered datasets get compact dtypes (see compact_frame) only when enabled
+COMPACT_DTYPES = os.environ.get('DATAPREPPER_COMPACT_DTYPES', '0').lower() in ('1', 'true', 'yes')
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+
+class Dialect(NamedTuple):
+    delimiter: str
+    encoding: str
+
+
+def detect_compression(file) -> Optional[str]:
+    file.seek(0)
+    head = file.read(4)
+    file.seek(0)
+    for magic, codec in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def decompressed(file, codec: Optional[str]):
+    """Readable stream of the uncompressed bytes, from the start. Never closes `file`."""
+    file.seek(0)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if codec == 'bz2':
+        return bz2.BZ2File(file, mode='rb')
+    if codec == 'zstd':
+        import pyarrow as pa
+        return pa.input_stream(_KeepOpen(file), compression='zstd')
+    return file
+
+
+class _KeepOpen:
+    """Read-only view of a file that pyarrow may close without closing the file itself."""
+
+    closed = False
+
+    def __init__(self, file):
+        self.file = file
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def sniff(head: bytes, delimiter: Optional[str] = None, encoding: Optional[str] = None) -> Dialect:
+    """Encoding (BOM, then UTF-8, then cp1252) and delimiter of a CSV from its first bytes."""
+    if encoding is None:
+        if head.startswith(b'\xef\xbb\xbf'):
+            encoding = 'utf-8-sig'
+        else:
+            encoding = 'utf-8'
+            try:
+                # Incremental: the sample may end inside a multi-byte character
+                codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            except UnicodeDecodeError:
+                encoding = 'cp1252'
+    if delimiter is None:
+        lines = head.decode(encoding, errors='ignore').splitlines()
+        sample = '\n'.join(lines[:SNIFF_LINES] if len(lines) > SNIFF_LINES else lines[:-1] or lines)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS).delimiter
+        except csv.Error:
+            delimiter = ','
+    return Dialect(delimiter, encoding)
+
+
+@contextmanager
+def _opened(source):
+    # Paths (spooled uploads) are opened here; file-likes are left open for the caller
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        yield source
+
+
+def file_size(file) -> int:
+    try:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        return size
+    except (OSError, AttributeError):
+        return 0
+
+
+def _prepare(file, delimiter, encoding):
+    codec = detect_compression(file)
+    stream = decompressed(file, codec)
+    dialect = sniff(stream.read(SNIFF_BYTES), delimiter or CSV_DELIMITER, encoding or CSV_ENCODING)
+    return codec, decompressed(file, codec), dialect
+
+
+def _log_throughput(engine, codec, nbytes, seconds, rows):
+    mb = nbytes / 1e6
+    rate = mb / seconds if seconds > 0 else float('inf')
+    logger.info(f"ingest engine={engine} codec={codec or 'none'}: {rows} rows, {mb:.2f} MB in {seconds:.3f}s ({rate:.1f} MB/s)")
+
+
+def _read_arrow(stream, dialect: Dialect, usecols: Optional[List[str]]) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    data = pa.py_buffer(stream.read())
+    read_options = pcsv.ReadOptions(use_threads=True,
+                                    encoding='utf8' if dialect.encoding in ('utf-8', 'utf-8-sig') else dialect.encoding)
+    # Quoted fields may span lines; without this pyarrow loses sync at a block boundary
+    parse_options = pcsv.ParseOptions(delimiter=dialect.delimiter, newlines_in_values=True)
+
+    def parse(column_types=None):
+        convert_options = pcsv.ConvertOptions(include_columns=usecols or [], strings_can_be_null=True,
+                                              column_types=column_types or {})
+        return pcsv.read_csv(pa.BufferReader(data), read_options, parse_options, convert_options)
+
+    table = parse()
+    # pandas' parser leaves dates as text and reads empty columns as float; match it
+    temporal = [f.name for f in table.schema if pa.types.is_temporal(f.type)]
+    if temporal:
+        table = parse({name: pa.string() for name in temporal})
+    empty = [i for i, f in enumerate(table.schema) if pa.types.is_null(f.type)]
+    for i in empty:
+        table = table.set_column(i, table.schema[i].name, table.column(i).cast(pa.float64()))
+    return table.to_pandas()
+
+
+def read_csv(source, nrows: Optional[int] = None, usecols: Optional[List[str]] = None, engine: Optional[str] = None,
+             delimiter: Optional[str] = None, encoding: Optional[str] = None) -> pd.DataFrame:
+    """Parse a CSV (plain, .gz, .bz2 or .zst; delimiter and encoding sniffed unless given)."""
+    engine = engine or INGEST_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ingestion engine: {engine}")
+    if nrows is not None:
+        engine = 'c'
+    with _opened(source) as file:
+        nbytes = file_size(file)
+        start = time.perf_counter()
+        codec, stream, dialect = _prepare(file, delimiter, encoding)
+        if engine == 'pyarrow':
+            df = _read_arrow(stream, dialect, usecols)
+        else:
+            df = pd.read_csv(stream, nrows=nrows, usecols=usecols, sep=dialect.delimiter, encoding=dialect.encoding)
+        file.seek(0)
+    if nrows is None:
+        _log_throughput(engine, codec, nbytes, time.perf_counter() - start, len(df))
+    return df
+
+
+def iter_csv(source, chunk_rows: int, usecols: Optional[List[str]] = None, delimiter: Optional[str] = None,
+             encoding: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Row chunks of a CSV with the C parser, decompressed and sniffed like read_csv."""
+    with _opened(source) as file:
+        nbytes = file_size(file)
+        start = time.perf_counter()
+        codec, stream, dialect = _prepare(file, delimiter, encoding)
+        rows = 0
+        # Closed explicitly: a reader dropped mid-file would close the caller's file with it
+        with pd.read_csv(stream, chunksize=chunk_rows, usecols=usecols, sep=dialect.delimiter,
+                         encoding=dialect.encoding) as reader:
+            for chunk in reader:
+                rows += len(chunk)
+                yield chunk
+        _log_throughput('c', codec, nbytes, time.perf_counter() - start, rows)
+
+
+def compact_column(col: pd.Series, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.Series:
+    """Same values in the smallest dtype that holds them exactly.
+
+    Floats stay float64: even values float32 holds exactly would make means, scalers
+    and stats computed from them come out in float32 precision.
+    """
+    dtype = col.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+        return pd.to_numeric(col, downcast='integer')
+    if dtype == object and pd.api.types.infer_dtype(col, skipna=True) not in ('string', 'empty'):
+        return col  # mixed types have no better dtype
+    if pd.api.types.is_string_dtype(dtype):
+        present = col.count()
+        if present and col.nunique() <= category_max_ratio * present:
+            return col.astype('category')
+        return col.astype('str') if dtype == object else col
+    return col
+
+
+def compact_frame(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """Downcast integers, make repetitive text categorical and keep other text in pandas'
+    (Arrow-backed) string dtype."""
+    before = int(df.memory_usage(index=False, deep=True).sum())
+    out = pd.DataFrame({col: compact_column(df[col], category_max_ratio) for col in df.columns}, index=df.index, copy=False)
+    after = int(out.memory_usage(index=False, deep=True).sum())
+    logger.info(f"compact dtypes: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+    return out
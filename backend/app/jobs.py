@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, MutableMapping, Optional
+
+from . import executor
+
+logger = logging.getLogger("dataprepper")
+
+# Finished jobs kept for polling, oldest dropped first
+MAX_FINISHED_JOBS = 200
+TERMINAL = ('done', 'failed', 'cancelled')
+# Seconds between a running job's writes to the shared job records (and its checks for a cancel)
+SHARED_SYNC_SECONDS = 0.5
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """One submitted request: status, progress (phase, processed of total units) and outcome."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.phase: Optional[str] = None
+        self.processed = 0
+        self.total: Optional[int] = None
+        self.unit = 'rows'
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        self.future = None
+        self.synced = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id, 'kind': self.kind, 'status': self.status,
+            'progress': {'phase': self.phase, 'processed': self.processed, 'total': self.total, 'unit': self.unit},
+            'error': self.error, 'created': self.created, 'started': self.started, 'finished': self.finished,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'Job':
+        """Read-only view of a job another worker runs, from its shared record."""
+        job = cls(record['kind'])
+        job.id, job.status, job.error, job.result = record['job_id'], record['status'], record['error'], record['result']
+        job.phase, job.processed, job.total, job.unit = (record['progress'][k] for k in ('phase', 'processed', 'total', 'unit'))
+        job.created, job.started, job.finished = record['created'], record['started'], record['finished']
+        return job
+
+
+jobs: 'OrderedDict[str, Job]' = OrderedDict()
+_jobs_lock = threading.Lock()
+# With several worker processes a poll, cancel or result fetch may reach a worker other than
+# the one running the job; the jobs' state is then mirrored here (job_id -> record) and a
+# cancel from another worker is left as "<job_id>:cancel" for the running worker to pick up
+shared_jobs: Optional[MutableMapping] = None
+
+
+def share_state(records: Optional[MutableMapping]):
+    """Mirror job state into `records` (the shared session backend), or stop with None."""
+    global shared_jobs
+    shared_jobs = records
+
+
+def _publish(job: Job):
+    if shared_jobs is None:
+        return
+    job.synced = time.monotonic()
+    shared_jobs[job.id] = {**job.to_dict(), 'result': job.result if job.status == 'done' else None}
+    if f'{job.id}:cancel' in shared_jobs:
+        job.cancel_requested.set()
+
+
+def current_job() -> Optional[Job]:
+    return getattr(_local, 'job', None)
+
+
+def report(phase: Optional[str] = None, processed: Optional[int] = None, total: Optional[int] = None,
+           unit: Optional[str] = None, advance: int = 0):
+    """Record progress of the job running on this thread and stop it if it was cancelled.
+
+    A no-op outside jobs, so chunked loops can call it unconditionally.
+    """
+    job = current_job()
+    if job is None:
+        return
+    if phase is not None and phase != job.phase:
+        job.phase, job.processed, job.total, job.unit = phase, 0, None, 'rows'
+    if unit is not None:
+        job.unit = unit
+    if total is not None:
+        job.total = total
+    if processed is not None:
+        job.processed = processed
+    job.processed += advance
+    if shared_jobs is not None and time.monotonic() - job.synced > SHARED_SYNC_SECONDS:
+        _publish(job)
+    if job.cancel_requested.is_set():
+        raise JobCancelled()
+
+
+def submit_job(kind: str, fn: Callable, *args, **kwargs) -> Job:
+    """Run `fn(*args, **kwargs)` as a job on the cpu lane; raises ExecutorBusy if the lane is full."""
+    job = Job(kind)
+    job.future = executor.cpu_lane.submit(_run, job, fn, args, kwargs)
+    with _jobs_lock:
+        jobs[job.id] = job
+        _trim()
+        _publish(job)
+    logger.info(f"job {job.id} ({kind}) submitted")
+    return job
+
+
+def get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is not None:
+        return job
+    record = shared_jobs.get(job_id) if shared_jobs is not None else None
+    if record is None:
+        raise KeyError(job_id)
+    return Job.from_record(record)
+
+
+def cancel_job(job_id: str) -> Job:
+    job = get_job(job_id)
+    if job.status in TERMINAL:
+        return job
+    if job_id not in jobs:
+        # Running in another worker, which stops at its next sync
+        shared_jobs[f'{job_id}:cancel'] = True
+        logger.info(f"job {job_id} cancel requested")
+        return job
+    job.cancel_requested.set()
+    if job.future is not None and job.future.cancel():
+        # Never started: nothing to interrupt
+        _finish(job, 'cancelled')
+    logger.info(f"job {job_id} cancel requested")
+    return job
+
+
+def _run(job: Job, fn: Callable, args, kwargs):
+    _publish(job)  # picks up a cancel another worker sent while the job was queued
+    if job.cancel_requested.is_set():
+        _finish(job, 'cancelled')
+        return
+    job.status, job.started = 'running', time.time()
+    _publish(job)
+    _local.job = job
+    try:
+        job.result = fn(*args, **kwargs)
+        _finish(job, 'done')
+    except JobCancelled:
+        _finish(job, 'cancelled')
+    except Exception as e:
+        logger.error(f"job {job.id} ({job.kind}) error: {e}")
+        job.error = str(e)
+        _finish(job, 'failed')
+    finally:
+        _local.job = None
+
+
+def _finish(job: Job, status: str):
+    job.status, job.finished = status, time.time()
+    _publish(job)
+    logger.info(f"job {job.id} ({job.kind}) {status}")
+
+
+def _trim():
+    finished = [job_id for job_id, job in jobs.items() if job.status in TERMINAL]
+    for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del jobs[job_id]
+        if shared_jobs is not None:
+            shared_jobs.pop(job_id, None)
+            shared_jobs.pop(f'{job_id}:cancel', None)
@@ -0,0 +1,224 @@
+import warnings
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Methods of the 'scale' action
+SCALE_METHODS = ('minmax', 'standard', 'robust', 'maxabs', 'log', 'boxcox')
+# Methods of the 'impute' action
+IMPUTE_METHODS = ('mean', 'median', 'mode', 'constant')
+# Box-Cox lambdas tried; the log-likelihood of each is built from mergeable moments,
+# so a chunked fit picks the same lambda as a fit over the whole column
+BOXCOX_LAMBDAS = np.round(np.linspace(-3, 3, 121), 2)
+
+
+def _py(value: Any) -> Any:
+    """Unwrap numpy scalars so fitted values stay plain Python."""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def scale_method(params: Dict[str, Any]) -> str:
+    method = params.get('method') or 'standard'
+    if method not in SCALE_METHODS:
+        raise ValueError(f"Unknown scaling method: {method}")
+    return method
+
+
+def impute_method(params: Dict[str, Any]) -> str:
+    method = params.get('method') or 'mean'
+    if method not in IMPUTE_METHODS:
+        raise ValueError(f"Unknown imputation method: {method}")
+    return method
+
+
+def numeric_block(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """`columns` as one float64 (rows x columns) array, missing values as NaN."""
+    block = np.empty((len(df), len(columns)), dtype='float64')
+    for j, col in enumerate(columns):
+        if not pd.api.types.is_numeric_dtype(df[col].dtype):
+            raise ValueError(f"Column '{col}' is not numeric")
+        block[:, j] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+    return block
+
+
+def _floats(values: np.ndarray) -> List[float]:
+    return [float(v) for v in values]
+
+
+class Moments:
+    """Count, mean, M2, min and max of each column of float blocks, merged with Chan's formula."""
+
+    def __init__(self, width: int):
+        self.count = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, block: np.ndarray):
+        present = ~np.isnan(block)
+        n = present.sum(axis=0).astype('float64')
+        if not n.any():
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, np.where(present, block, 0.0).sum(axis=0) / n, 0.0)
+            m2 = np.where(present, (block - mean) ** 2, 0.0).sum(axis=0)
+            total = self.count + n
+            delta = mean - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * n / total, self.mean)
+            self.m2 = np.where(n > 0, self.m2 + m2 + delta ** 2 * self.count * n / total, self.m2)
+        self.min = np.fmin(self.min, np.where(present, block, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(present, block, -np.inf).max(axis=0))
+        self.count = total
+
+    def _seen(self, values: np.ndarray) -> List[float]:
+        return _floats(np.where(self.count > 0, values, np.nan))
+
+    def means(self) -> List[float]:
+        return self._seen(self.mean)
+
+    def params(self, method: str) -> List[Dict[str, float]]:
+        if method == 'minmax':
+            return [{'min': lo, 'max': hi} for lo, hi in zip(self._seen(self.min), self._seen(self.max))]
+        if method == 'maxabs':
+            return [{'maxabs': m} for m in self._seen(np.fmax(np.abs(self.min), np.abs(self.max)))]
+        # Population std, matching sklearn's StandardScaler
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / self.count)
+        return [{'mean': m, 'std': s} for m, s in zip(self.means(), _floats(std))]
+
+
+class BoxCox:
+    """Box-Cox log-likelihood of every lambda in BOXCOX_LAMBDAS, accumulated block by block."""
+
+    def __init__(self, width: int):
+        self.log_sum = np.zeros(width)
+        self.positive = np.ones(width, dtype=bool)
+        self.moments = [Moments(width) for _ in BOXCOX_LAMBDAS]
+
+    def update(self, block: np.ndarray):
+        with np.errstate(invalid='ignore'):
+            self.positive &= ~(block <= 0).any(axis=0)
+        logs = np.log(np.where(block > 0, block, np.nan))
+        self.log_sum += np.where(np.isnan(logs), 0.0, logs).sum(axis=0)
+        for lam, moments in zip(BOXCOX_LAMBDAS, self.moments):
+            with np.errstate(over='ignore', invalid='ignore'):
+                moments.update(logs if lam == 0 else np.expm1(lam * logs) / lam)
+
+    def params(self, columns: List[str]) -> List[Dict[str, float]]:
+        for col, positive in zip(columns, self.positive):
+            if not positive:
+                raise ValueError(f"Box-Cox scaling needs positive values; '{col}' has values <= 0")
+        n = self.moments[0].count
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            llf = np.array([(lam - 1) * self.log_sum - n / 2 * np.log(m.m2 / n)
+                            for lam, m in zip(BOXCOX_LAMBDAS, self.moments)])
+        llf[~np.isfinite(llf)] = -np.inf
+        return [{'lambda': float(lam)} for lam in BOXCOX_LAMBDAS[np.argmax(llf, axis=0)]]
+
+
+class ScaleAccumulator:
+    """Scaler parameters of `columns`, fitted from one float block or merged over chunks.
+
+    Robust scaling needs quantiles, which do not merge from moments; chunked fits count
+    values instead (see chunked.ColumnAggregate.quantile).
+    """
+
+    def __init__(self, columns: List[str], method: str):
+        if method == 'robust':
+            raise ValueError("Robust scaling is fitted from quantiles, not moments")
+        self.columns, self.method = list(columns), method
+        self.stats = BoxCox(len(columns)) if method == 'boxcox' else Moments(len(columns))
+
+    def update(self, chunk: pd.DataFrame):
+        block = numeric_block(chunk, self.columns)
+        if self.method != 'log':
+            self.stats.update(block)
+
+    def fitted(self) -> Dict[str, Dict[str, float]]:
+        if self.method == 'log':
+            return {col: {} for col in self.columns}
+        params = self.stats.params(self.columns) if self.method == 'boxcox' else self.stats.params(self.method)
+        return dict(zip(self.columns, params))
+
+
+def quantiles(block: np.ndarray, qs) -> np.ndarray:
+    """(len(qs) x columns) quantiles ignoring NaN, interpolated linearly like Series.quantile."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns give NaN
+        return np.nanquantile(block, qs, axis=0)
+
+
+def robust_params(q1: float, median: float, q3: float) -> Dict[str, float]:
+    return {'median': float(median), 'iqr': float(q3 - q1)}
+
+
+def fit_scale(df: pd.DataFrame, columns: List[str], params: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Scaler parameters of every column, from one NaN-aware pass over a float block of them all."""
+    method = scale_method(params)
+    if method == 'robust':
+        q1, median, q3 = quantiles(numeric_block(df, columns), [0.25, 0.5, 0.75])
+        return {col: robust_params(*qs) for col, qs in zip(columns, zip(q1, median, q3))}
+    accumulator = ScaleAccumulator(columns, method)
+    accumulator.update(df)
+    return accumulator.fitted()
+
+
+def _divisor(value: float) -> float:
+    # Constant (or empty) columns keep their offset instead of dividing by zero
+    return value if value and value == value else 1.0
+
+
+def _offsets(method: str, fitted: List[Dict[str, float]]):
+    if method == 'minmax':
+        return [p['min'] for p in fitted], [_divisor(p['max'] - p['min']) for p in fitted]
+    if method == 'standard':
+        return [p['mean'] for p in fitted], [_divisor(p['std']) for p in fitted]
+    if method == 'robust':
+        return [p['median'] for p in fitted], [_divisor(p['iqr']) for p in fitted]
+    return [0.0] * len(fitted), [_divisor(p['maxabs']) for p in fitted]
+
+
+def apply_scale(df: pd.DataFrame, columns: List[str], params: Dict[str, Any],
+                fitted: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    """Scale `columns` of `df` with fitted parameters.
+
+    The columns are copied once into a float64 block (so downcast integers cannot overflow),
+    transformed there in place and written back; values outside a log's domain become NaN.
+    """
+    method = scale_method(params)
+    block = numeric_block(df, columns)
+    p = [fitted[col] for col in columns]
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        if method == 'log':
+            block[block <= -1] = np.nan
+            np.log1p(block, out=block)
+        elif method == 'boxcox':
+            block[block <= 0] = np.nan
+            np.log(block, out=block)
+            lam = np.array([q['lambda'] for q in p])
+            shaped = lam != 0
+            block[:, shaped] = np.expm1(block[:, shaped] * lam[shaped]) / lam[shaped]
+        else:
+            shift, scale = _offsets(method, p)
+            np.subtract(block, np.array(shift, dtype='float64'), out=block)
+            np.divide(block, np.array(scale, dtype='float64'), out=block)
+    for j, col in enumerate(columns):
+        df[col] = block[:, j]
+    return df
+
+
+def fit_impute(df: pd.DataFrame, columns: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill value of every column; means and medians come from one float block of them all."""
+    method = impute_method(params)
+    if method == 'constant':
+        return {col: params.get('value', None) for col in columns}
+    if method == 'mode':
+        return {col: _py(df[col].mode().iloc[0]) if df[col].notna().any() else None for col in columns}
+    block = numeric_block(df, columns)
+    if method == 'mean':
+        moments = Moments(len(columns))
+        moments.update(block)
+        return dict(zip(columns, moments.means()))
+    return dict(zip(columns, _floats(quantiles(block, 0.5))))
@@ -1,8 +1,16 @@
+import asyncio
+import io
+import json
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .crud import preview_csv, impute_missing, encode_categorical, scale_numeric, drop_columns, filter_rows, rename_columns, change_dtypes, drop_duplicates, drop_columns_with_cache, restore_dropped_columns, generate_session_id, apply_transformation, undo_last_transformation, get_column_stats
+from fastapi.responses import JSONResponse, StreamingResponse
+from .crud import register_dataset, get_dataset, sample_info, create_dataset_session, preview_csv, impute_missing, encode_categorical, scale_numeric, drop_columns, filter_rows, rename_columns, change_dtypes, drop_duplicates, drop_columns_with_cache, restore_dropped_columns, pipeline_preview, generate_session_id, apply_transformation, undo_last_transformation, redo_transformation, get_column_stats, session_rows, export_session, column_memory, duplicate_stats, save_session_pipeline, load_pipeline, apply_pipeline
 from .models import PreviewResponse
+from .executor import ExecutorBusy, run_cpu, run_io
+from .jobs import submit_job, get_job, cancel_job, TERMINAL
+from .export import media_type, file_extension
+from .serialize import payload, respond
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("dataprepper")
@@ -18,199 +26,329 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Blocking pandas work runs on the executor lanes, never on the event loop; a saturated
+# lane or a timed-out request answers 429/503 instead of stalling everyone else
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request, exc: ExecutorBusy):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+def resolve_source(file: UploadFile = None, dataset_id: str = None, required: bool = True):
+    """Pick the data an endpoint works on: a registered dataset by id, else the uploaded file."""
+    if dataset_id:
+        return get_dataset(dataset_id)
+    if file is not None:
+        return file.file
+    if required:
+        raise ValueError("Either file or dataset_id is required.")
+    return None
+
+def describe_source(file: UploadFile = None, dataset_id: str = None):
+    return f"dataset_id={dataset_id}" if dataset_id else f"file={file.filename if file else None}"
+
+@app.post("/upload")
+async def upload(
+    file: UploadFile = File(...),
+    sample_size: int = Form(None),
+    seed: int = Form(0),
+    stratify_by: str = Form(None),
+    delimiter: str = Form(None),
+    encoding: str = Form(None),
+    compact: bool = Form(None)
+):
+    logger.info(f"/upload called with file={file.filename}, sample_size={sample_size}, seed={seed}, stratify_by={stratify_by}, delimiter={delimiter!r}, encoding={encoding}, compact={compact}")
+    try:
+        dataset_id, df = await run_io(register_dataset, file.file, sample_size, seed, stratify_by, delimiter, encoding, compact)
+        logger.info(f"/upload success: dataset_id={dataset_id}, shape={df.shape}")
+        return {"dataset_id": dataset_id, "columns": df.columns.tolist(), "n_rows": len(df), "sample": sample_info(dataset_id)}
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/upload error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/preview", response_model=PreviewResponse)
-async def preview(file: UploadFile = File(...), rows: int = 5):
-    logger.info(f"/preview called with file={file.filename}, rows={rows}")
+async def preview(request: Request, file: UploadFile = File(None), dataset_id: str = Form(None), rows: int = 5):
+    logger.info(f"/preview called with {describe_source(file, dataset_id)}, rows={rows}")
     try:
-        columns, data = preview_csv(file.file, rows)
-        logger.info(f"/preview success: columns={columns}")
-        return PreviewResponse(columns=columns, data=data)
+        head = await run_io(preview_csv, resolve_source(file, dataset_id), rows)
+        logger.info(f"/preview success: columns={head.columns.tolist()}")
+        return respond(request, head, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/preview error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/impute", response_model=PreviewResponse)
 async def impute(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     method: str = Form(...),
     columns: str = Form(...),
     value: str = Form(None),
     rows: int = 5
 ):
-    logger.info(f"/impute called with file={file.filename}, method={method}, columns={columns}, value={value}, rows={rows}")
+    logger.info(f"/impute called with {describe_source(file, dataset_id)}, method={method}, columns={columns}, value={value}, rows={rows}")
     try:
         import json
         columns_list = json.loads(columns) if columns.startswith('[') else [columns]
-        columns, data = impute_missing(file.file, columns_list, method, value, rows)
-        logger.info(f"/impute success: columns={columns}")
-        return PreviewResponse(columns=columns, data=data)
+        preview = await run_cpu(impute_missing, resolve_source(file, dataset_id), columns_list, method, value, rows)
+        logger.info(f"/impute success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/impute error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/encode", response_model=PreviewResponse)
 async def encode(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     method: str = Form(...),
     columns: str = Form(...),
+    top_k: int = Form(None),
+    n_features: int = Form(None),
     rows: int = 5
 ):
-    logger.info(f"/encode called with file={file.filename}, method={method}, columns={columns}, rows={rows}")
+    """Encode categorical columns: onehot, ordinal, topk (top_k categories plus "other"),
+    hash (n_features buckets), frequency or count. Indicator columns are sparse."""
+    logger.info(f"/encode called with {describe_source(file, dataset_id)}, method={method}, columns={columns}, top_k={top_k}, n_features={n_features}, rows={rows}")
     try:
         import json
         columns_list = json.loads(columns) if columns.startswith('[') else [columns]
-        columns, data = encode_categorical(file.file, columns_list, method, rows)
-        logger.info(f"/encode success: columns={columns}")
-        return PreviewResponse(columns=columns, data=data)
+        preview = await run_cpu(encode_categorical, resolve_source(file, dataset_id), columns_list, method, rows,
+                                top_k, n_features, dataset_id or None)
+        logger.info(f"/encode success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/encode error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/scale", response_model=PreviewResponse)
 async def scale(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     method: str = Form(...),
     columns: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/scale called with file={file.filename}, method={method}, columns={columns}, rows={rows}")
+    """Scale numeric columns: minmax, standard, robust (median and IQR), maxabs, log (log1p)
+    or boxcox (lambda fitted by maximum likelihood). Unknown methods are rejected."""
+    logger.info(f"/scale called with {describe_source(file, dataset_id)}, method={method}, columns={columns}, rows={rows}")
     try:
         import json
         columns_list = json.loads(columns) if columns.startswith('[') else [columns]
-        columns, data = scale_numeric(file.file, columns_list, method, rows)
-        logger.info(f"/scale success: columns={columns}")
-        return PreviewResponse(columns=columns, data=data)
+        preview = await run_cpu(scale_numeric, resolve_source(file, dataset_id), columns_list, method, rows)
+        logger.info(f"/scale success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/scale error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/drop_columns", response_model=PreviewResponse)
 async def drop_columns_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     columns: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/drop_columns called with file={file.filename}, columns={columns}, rows={rows}")
+    logger.info(f"/drop_columns called with {describe_source(file, dataset_id)}, columns={columns}, rows={rows}")
     try:
         import json
         columns_list = json.loads(columns) if columns.startswith('[') else [columns]
-        cols, data = drop_columns(file.file, columns_list, rows)
-        logger.info(f"/drop_columns success: columns={cols}")
-        return PreviewResponse(columns=cols, data=data)
+        preview = await run_cpu(drop_columns, resolve_source(file, dataset_id), columns_list, rows)
+        logger.info(f"/drop_columns success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/drop_columns error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/filter_rows", response_model=PreviewResponse)
 async def filter_rows_endpoint(
-    file: UploadFile = File(...),
-    column: str = Form(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
+    column: str = Form(None),
     value: str = Form(None),
     min_value: str = Form(None),
     max_value: str = Form(None),
     regex: str = Form(None),
+    where: str = Form(None),
     rows: int = 5
 ):
-    logger.info(f"/filter_rows called with file={file.filename}, column={column}, value={value}, min_value={min_value}, max_value={max_value}, regex={regex}, rows={rows}")
+    """Rows matching conditions on one column, or a JSON `where` expression such as
+    {"and": [{"column": "x", "op": "gt", "value": 3}, {"or": [...]}]}."""
+    logger.info(f"/filter_rows called with {describe_source(file, dataset_id)}, column={column}, value={value}, min_value={min_value}, max_value={max_value}, regex={regex}, where={where}, rows={rows}")
     try:
-        cols, data = filter_rows(file.file, column, value, min_value, max_value, regex, rows)
-        logger.info(f"/filter_rows success: columns={cols}")
-        return PreviewResponse(columns=cols, data=data)
+        if column is None and where is None:
+            raise ValueError("Either column or where is required.")
+        source = None if dataset_id else resolve_source(file, dataset_id)
+        preview, matched = await run_cpu(filter_rows, source, column, value, min_value, max_value, regex, rows,
+                                         where, dataset_id or None)
+        logger.info(f"/filter_rows success: columns={preview.columns.tolist()}, matched={matched}")
+        return respond(request, preview, matched_rows=matched, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/filter_rows error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/rename_columns", response_model=PreviewResponse)
 async def rename_columns_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     rename_map: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/rename_columns called with file={file.filename}, rename_map={rename_map}, rows={rows}")
+    logger.info(f"/rename_columns called with {describe_source(file, dataset_id)}, rename_map={rename_map}, rows={rows}")
     try:
         import json
         rename_map_dict = json.loads(rename_map)
-        cols, data = rename_columns(file.file, rename_map_dict, rows)
-        logger.info(f"/rename_columns success: columns={cols}")
-        return PreviewResponse(columns=cols, data=data)
+        preview = await run_cpu(rename_columns, resolve_source(file, dataset_id), rename_map_dict, rows)
+        logger.info(f"/rename_columns success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/rename_columns error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/change_dtypes", response_model=PreviewResponse)
 async def change_dtypes_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     dtype_map: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/change_dtypes called with file={file.filename}, dtype_map={dtype_map}, rows={rows}")
+    logger.info(f"/change_dtypes called with {describe_source(file, dataset_id)}, dtype_map={dtype_map}, rows={rows}")
     try:
         import json
         dtype_map_dict = json.loads(dtype_map)
-        cols, data = change_dtypes(file.file, dtype_map_dict, rows)
-        logger.info(f"/change_dtypes success: columns={cols}")
-        return PreviewResponse(columns=cols, data=data)
+        preview = await run_cpu(change_dtypes, resolve_source(file, dataset_id), dtype_map_dict, rows)
+        logger.info(f"/change_dtypes success: columns={preview.columns.tolist()}")
+        return respond(request, preview, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/change_dtypes error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/drop_duplicates", response_model=PreviewResponse)
 async def drop_duplicates_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     subset: str = Form(None),
+    keep: str = Form('first'),
+    verify: bool = Form(False),
     rows: int = 5
 ):
-    logger.info(f"/drop_duplicates called with file={file.filename}, subset={subset}, rows={rows}")
+    """Rows left after dropping duplicates (keep first, last or none of each), with the
+    duplicate count and ratio; `verify` compares the values of rows whose hashes match."""
+    logger.info(f"/drop_duplicates called with {describe_source(file, dataset_id)}, subset={subset}, keep={keep}, verify={verify}, rows={rows}")
     try:
         import json
         subset_list = json.loads(subset) if subset else None
-        cols, data = drop_duplicates(file.file, subset_list, rows)
-        logger.info(f"/drop_duplicates success: columns={cols}")
-        return PreviewResponse(columns=cols, data=data)
+        preview, duplicates = await run_cpu(drop_duplicates, resolve_source(file, dataset_id), subset_list, rows, keep, verify)
+        logger.info(f"/drop_duplicates success: columns={preview.columns.tolist()}, duplicates={duplicates['duplicate_rows']}")
+        return respond(request, preview, duplicates=duplicates, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/drop_duplicates error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/drop_columns_with_cache")
 async def drop_columns_with_cache_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     columns: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/drop_columns_with_cache called with file={file.filename}, columns={columns}, rows={rows}")
+    logger.info(f"/drop_columns_with_cache called with {describe_source(file, dataset_id)}, columns={columns}, rows={rows}")
     try:
         import json
         columns_list = json.loads(columns) if columns.startswith('[') else [columns]
-        cols, data, op_id = drop_columns_with_cache(file.file, columns_list, rows)
-        logger.info(f"/drop_columns_with_cache success: columns={cols}, op_id={op_id}")
-        return {"columns": cols, "data": data, "operation_id": op_id}
+        preview, op_id = await run_cpu(drop_columns_with_cache, resolve_source(file, dataset_id), columns_list, rows)
+        logger.info(f"/drop_columns_with_cache success: columns={preview.columns.tolist()}, op_id={op_id}")
+        return respond(request, preview, operation_id=op_id)
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/drop_columns_with_cache error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/restore_dropped_columns")
 async def restore_dropped_columns_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     operation_id: str = Form(...),
     rows: int = 5
 ):
-    logger.info(f"/restore_dropped_columns called with file={file.filename}, operation_id={operation_id}, rows={rows}")
+    logger.info(f"/restore_dropped_columns called with {describe_source(file, dataset_id)}, operation_id={operation_id}, rows={rows}")
     try:
-        cols, data = restore_dropped_columns(file.file, operation_id, rows)
-        logger.info(f"/restore_dropped_columns success: columns={cols}")
-        return {"columns": cols, "data": data}
+        preview = await run_cpu(restore_dropped_columns, resolve_source(file, dataset_id), operation_id, rows)
+        logger.info(f"/restore_dropped_columns success: columns={preview.columns.tolist()}")
+        return respond(request, preview)
+    except ExecutorBusy:
+        raise
     except Exception as e:
         logger.error(f"/restore_dropped_columns error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/pipeline")
+async def pipeline_endpoint(
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
+    steps: str = Form(...),
+    optimize: bool = Form(True),
+    rows: int = 5
+):
+    """Run an ordered list of steps over one parsed frame; returns the executed plan with per-step timings."""
+    logger.info(f"/pipeline called with {describe_source(file, dataset_id)}, steps={steps}, optimize={optimize}, rows={rows}")
+    try:
+        steps_list = json.loads(steps)
+        preview, n_rows, summary = await run_cpu(pipeline_preview, resolve_source(file, dataset_id), steps_list, optimize, rows)
+        logger.info(f"/pipeline success: columns={preview.columns.tolist()}, n_rows={n_rows}")
+        return respond(request, preview, n_rows=n_rows, **summary, sample=sample_info(dataset_id))
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/pipeline error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/create_session")
-async def create_session(file: UploadFile = File(...)):
-    session_id = generate_session_id(file.file)
+async def create_session(file: UploadFile = File(None), dataset_id: str = Form(None)):
+    if dataset_id:
+        session_id = await run_io(create_dataset_session, dataset_id)
+    elif file is not None:
+        session_id = await run_io(generate_session_id, file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Either file or dataset_id is required.")
     return {"session_id": session_id}
 
 @app.post("/apply_transformation")
 async def apply_transformation_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     session_id: str = Form(...),
     action: str = Form(...),
     columns: str = Form(...),
@@ -220,22 +358,248 @@ async def apply_transformation_endpoint(
     import json
     columns_list = json.loads(columns) if columns.startswith('[') else [columns]
     params_dict = json.loads(params) if params else {}
-    cols, data, can_undo = apply_transformation(file.file, session_id, action, columns_list, params_dict, rows)
-    return {"columns": cols, "data": data, "can_undo": can_undo}
+    preview, can_undo, can_redo = await run_cpu(apply_transformation, resolve_source(file, dataset_id, required=False), session_id, action, columns_list, params_dict, rows)
+    return respond(request, preview, can_undo=can_undo, can_redo=can_redo, sample=sample_info(session_id=session_id))
 
 @app.post("/undo")
 async def undo_endpoint(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     session_id: str = Form(...),
     rows: int = 5
 ):
-    cols, data, can_undo = undo_last_transformation(file.file, session_id, rows)
-    return {"columns": cols, "data": data, "can_undo": can_undo}
+    preview, can_undo, can_redo = await run_cpu(undo_last_transformation, resolve_source(file, dataset_id, required=False), session_id, rows)
+    return respond(request, preview, can_undo=can_undo, can_redo=can_redo, sample=sample_info(session_id=session_id))
+
+@app.post("/redo")
+async def redo_endpoint(
+    request: Request,
+    session_id: str = Form(...),
+    rows: int = 5
+):
+    preview, can_undo, can_redo = await run_cpu(redo_transformation, session_id, rows)
+    return respond(request, preview, can_undo=can_undo, can_redo=can_redo, sample=sample_info(session_id=session_id))
 
 @app.post("/column_stats")
 async def column_stats_endpoint(
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
+    session_id: str = Form(None),
+    approximate: bool = Form(False),
+    duplicates: bool = Form(False),
+    subset: str = Form(None),
+    verify: bool = Form(False)
+):
+    """Per-column stats; with `duplicates`, also the duplicate row count and ratio over `subset`."""
+    source = resolve_source(file, dataset_id, required=False)
+    stats = await run_cpu(get_column_stats, source, session_id=session_id, approximate=approximate)
+    memory = await run_cpu(column_memory, dataset_id, session_id)
+    body = {"stats": stats, "sample": sample_info(dataset_id, session_id), "memory": memory}
+    if duplicates:
+        try:
+            body["duplicates"] = await run_cpu(duplicate_stats, source, session_id, json.loads(subset) if subset else None, verify)
+        except ExecutorBusy:
+            raise
+        except Exception as e:
+            logger.error(f"/column_stats error: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+    return body
+
+
+@app.get("/rows")
+async def rows_endpoint(request: Request, session_id: str, offset: int = 0, limit: int = 100, sort: str = None,
+                        descending: bool = False, where: str = None):
+    """A window of the session's current state for virtual scrolling, optionally sorted by one
+    column and limited to the rows matching a JSON filter expression `where`."""
+    try:
+        window, total, plan = await run_cpu(session_rows, session_id, offset, limit, sort, descending, where)
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/rows error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond(request, window, positions=window.index.tolist(), offset=offset, total_rows=total, sort=sort,
+                   descending=descending, plan=plan, sample=sample_info(session_id=session_id))
+
+
+@app.get("/export")
+async def export_endpoint(session_id: str, format: str = 'csv', compression: str = None):
+    """Stream the session's current state as CSV (optionally gzip/zstd), Parquet or Arrow/Feather."""
+    logger.info(f"/export called with session_id={session_id}, format={format}, compression={compression}")
+    try:
+        chunks = await run_cpu(export_session, session_id, format, compression)
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/export error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"processed_data.{file_extension(format, compression)}"
+    return StreamingResponse(chunks, media_type=media_type(format, compression),
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.post("/save_pipeline")
+async def save_pipeline_endpoint(session_id: str = Form(...)):
+    """Save the session's transformation history, with its fitted values, as a reusable pipeline."""
+    logger.info(f"/save_pipeline called with session_id={session_id}")
+    try:
+        artifact = await run_io(save_session_pipeline, session_id)
+        logger.info(f"/save_pipeline success: pipeline_id={artifact['pipeline_id']}")
+        return artifact
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/save_pipeline error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/pipelines/{pipeline_id}")
+async def get_pipeline_endpoint(pipeline_id: str):
+    try:
+        return await run_io(load_pipeline, pipeline_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/apply_pipeline")
+async def apply_pipeline_endpoint(
     file: UploadFile = File(...),
+    pipeline_id: str = Form(None),
+    pipeline: str = Form(None),
+    format: str = Form('csv'),
+    compression: str = Form(None)
+):
+    """Stream a new CSV through a saved (pipeline_id) or uploaded (pipeline JSON) fitted pipeline."""
+    logger.info(f"/apply_pipeline called with file={file.filename}, pipeline_id={pipeline_id}, format={format}, compression={compression}")
+    try:
+        if not pipeline_id and not pipeline:
+            raise ValueError("Either pipeline_id or pipeline is required.")
+        artifact = json.loads(pipeline) if pipeline else None
+        chunks = await run_io(apply_pipeline, file.file, pipeline_id, artifact, format, compression)
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/apply_pipeline error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"transformed_data.{file_extension(format, compression)}"
+    return StreamingResponse(chunks, media_type=media_type(format, compression),
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def _columns_param(columns):
+    if isinstance(columns, list):
+        return columns
+    return json.loads(columns) if columns.startswith('[') else [columns]
+
+def run_job_kind(kind, file_bytes, dataset_id, session_id, params):
+    """Body the matching endpoint would return for `kind`, computed inside a job."""
+    source = io.BytesIO(file_bytes) if file_bytes is not None else None
+    if dataset_id:
+        source = get_dataset(dataset_id)
+    rows = int(params.get('rows', 5))
+    sample = sample_info(dataset_id, session_id)
+    if kind == 'preview':
+        preview = preview_csv(source, rows)
+    elif kind == 'impute':
+        preview = impute_missing(source, _columns_param(params['columns']), params['method'], params.get('value'), rows)
+    elif kind == 'encode':
+        preview = encode_categorical(source, _columns_param(params['columns']), params['method'], rows,
+                                     params.get('top_k'), params.get('n_features'), dataset_id or None)
+    elif kind == 'scale':
+        preview = scale_numeric(source, _columns_param(params['columns']), params['method'], rows)
+    elif kind == 'drop_columns':
+        preview = drop_columns(source, _columns_param(params['columns']), rows)
+    elif kind == 'filter_rows':
+        preview, matched = filter_rows(source, params.get('column'), params.get('value'), params.get('min_value'),
+                                       params.get('max_value'), params.get('regex'), rows, params.get('where'),
+                                       dataset_id or None)
+        return payload(preview, matched_rows=matched, sample=sample)
+    elif kind == 'rename_columns':
+        preview = rename_columns(source, params['rename_map'], rows)
+    elif kind == 'change_dtypes':
+        preview = change_dtypes(source, params['dtype_map'], rows)
+    elif kind == 'drop_duplicates':
+        preview, duplicates = drop_duplicates(source, params.get('subset'), rows, params.get('keep', 'first'),
+                                              params.get('verify', False))
+        return payload(preview, duplicates=duplicates, sample=sample)
+    elif kind == 'pipeline':
+        preview, n_rows, summary = pipeline_preview(source, params['steps'], params.get('optimize', True), rows)
+        return payload(preview, n_rows=n_rows, **summary, sample=sample)
+    elif kind in ('apply_transformation', 'undo', 'redo'):
+        if kind == 'apply_transformation':
+            result = apply_transformation(source, session_id, params['action'], _columns_param(params['columns']),
+                                          params.get('params', {}), rows)
+        elif kind == 'undo':
+            result = undo_last_transformation(source, session_id, rows)
+        else:
+            result = redo_transformation(session_id, rows)
+        preview, can_undo, can_redo = result
+        return payload(preview, can_undo=can_undo, can_redo=can_redo, sample=sample)
+    elif kind == 'column_stats':
+        stats = get_column_stats(source, session_id=session_id, approximate=bool(params.get('approximate', False)))
+        return {"stats": stats, "sample": sample, "memory": column_memory(dataset_id, session_id)}
+    else:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return payload(preview, sample=sample)
+
+def find_job(job_id):
+    try:
+        return get_job(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+
+@app.post("/jobs", status_code=202)
+async def submit_job_endpoint(
+    kind: str = Form(...),
+    params: str = Form('{}'),
+    file: UploadFile = File(None),
+    dataset_id: str = Form(None),
     session_id: str = Form(None)
 ):
-    stats = get_column_stats(file.file, session_id=session_id)
-    return {"stats": stats}
+    logger.info(f"/jobs called with kind={kind}, {describe_source(file, dataset_id)}, session_id={session_id}, params={params}")
+    try:
+        params_dict = json.loads(params) if params else {}
+        # The upload is closed once this request returns, so the job gets its bytes
+        file_bytes = await file.read() if file is not None else None
+        job = submit_job(kind, run_job_kind, kind, file_bytes, dataset_id, session_id, params_dict)
+        return job.to_dict()
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"/jobs error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    return find_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_endpoint(job_id: str, interval: float = 0.5):
+    """Progress as newline-delimited JSON, one line per change, until the job finishes."""
+    find_job(job_id)
+
+    async def events():
+        last = None
+        while True:
+            # Looked up each time: a job run by another worker is a copy of its shared record
+            job = find_job(job_id)
+            state = job.to_dict()
+            if state != last:
+                yield json.dumps(state) + "\n"
+                last = state
+            if job.status in TERMINAL:
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str):
+    find_job(job_id)
+    return cancel_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def job_result_endpoint(job_id: str):
+    job = find_job(job_id)
+    if job.status == 'failed':
+        raise HTTPException(status_code=400, detail=job.error)
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return job.result
@@ -1,9 +1,10 @@
 from pydantic import BaseModel
-from typing import List, Any
+from typing import List, Any, Optional
 
 class PreviewResponse(BaseModel):
     columns: List[str]
     data: List[List[Any]]
+    sample: Optional[dict] = None  # set when the data is a row sample of a larger upload
 
 class ImputeRequest(BaseModel):
     method: str  # 'mean', 'median', 'mode', or 'constant'
@@ -0,0 +1,385 @@
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from .dedup import drop_rows, find_duplicates
+from .encoders import EXPANDING_METHODS, encode_method, generated_columns
+from .filters import columns_of, mask, parse_where, where_from_params
+from .jobs import report
+from .transforms import HISTORY_ACTIONS, apply_step, fit_step, make_step, needs_fit
+
+logger = logging.getLogger("dataprepper")
+
+# Row-level actions a pipeline runs besides the history actions
+ROW_ACTIONS = ('filter', 'drop_duplicates')
+PIPELINE_ACTIONS = HISTORY_ACTIONS + ROW_ACTIONS
+FILTER_PARAMS = ('value', 'min_value', 'max_value', 'regex')
+# Format version of saved fitted pipelines (see to_artifact)
+ARTIFACT_VERSION = 1
+
+
+def make_pipeline(steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Step dicts (as transforms.make_step builds them) from a JSON list of
+    {action, columns, params}; each remembers its position in `source`."""
+    pipeline = []
+    for i, raw in enumerate(steps):
+        action = raw.get('action')
+        if action not in PIPELINE_ACTIONS:
+            raise ValueError(f"Step {i}: unknown action {action!r}")
+        columns = raw.get('columns') or []
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        params = dict(raw.get('params') or {})
+        if action == 'rename':
+            columns = list(params.get('rename_map', {}))
+        elif action == 'change_dtypes':
+            columns = list(params.get('dtype_map', {}))
+        if action == 'filter' and 'where' in params:
+            params['where'] = parse_where(params['where'])
+            columns = columns_of(params['where'])
+        elif action == 'filter' and len(columns) != 1:
+            raise ValueError(f"Step {i}: filter needs exactly one column or a 'where' expression")
+        if action in ROW_ACTIONS:
+            step = {'id': uuid.uuid4().hex, 'action': action, 'columns': columns, 'params': params, 'fitted': {}}
+        else:
+            step = make_step(action, columns, params)
+        step['source'] = [i]
+        pipeline.append(step)
+    return pipeline
+
+
+def required_columns(steps: List[Dict[str, Any]]) -> List[str]:
+    """Columns the input data must have: those the steps name that no earlier step creates."""
+    required, created = [], set()
+    for step in steps:
+        for col in step['columns']:
+            if col not in created and col not in required:
+                required.append(col)
+        if step['action'] == 'rename':
+            created |= set(step['params'].get('rename_map', {}).values())
+        elif expands(step):
+            created |= {name for col in step['columns'] for name in generated_columns(step, col)}
+    return required
+
+
+def to_artifact(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """JSON-ready fitted pipeline: every step with the values fitted when it was recorded
+    (fill values, category vocabularies, scaler parameters), so replaying it on other data
+    never refits."""
+    return {
+        'version': ARTIFACT_VERSION, 'created': time.time(), 'input_columns': required_columns(steps),
+        'steps': [{key: step[key] for key in ('action', 'columns', 'params', 'fitted')} for step in steps],
+    }
+
+
+def from_artifact(artifact: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fitted steps from a saved pipeline; raises ValueError if it is malformed or unfitted."""
+    if artifact.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported pipeline version: {artifact.get('version')}")
+    steps = make_pipeline(artifact['steps'])
+    for i, (step, raw) in enumerate(zip(steps, artifact['steps'])):
+        if step['action'] not in HISTORY_ACTIONS:
+            raise ValueError(f"Step {i}: {step['action']} cannot be replayed from a fitted pipeline")
+        step['fitted'] = dict(raw.get('fitted') or {})
+        if (needs_fit(step) or step['action'] == 'impute') and not step['fitted']:
+            raise ValueError(f"Step {i} ({step['action']}) has no fitted values")
+    return steps
+
+
+def expands(step) -> bool:
+    """True for encodings that replace each column with indicator columns."""
+    return step['action'] == 'encode' and encode_method(step['params']) in EXPANDING_METHODS
+
+
+def step_reads(step) -> Optional[Set[str]]:
+    """Columns whose values the step depends on; None means every column."""
+    action = step['action']
+    if action in ('drop', 'rename'):
+        return set()
+    if action == 'drop_duplicates':
+        return set(step['columns']) or None
+    return set(step['columns'])
+
+
+def step_writes(step) -> Set[str]:
+    """Columns the step changes, removes or (for renames) takes or gives a name."""
+    if step['action'] in ROW_ACTIONS:
+        return set()
+    if step['action'] == 'rename':
+        rename_map = step['params'].get('rename_map', {})
+        return set(rename_map) | set(rename_map.values())
+    return set(step['columns'])
+
+
+def _creates(step, name: str) -> bool:
+    """True if `name` may be an indicator column the step adds (known exactly once it is fitted)."""
+    if not expands(step):
+        return False
+    for col in step['columns']:
+        names = generated_columns(step, col)
+        if name in names if names is not None else name.startswith(f"{col}_"):
+            return True
+    return False
+
+
+def _schema_after(step, schema: List[str]) -> List[str]:
+    action = step['action']
+    if action == 'drop':
+        return [c for c in schema if c not in step['columns']]
+    if action == 'rename':
+        rename_map = step['params'].get('rename_map', {})
+        return [rename_map.get(c, c) for c in schema]
+    if expands(step) and all(generated_columns(step, col) is not None for col in step['columns']):
+        added = [name for col in step['columns'] for name in generated_columns(step, col)]
+        return [c for c in schema if c not in step['columns']] + added
+    return schema
+
+
+def validate(steps: List[Dict[str, Any]], columns: List[str]):
+    """Raise ValueError for a step naming a column that does not exist at that point."""
+    schema, prefixes = list(columns), []
+    for i, step in enumerate(steps):
+        known = set(schema)
+        missing = [c for c in step['columns'] if c not in known and not any(c.startswith(p) for p in prefixes)]
+        if missing:
+            raise ValueError(f"Step {i} ({step['action']}): unknown column(s) {missing}")
+        if expands(step):
+            prefixes += [f"{col}_" for col in step['columns']]
+        schema = _schema_after(step, schema)
+
+
+def fit_pipeline(df: pd.DataFrame, steps: List[Dict[str, Any]]):
+    """Fit every step on the rows and values it sees in the order given.
+
+    Fitting first is what lets the optimizer move filters ahead of fitted steps
+    without changing their means, vocabularies or scaler parameters. Only the
+    columns some fit depends on are carried, and steps that touch none of them
+    are skipped.
+    """
+    for step in steps:
+        if step['action'] in HISTORY_ACTIONS and not needs_fit(step):
+            fit_step(None, step)
+    fit_at = [i for i, step in enumerate(steps) if needs_fit(step)]
+    if not fit_at:
+        return
+    # Backwards from the last fit: columns (named as before each step) that a later fit reads
+    live: Set[str] = set()
+    every = False
+    run = [False] * len(steps)
+    for i in range(fit_at[-1], -1, -1):
+        step = steps[i]
+        reads = step_reads(step)
+        run[i] = step['action'] in ROW_ACTIONS or every or bool(step_writes(step) & live) \
+            or any(_creates(step, c) for c in live)
+        if step['action'] == 'rename':
+            origin = {new: old for old, new in step['params'].get('rename_map', {}).items()}
+            live = {origin.get(c, c) for c in live}
+        elif step['action'] == 'drop':
+            live -= set(step['columns'])
+        elif expands(step):
+            live = {c for c in live if not _creates(step, c)}
+        if needs_fit(step) or run[i]:
+            if reads is None:
+                every = True
+            else:
+                live |= reads
+    frame = df if every else df[[c for c in df.columns if c in live]]
+    for i, step in enumerate(steps[:fit_at[-1] + 1]):
+        report('fit', processed=i, total=fit_at[-1] + 1, unit='steps')
+        if needs_fit(step):
+            fit_step(frame, step)
+        if run[i]:
+            frame = run_step(frame, _restrict(step, frame.columns))[0]
+
+
+def _restrict(step, columns) -> Dict[str, Any]:
+    """The step limited to the columns the fit pass carries."""
+    if step['action'] in ROW_ACTIONS:
+        return step
+    present = set(columns)
+    params = dict(step['params'])
+    if step['action'] == 'rename':
+        params['rename_map'] = {k: v for k, v in params.get('rename_map', {}).items() if k in present}
+    elif step['action'] == 'change_dtypes':
+        params['dtype_map'] = {k: v for k, v in params.get('dtype_map', {}).items() if k in present}
+    return {**step, 'columns': [c for c in step['columns'] if c in present], 'params': params}
+
+
+def optimize(steps: List[Dict[str, Any]], columns: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Reorder and simplify fitted steps without changing the result.
+
+    - steps with nothing to do (no columns, identity renames) and work on columns
+      a later drop discards unread are removed;
+    - column drops and row filters move ahead of every step they do not depend on,
+      so the expensive steps see fewer columns and rows;
+    - adjacent drops are merged and adjacent imputations fused into one fill.
+
+    Returns the plan and the removed steps with the reason.
+    """
+    removed = []
+    plan = []
+    for step in steps:
+        step = {**step, 'columns': list(step['columns']), 'params': dict(step['params'])}
+        if step['action'] == 'rename':
+            rename_map = {k: v for k, v in step['params'].get('rename_map', {}).items() if k != v}
+            step['params']['rename_map'], step['columns'] = rename_map, list(rename_map)
+        if not step['columns'] and step['action'] not in ROW_ACTIONS:
+            removed.append({'steps': step['source'], 'action': step['action'], 'reason': 'no effect'})
+            continue
+        plan.append(step)
+    plan = _drop_dead_columns(plan, removed)
+    plan = _push_down(plan, columns)
+    return _fuse(plan), removed
+
+
+def _drop_dead_columns(plan, removed):
+    """Remove columns from in-place steps when a later drop discards them before anything reads them."""
+    kept = []
+    for i, step in enumerate(plan):
+        if step['action'] in ('impute', 'scale', 'change_dtypes') or (step['action'] == 'encode' and not expands(step)):
+            dead = {c for c in step['columns'] if _dropped_unread(plan[i + 1:], c)}
+            if dead:
+                step['columns'] = [c for c in step['columns'] if c not in dead]
+                if step['action'] == 'change_dtypes':
+                    step['params']['dtype_map'] = {k: v for k, v in step['params']['dtype_map'].items() if k not in dead}
+                if not step['columns']:
+                    removed.append({'steps': step['source'], 'action': step['action'], 'reason': 'columns dropped later'})
+                    continue
+        kept.append(step)
+    return kept
+
+
+def _dropped_unread(later, column) -> bool:
+    for step in later:
+        if step['action'] == 'drop' and column in step['columns']:
+            return True
+        reads = step_reads(step)
+        if reads is None or column in reads or column in step_writes(step):
+            return False
+    return False
+
+
+def _can_move_before(step, prev, schema) -> bool:
+    """True if `step` gives the same result run just before `prev` (whose input columns are `schema`)."""
+    if prev['action'] == 'drop_duplicates' or not set(step['columns']) <= set(schema):
+        return False
+    if step['action'] == 'filter':
+        return prev['action'] != 'filter' and not set(step['columns']) & step_writes(prev)
+    reads = step_reads(prev)
+    return reads is not None and not set(step['columns']) & (reads | step_writes(prev))
+
+
+def _push_down(plan, columns):
+    plan = list(plan)
+    for i in range(len(plan)):
+        if plan[i]['action'] not in ('drop', 'filter'):
+            continue
+        j = i
+        while j > 0:
+            schemas = _schemas(plan, columns)
+            if not _can_move_before(plan[j], plan[j - 1], schemas[j - 1]):
+                break
+            plan[j - 1], plan[j] = plan[j], plan[j - 1]
+            plan[j - 1]['moved'] = True
+            j -= 1
+    return plan
+
+
+def _schemas(plan, columns) -> List[List[str]]:
+    """Input columns of each step."""
+    schemas, schema = [], list(columns)
+    for step in plan:
+        schemas.append(schema)
+        schema = _schema_after(step, schema)
+    return schemas
+
+
+def _fuse(plan):
+    fused = []
+    for step in plan:
+        prev = fused[-1] if fused else None
+        if prev is not None and prev['action'] == step['action'] == 'drop':
+            fused[-1] = {**prev, 'columns': prev['columns'] + step['columns'], 'source': prev['source'] + step['source']}
+        elif prev is not None and prev['action'] == step['action'] == 'impute' \
+                and not set(prev['columns']) & set(step['columns']):
+            values = {**prev['fitted']['values'], **step['fitted']['values']}
+            fused[-1] = {**prev, 'columns': prev['columns'] + step['columns'], 'source': prev['source'] + step['source'],
+                         'params': {'method': 'fused'}, 'fitted': {'values': values}}
+        else:
+            fused.append(step)
+    return fused
+
+
+def _fill(df: pd.DataFrame, step) -> Tuple[pd.DataFrame, Optional[str]]:
+    """All of an (optionally fused) imputation as one DataFrame.fillna, skipping complete columns."""
+    values = {}
+    for col in step['columns']:
+        value = step['fitted']['values'][col]
+        if value is None or (isinstance(value, float) and value != value) or not df[col].hasnans:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and value not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([value])
+        values[col] = value
+    if not values:
+        return df, 'no missing values'
+    return df.fillna(values), None
+
+
+def run_step(df: pd.DataFrame, step) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Apply one fitted plan step; returns the frame and a note when it had nothing to do."""
+    action, params = step['action'], step['params']
+    if action == 'filter':
+        where = params.get('where') or where_from_params(step['columns'][0], **{k: params.get(k) for k in FILTER_PARAMS})
+        return df[mask(where, df)], None
+    if action == 'drop_duplicates':
+        drop, _ = find_duplicates(lambda: [df], step['columns'] or None, params.get('keep', 'first'))
+        return next(drop_rows([df], drop)), None
+    if action == 'impute':
+        return _fill(df, step)
+    if action == 'change_dtypes':
+        dtype_map = {k: v for k, v in params.get('dtype_map', {}).items() if str(df[k].dtype) != v}
+        if not dtype_map:
+            return df, 'dtypes unchanged'
+        step = {**step, 'columns': list(dtype_map), 'params': {**params, 'dtype_map': dtype_map}}
+    if not step['columns']:
+        return df, 'no columns'
+    return apply_step(df, step)[0], None
+
+
+def plan_entry(step, note: Optional[str], rows: int, seconds: float) -> Dict[str, Any]:
+    """How one plan step ran, as reported to the client."""
+    return {
+        'action': step['action'], 'columns': step['columns'], 'params': step['params'], 'steps': step['source'],
+        'moved': step.get('moved', False), 'note': note, 'rows': rows, 'ms': round(seconds * 1000, 3),
+    }
+
+
+def run_pipeline(df: pd.DataFrame, steps: List[Dict[str, Any]], optimized: bool = True) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Fit and run `steps` (from make_pipeline) over one parsed frame.
+
+    Returns the result and a report: the executed plan (each entry lists the
+    original steps it runs, with its time in ms and the rows after it), the
+    steps the optimizer removed and the fit/run timings.
+    """
+    start = time.perf_counter()
+    validate(steps, list(df.columns))
+    fit_pipeline(df, steps)
+    fitted = time.perf_counter()
+    if optimized:
+        plan, removed = optimize(steps, list(df.columns))
+    else:
+        plan, removed = steps, []
+    executed = []
+    for n, step in enumerate(plan):
+        report('pipeline', processed=n, total=len(plan), unit='steps')
+        began = time.perf_counter()
+        df, note = run_step(df, step)
+        executed.append(plan_entry(step, note, len(df), time.perf_counter() - began))
+    done = time.perf_counter()
+    logger.info(f"pipeline: {len(steps)} steps as {len(plan)} in {done - start:.3f}s")
+    return df, {
+        'plan': executed, 'removed': removed,
+        'timings': {'fit_ms': round((fitted - start) * 1000, 3), 'run_ms': round((done - fitted) * 1000, 3)},
+    }
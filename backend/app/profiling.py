@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .jobs import report
+
+# Numeric columns are profiled in blocks of this many columns, one block per task
+BLOCK_COLUMNS = 16
+HIST_BINS = 20
+TOP_VALUES = 20
+
+
+def _num(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _finish(col_stats: Dict[str, Any], n_rows: int, missing: int, unique: int,
+            most_common: int, outlier_risk: Optional[float]) -> Dict[str, Any]:
+    """Attach data issue scores and recommendations (same rules as the original per-column loop)."""
+    data_issues = {}
+    recommendations = []
+    missingness = missing / n_rows if n_rows else 0.0
+    data_issues['missing'] = missingness  # 0-1
+    if missingness > 0.5:
+        recommendations.append('Consider dropping this column due to excessive missing data.')
+    elif 0.1 < missingness <= 0.5:
+        recommendations.append('Consider imputing missing values.')
+    most_common_pct = most_common / n_rows if n_rows else 0.0
+    data_issues['constant'] = most_common_pct  # 0-1
+    if most_common_pct > 0.95:
+        recommendations.append('Consider dropping this column as it is nearly constant.')
+    cardinality = unique / n_rows if n_rows else 0.0
+    data_issues['high_cardinality'] = cardinality  # 0-1
+    if cardinality > 0.8:
+        recommendations.append('Consider dropping or encoding this column due to high cardinality.')
+    data_issues['outlier'] = outlier_risk  # 0-1, None if not applicable
+    if outlier_risk is not None and outlier_risk > 0.1:
+        recommendations.append('Consider scaling or transforming this column due to high outlier risk.')
+    col_stats['data_issues'] = data_issues
+    col_stats['recommendations'] = recommendations
+    return col_stats
+
+
+def _histograms(X: np.ndarray, lo: np.ndarray, hi: np.ndarray, valid: np.ndarray):
+    """20-bin histograms for every column of X at once, with np.histogram's bin semantics."""
+    n, k = X.shape
+    same = lo == hi
+    lo, hi = np.where(same, lo - 0.5, lo), np.where(same, hi + 0.5, hi)
+    edges = np.linspace(lo, hi, HIST_BINS + 1)  # (bins + 1, k)
+    norm = HIST_BINS / (hi - lo)
+    rows, cols = np.nonzero(valid)
+    values = X[rows, cols]
+    indices = ((values - lo[cols]) * norm[cols]).astype(np.intp)
+    indices[indices == HIST_BINS] -= 1
+    indices[values < edges[indices, cols]] -= 1
+    increment = (values >= edges[indices + 1, cols]) & (indices != HIST_BINS - 1)
+    indices[increment] += 1
+    counts = np.bincount(cols * HIST_BINS + indices, minlength=k * HIST_BINS).reshape(k, HIST_BINS)
+    return edges, counts
+
+
+def _profile_numeric_block(df: pd.DataFrame, columns: List[str], n_rows: int) -> Dict[str, Dict[str, Any]]:
+    if n_rows == 0:
+        empty = {'count': 0, 'missing_pct': 0.0, 'unique': 0, 'mean': None, 'median': None, 'std': None,
+                 'min': None, 'max': None, 'histogram': {'bin_edges': [], 'counts': []}}
+        return {col: _finish(dict(empty), 0, 0, 0, 0, 0.0) for col in columns}
+    X = np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan) for col in columns])
+    k = X.shape[1]
+    # One sort per block gives min, max, median, distinct count and most frequent run
+    S = np.sort(X, axis=0)
+    finite = np.isfinite(X)
+    count = n_rows - np.isnan(S).sum(axis=0)
+    idx = np.arange(k)
+    has = count > 0
+    lower = S[np.maximum(count - 1, 0) // 2, idx]
+    upper = S[np.minimum(count // 2, max(n_rows - 1, 0)), idx]
+    median = (lower + upper) / 2
+    col_min = S[0, idx]
+    col_max = S[np.maximum(count - 1, 0), idx]
+    total = np.where(np.isnan(X), 0.0, X).sum(axis=0)
+    mean = np.divide(total, count, out=np.full(k, np.nan), where=has)
+    dev = X - mean
+    sq = np.where(np.isnan(dev), 0.0, dev * dev).sum(axis=0)
+    std = np.divide(sq, count - 1, out=np.full(k, np.nan), where=count > 1) ** 0.5
+    with np.errstate(invalid='ignore'):
+        outliers = (np.abs(dev) > 3 * std).sum(axis=0)
+    changes = S[1:] != S[:-1] if n_rows > 1 else np.zeros((0, k), dtype=bool)
+    in_range = np.arange(max(n_rows - 1, 0))[:, None] < (count - 1)
+    changes &= in_range
+    unique = changes.sum(axis=0) + has
+    all_finite = finite.sum(axis=0) == count
+    hist_cols = has & all_finite
+    if hist_cols.any():
+        edges, hist = _histograms(X[:, hist_cols], col_min[hist_cols], col_max[hist_cols], finite[:, hist_cols])
+    hist_pos = np.cumsum(hist_cols) - 1
+    out = {}
+    for j, col in enumerate(columns):
+        c = int(count[j])
+        if c:
+            boundaries = np.flatnonzero(changes[:c - 1, j])
+            max_run = int(np.diff(np.concatenate(([-1], boundaries, [c - 1]))).max())
+        else:
+            max_run = 0
+        col_stats = {
+            'count': c,
+            'missing_pct': float((n_rows - c) / n_rows * 100) if n_rows else 0.0,
+            'unique': int(unique[j]),
+            'mean': _num(mean[j]) if c else None,
+            'median': _num(median[j]) if c else None,
+            'std': _num(std[j]) if c else None,
+            'min': _num(col_min[j]) if c else None,
+            'max': _num(col_max[j]) if c else None,
+        }
+        if hist_cols[j]:
+            p = hist_pos[j]
+            col_stats['histogram'] = {'bin_edges': edges[:, p].tolist(), 'counts': hist[p].tolist()}
+        else:
+            col_stats['histogram'] = {'bin_edges': [], 'counts': []}
+        outlier_risk = float(outliers[j] / c) if c and std[j] > 0 else 0.0
+        out[col] = _finish(col_stats, n_rows, n_rows - c, int(unique[j]), max(max_run, n_rows - c), outlier_risk)
+    return out
+
+
+def _profile_other(col_data: pd.Series, n_rows: int) -> Dict[str, Any]:
+    # A single value_counts pass serves unique, top/freq, constant score and top values
+    value_counts = col_data.value_counts(dropna=False)
+    # Categoricals also list categories that do not occur
+    value_counts = value_counts[value_counts > 0]
+    present = value_counts[value_counts.index.notna()]
+    missing = n_rows - int(present.sum())
+    top, freq = None, 0
+    if not present.empty:
+        freq = int(present.max())
+        tied = present.index[present.to_numpy() == freq]
+        try:
+            top = min(tied)  # mode() picks the smallest of tied values
+        except TypeError:
+            top = tied[0]
+    col_stats = {
+        'count': n_rows - missing,
+        'missing_pct': float(missing / n_rows * 100) if n_rows else 0.0,
+        'unique': int(len(present)),
+        'top': str(top) if top is not None else None,
+        'freq': freq,
+        'value_counts': [
+            {'value': str(idx), 'count': int(cnt)} for idx, cnt in value_counts.head(TOP_VALUES).items()
+        ],
+    }
+    most_common = int(value_counts.iloc[0]) if not value_counts.empty else 0
+    return _finish(col_stats, n_rows, missing, len(present), most_common, None)
+
+
+def profile_frame(df: pd.DataFrame, workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Column statistics for every column of `df`.
+
+    Numeric columns are profiled together in vectorized blocks, other columns with a
+    single value_counts each; blocks and columns run in parallel on a thread pool
+    (numpy sorts and reductions release the GIL).
+    """
+    n_rows = len(df)
+    numeric = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    other = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])]
+    blocks = [numeric[i:i + BLOCK_COLUMNS] for i in range(0, len(numeric), BLOCK_COLUMNS)]
+    workers = workers or min(len(blocks) + len(other), os.cpu_count() or 1) or 1
+    results: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_profile_numeric_block, df, block, n_rows) for block in blocks]
+        futures += [pool.submit(lambda col: {col: _profile_other(df[col], n_rows)}, col) for col in other]
+        report('profile', total=len(df.columns), unit='columns')
+        for future in futures:
+            results.update(future.result())
+            report('profile', processed=len(results))
+    return {col: results[col] for col in df.columns}
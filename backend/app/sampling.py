@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, Optional, Tuple
+
+from .ingest import iter_csv
+from .jobs import report
+
+# Rows read per chunk while sampling an upload
+SAMPLE_CHUNK_ROWS = 100_000
+
+
+def reservoir_sample(chunks: Iterable[pd.DataFrame], size: int, seed: int = 0) -> Tuple[pd.DataFrame, int]:
+    """Uniform sample of `size` rows in one pass over `chunks`; returns (sample, total rows seen).
+
+    Every row gets a random key and the `size` smallest keys are kept, so memory is
+    bounded by `size` plus one chunk. The sample keeps the original row order.
+    """
+    rng = np.random.default_rng(seed)
+    pool, keys, total = None, np.empty(0), 0
+    for chunk in chunks:
+        report('sample', advance=len(chunk))
+        chunk = chunk.set_axis(pd.RangeIndex(total, total + len(chunk)))
+        chunk_keys = rng.random(len(chunk))
+        total += len(chunk)
+        if pool is not None and len(keys) >= size:
+            # Only rows beating the current worst key can enter the reservoir
+            enter = chunk_keys < keys.max()
+            chunk, chunk_keys = chunk[enter], chunk_keys[enter]
+        pool = chunk if pool is None else pd.concat([pool, chunk])
+        keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > size:
+            keep = np.argpartition(keys, size)[:size]
+            pool, keys = pool.iloc[keep], keys[keep]
+    if pool is None:
+        return pd.DataFrame(), 0
+    return pool.sort_index().reset_index(drop=True), total
+
+
+def stratified_sample(chunks: Iterable[pd.DataFrame], size: int, column: str,
+                      seed: int = 0) -> Tuple[pd.DataFrame, int]:
+    """Sample of about `size` rows with each value of `column` represented in proportion to its
+    frequency, in one pass over `chunks`; returns (sample, total rows seen).
+
+    After every chunk each stratum is trimmed to its running share of `size` (plus at most
+    `size` rows competing for rounded-up shares), so memory stays within twice `size` plus
+    one chunk however many strata there are. The final allocation uses the largest-remainder
+    method, ties broken at random.
+    """
+    rng = np.random.default_rng(seed)
+    pool, keys, total = None, np.empty(0), 0
+    counts = pd.Series(dtype='int64')
+    for chunk in chunks:
+        if column not in chunk.columns:
+            raise ValueError(f"Stratify column not found: {column}")
+        report('sample', advance=len(chunk))
+        chunk = chunk.set_axis(pd.RangeIndex(total, total + len(chunk)))
+        total += len(chunk)
+        counts = counts.add(chunk[column].value_counts(dropna=False), fill_value=0)
+        pool = chunk if pool is None else pd.concat([pool, chunk])
+        keys = np.concatenate([keys, rng.random(len(chunk))])
+        keep = _proportional(pool[column], keys, counts, min(size, total), size)
+        pool, keys = pool[keep], keys[keep]
+    if pool is None:
+        return pd.DataFrame(), 0
+    sample = pool[_proportional(pool[column], keys, counts, min(size, total))]
+    return sample.sort_index().reset_index(drop=True), total
+
+
+def _proportional(strata: pd.Series, keys: np.ndarray, counts: pd.Series, size: int,
+                  candidates: Optional[int] = None) -> np.ndarray:
+    """Rows of a proportional sample of `size` given the stratum `counts`: each stratum's
+    rows by key up to the floor of its share, then the next row of the strata with the
+    largest remainders (the `candidates` best of them, by default as many as `size` leaves)."""
+    quota = (counts / counts.sum() * size).to_numpy()
+    whole = np.floor(quota)
+    stratum = counts.index.get_indexer(strata)
+    ranks = _stratum_ranks(strata, keys)
+    keep = ranks <= whole[stratum]
+    fraction = (quota - whole)[stratum]
+    rest = np.flatnonzero((ranks == whole[stratum] + 1) & (fraction > 0))
+    if candidates is None:
+        candidates = size - int(whole.sum())
+    best = np.lexsort((keys[rest], -fraction[rest]))[:max(candidates, 0)]
+    keep[rest[best]] = True
+    return keep
+
+
+def _stratum_ranks(strata: pd.Series, keys: np.ndarray) -> np.ndarray:
+    return pd.Series(keys).groupby(strata.to_numpy(), dropna=False).rank(method='first').to_numpy()
+
+
+def sample_csv(file, size: int, seed: int = 0, stratify_by: Optional[str] = None,
+               chunk_rows: int = SAMPLE_CHUNK_ROWS, delimiter: Optional[str] = None,
+               encoding: Optional[str] = None) -> Tuple[pd.DataFrame, int]:
+    chunks = iter_csv(file, chunk_rows, delimiter=delimiter, encoding=encoding)
+    if stratify_by:
+        return stratified_sample(chunks, size, stratify_by, seed)
+    return reservoir_sample(chunks, size, seed)
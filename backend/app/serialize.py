@@ -0,0 +1,108 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from .encoders import dense_columns
+
+# Arrow IPC stream, sent when the client lists it in Accept
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+# JSON layouts: 'rows' (data is a list of rows) or 'columns' (data is a list of columns)
+LAYOUTS = ('rows', 'columns')
+# Encoded indicator (sparse) columns a preview shows; the rest are counted in 'omitted_columns'
+PREVIEW_INDICATOR_COLUMNS = 50
+# Schema metadata key holding the non-tabular fields of an Arrow response as JSON
+ARROW_METADATA_KEY = b'dataprepper'
+
+
+def json_column(col: pd.Series) -> List[Any]:
+    """Values of one column as plain Python objects, with NaN, inf and missing values as None."""
+    # A copy: for object columns to_numpy returns a read-only view of the (shared) column
+    values = col.to_numpy(dtype=object, copy=True)
+    missing = pd.isna(values)
+    if col.dtype.kind == 'f':
+        missing |= np.isinf(col.to_numpy(dtype='float64'))
+    values[missing] = None
+    return values.tolist()
+
+
+def json_columns(df: pd.DataFrame) -> List[List[Any]]:
+    # Positional: a frame can have duplicate column names
+    return [json_column(df.iloc[:, i]) for i in range(df.shape[1])]
+
+
+def bounded(df: pd.DataFrame, extra: Dict[str, Any]) -> pd.DataFrame:
+    """`df` with at most PREVIEW_INDICATOR_COLUMNS indicator columns (a one-hot encoding of a
+    high-cardinality column adds thousands); how many were left out goes in `extra`."""
+    sparse = [i for i, dtype in enumerate(df.dtypes) if isinstance(dtype, pd.SparseDtype)]
+    if len(sparse) <= PREVIEW_INDICATOR_COLUMNS:
+        return df
+    omitted = set(sparse[PREVIEW_INDICATOR_COLUMNS:])
+    extra['omitted_columns'] = len(omitted)
+    return df.iloc[:, [i for i in range(df.shape[1]) if i not in omitted]]
+
+
+def payload(df: pd.DataFrame, layout: str = 'rows', **extra) -> Dict[str, Any]:
+    """JSON-ready body for a preview slice; only `df` itself is sanitized, so pass the slice."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    df = bounded(df, extra)
+    columns = json_columns(df)
+    data = columns if layout == 'columns' else [list(row) for row in zip(*columns)]
+    body = {'columns': df.columns.tolist(), 'data': data, **extra}
+    if layout == 'columns':
+        body['layout'] = 'columns'
+    return body
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def dumps(body: Any) -> bytes:
+    return orjson.dumps(body, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def arrow_stream(df: pd.DataFrame, **extra) -> bytes:
+    """`df` as an Arrow IPC stream; numeric columns are not copied, missing values stay typed
+    nulls/NaN, and `extra` travels as JSON in the schema metadata."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    df = dense_columns(bounded(df, extra))
+    arrays = []
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        try:
+            arrays.append(pa.array(col, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object column: send its text
+            arrays.append(pa.array(col.astype(str).where(col.notna(), None), from_pandas=True))
+    names = [str(c) for c in df.columns]
+    table = pa.Table.from_arrays(arrays, names=names, metadata={ARROW_METADATA_KEY: dumps(extra)})
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def wants_arrow(request: Request) -> bool:
+    return ARROW_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def respond(request: Request, df: pd.DataFrame, **extra) -> Response:
+    """Preview response in the format the client asked for: Arrow IPC if Accept lists it,
+    otherwise JSON in the `layout` query parameter's layout (rows by default)."""
+    if wants_arrow(request):
+        return Response(arrow_stream(df, **extra), media_type=ARROW_MEDIA_TYPE)
+    layout = request.query_params.get('layout', 'rows')
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown layout: {layout}")
+    body = payload(df, layout, **extra)
+    return Response(dumps(body), media_type='application/json')
@@ -0,0 +1,299 @@
+import fcntl
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Set
+
+import pandas as pd
+
+from .history import Snapshot
+
+logger = logging.getLogger("dataprepper")
+
+# Deserialized entries each worker keeps, reused while their revision is current
+SHARED_LOCAL_ENTRIES = 32
+
+
+class SharedSessionStore:
+    """Dict-like store shared by every worker process on the host.
+
+    Entries are pickled into a SQLite index; the columns of any Snapshot inside an
+    entry are written once per column version as Arrow IPC files and memory-mapped on
+    load, so a worker opens another worker's session without copying numeric data and
+    columns shared between entries (a dataset and its sessions) are stored once.
+
+    Each write bumps the entry's revision; workers re-read an entry only when the
+    revision they hold is stale. Call `refresh(key)` after mutating a value in place.
+    Entries not accessed for `ttl` seconds are deleted (None disables expiry).
+    """
+
+    def __init__(self, name: str, root: str, ttl: Optional[float] = None,
+                 on_expire: Optional[Callable[[str], None]] = None, local_entries: int = SHARED_LOCAL_ENTRIES):
+        self.name = name
+        self.root = root
+        self.column_dir = os.path.join(root, 'columns')
+        self.lock_dir = os.path.join(root, 'locks')
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.local_entries = local_entries
+        self._local: 'OrderedDict[str, tuple]' = OrderedDict()
+        # Columns alive in this process by version, so entries loaded here share them
+        self._columns: 'weakref.WeakValueDictionary[str, pd.Series]' = weakref.WeakValueDictionary()
+        self._conn_pid = None
+        self._conn_obj = None
+        self.lock = threading.RLock()
+        os.makedirs(self.column_dir, exist_ok=True)
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per process: connections must not cross a fork
+        if self._conn_pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (store TEXT, key TEXT, revision INTEGER, '
+                         'accessed REAL, value BLOB, PRIMARY KEY (store, key))')
+            conn.execute('CREATE TABLE IF NOT EXISTS refs (store TEXT, key TEXT, version TEXT, '
+                         'PRIMARY KEY (store, key, version))')
+            conn.execute('CREATE INDEX IF NOT EXISTS refs_version ON refs (version)')
+            self._conn_obj, self._conn_pid = conn, os.getpid()
+            self._local.clear()
+        return self._conn_obj
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            row = self._conn().execute('SELECT 1 FROM entries WHERE store = ? AND key = ?', (self.name, key)).fetchone()
+            return row is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self._conn().execute('SELECT COUNT(*) FROM entries WHERE store = ?', (self.name,)).fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        with self.lock:
+            rows = self._conn().execute('SELECT key FROM entries WHERE store = ?', (self.name,)).fetchall()
+        return iter([key for key, in rows])
+
+    def __getitem__(self, key):
+        with self.lock:
+            conn = self._conn()
+            row = conn.execute('SELECT revision FROM entries WHERE store = ? AND key = ?', (self.name, key)).fetchone()
+            if row is None:
+                self._local.pop(key, None)
+                raise KeyError(key)
+            cached = self._local.get(key)
+            if cached is not None and cached[0] == row[0]:
+                value = cached[1]
+            else:
+                blob = conn.execute('SELECT value FROM entries WHERE store = ? AND key = ?',
+                                    (self.name, key)).fetchone()[0]
+                value = self._loads(blob)
+                self._remember(key, row[0], value)
+            self._local.move_to_end(key)
+            conn.execute('UPDATE entries SET accessed = ? WHERE store = ? AND key = ?', (time.time(), self.name, key))
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self._write(key, value)
+            self.expire()
+
+    def __delitem__(self, key):
+        with self.lock:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cur = conn.execute('DELETE FROM entries WHERE store = ? AND key = ?', (self.name, key))
+                versions = self._drop_refs(conn, key)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._local.pop(key, None)
+            if cur.rowcount == 0:
+                raise KeyError(key)
+            self._collect(versions)
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        if key in self:
+            del self[key]
+        return value
+
+    def setdefault(self, key, default):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def refresh(self, key):
+        """Write back an entry this worker mutated in place."""
+        with self.lock:
+            cached = self._local.get(key)
+            if cached is not None:
+                self._write(key, cached[1])
+
+    @contextmanager
+    def pinned(self, key):
+        """Hold the entry's lock file while a request works on it.
+
+        crud.session_lock only serializes threads of one process; without this, two workers
+        could load revision N of a session, both write N + 1 and lose one of the steps.
+        (Entries are never spilled here, so there is nothing else to pin.)
+        """
+        name = hashlib.sha1(f'{self.name}/{key}'.encode()).hexdigest()
+        with open(os.path.join(self.lock_dir, f'{name}.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def expire(self):
+        if self.ttl is None:
+            return
+        cutoff = time.time() - self.ttl
+        rows = self._conn().execute('SELECT key FROM entries WHERE store = ? AND accessed < ?',
+                                    (self.name, cutoff)).fetchall()
+        for key, in rows:
+            logger.info(f"store {self.name}: {key} expired")
+            try:
+                del self[key]
+            except KeyError:
+                continue  # expired by another worker
+            if self.on_expire is not None:
+                self.on_expire(key)
+
+    def _remember(self, key, revision, value):
+        self._local[key] = (revision, value)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    def _write(self, key, value):
+        conn = self._conn()
+        versions: Set[str] = set()
+        # Column files are written inside the write lock so a concurrent delete cannot collect them
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            blob = self._dumps(value, versions)
+            conn.execute('INSERT INTO entries (store, key, revision, accessed, value) VALUES (?, ?, 1, ?, ?) '
+                         'ON CONFLICT (store, key) DO UPDATE SET revision = revision + 1, '
+                         'accessed = excluded.accessed, value = excluded.value',
+                         (self.name, key, time.time(), blob))
+            stale = self._drop_refs(conn, key) - versions
+            conn.executemany('INSERT INTO refs (store, key, version) VALUES (?, ?, ?)',
+                             [(self.name, key, v) for v in versions])
+            revision = conn.execute('SELECT revision FROM entries WHERE store = ? AND key = ?',
+                                    (self.name, key)).fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._remember(key, revision, value)
+        self._collect(stale)
+
+    def _drop_refs(self, conn, key) -> Set[str]:
+        versions = {v for v, in conn.execute('SELECT version FROM refs WHERE store = ? AND key = ?', (self.name, key))}
+        conn.execute('DELETE FROM refs WHERE store = ? AND key = ?', (self.name, key))
+        return versions
+
+    def _collect(self, versions: Set[str]):
+        """Delete column files no entry of any store references any more."""
+        if not versions:
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for version in versions:
+                if conn.execute('SELECT 1 FROM refs WHERE version = ?', (version,)).fetchone() is None:
+                    self._columns.pop(version, None)
+                    for path in (self._column_path(version, 'arrow'), self._column_path(version, 'pkl')):
+                        if os.path.exists(path):
+                            os.remove(path)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _column_path(self, version: str, ext: str) -> str:
+        return os.path.join(self.column_dir, f"{version}.{ext}")
+
+    def _dumps(self, value, versions: Set[str]) -> bytes:
+        store = self
+
+        class Pickler(pickle.Pickler):
+            def persistent_id(self, obj):
+                if isinstance(obj, Snapshot):
+                    for col in obj.columns:
+                        store._write_column(obj.versions[col], obj.data[col])
+                        versions.add(obj.versions[col])
+                    return ('snapshot', obj.columns, obj.versions)
+                return None
+
+        buf = io.BytesIO()
+        Pickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+        return buf.getvalue()
+
+    def _loads(self, blob: bytes):
+        store = self
+
+        class Unpickler(pickle.Unpickler):
+            def persistent_load(self, pid):
+                _, columns, versions = pid
+                return Snapshot(columns, {c: store._read_column(versions[c]) for c in columns}, versions)
+
+        return Unpickler(io.BytesIO(blob)).load()
+
+    def _write_column(self, version: str, series: pd.Series):
+        if os.path.exists(self._column_path(version, 'arrow')) \
+                or os.path.exists(self._column_path(version, 'pkl')):
+            return
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        # Write to a temp name and rename, so readers never see a partial file
+        try:
+            table = pa.Table.from_pandas(series.to_frame('values'))
+            path = self._column_path(version, 'arrow')
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with pa.OSFile(tmp, 'wb') as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except (pa.ArrowException, TypeError):
+            # Mixed-type object columns have no Arrow type; sparse (one-hot) columns are
+            # rejected with TypeError, and pickling keeps them sparse
+            path = self._column_path(version, 'pkl')
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(series, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._columns[version] = series
+
+    def _read_column(self, version: str) -> pd.Series:
+        series = self._columns.get(version)
+        if series is not None:
+            return series
+        path = self._column_path(version, 'arrow')
+        if os.path.exists(path):
+            import pyarrow as pa
+            import pyarrow.ipc as ipc
+            # Memory-mapped: numeric columns without nulls are used in place, not copied
+            table = ipc.open_file(pa.memory_map(path)).read_all()
+            series = table.to_pandas(split_blocks=True)['values']
+        else:
+            with open(self._column_path(version, 'pkl'), 'rb') as f:
+                series = pickle.load(f)
+        self._columns[version] = series
+        return series
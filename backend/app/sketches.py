@@ -0,0 +1,310 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .jobs import report
+from .profiling import HIST_BINS, TOP_VALUES, _finish, _num
+
+# Rows per chunk when sketching an in-memory frame in parallel
+SKETCH_CHUNK_ROWS = 250_000
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes; relative standard error 1.04 / sqrt(2**p)."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, idx, rho.astype(np.uint8))
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= np.uint64(1 << shift)
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+class QuantileSketch:
+    """KLL quantile sketch; normalized rank error about 2.296 / k**0.9723."""
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels)
+        return max(2, int(math.ceil(self.k * (2 / 3) ** (depth - level - 1))))
+
+    def update(self, values: np.ndarray):
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64, copy=False)])
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+        return self
+
+    def _compress(self):
+        while sum(len(items) for items in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            for h, items in enumerate(self.levels):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                items = items[:len(items) - len(keep)]
+                # Keep every other item (random offset) at twice the weight
+                promoted = items[int(self.rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                break
+
+    def _sorted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q: float) -> Optional[float]:
+        items, cum = self._sorted()
+        if not len(items):
+            return None
+        i = int(np.searchsorted(cum, q * cum[-1], side='left'))
+        return float(items[min(i, len(items) - 1)])
+
+    def rank(self, x: np.ndarray, inclusive: bool = False) -> np.ndarray:
+        """Estimated fraction of values < x (or <= x if inclusive)."""
+        items, cum = self._sorted()
+        if not len(items):
+            return np.zeros(len(x))
+        pos = np.searchsorted(items, x, side='right' if inclusive else 'left')
+        return np.where(pos > 0, cum[np.maximum(pos - 1, 0)], 0.0) / cum[-1]
+
+
+class FrequentItems:
+    """Misra-Gries / SpaceSaving summary: counts are underestimated by at most `error`."""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.error = 0
+
+    def update(self, values: pd.Series):
+        counts = values.value_counts(dropna=False)
+        counts = counts[counts > 0]  # unobserved categories
+        chunk = FrequentItems(self.capacity)
+        if len(counts) > self.capacity:
+            # Reduce the exact chunk counts to a summary before merging
+            chunk.error = int(counts.iloc[self.capacity])
+            counts = counts[counts > chunk.error] - chunk.error
+        chunk.counts = {(None if pd.isna(key) else key): int(cnt) for key, cnt in counts.items()}
+        self.merge(chunk)
+
+    def merge(self, other: 'FrequentItems') -> 'FrequentItems':
+        for key, cnt in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + cnt
+        self.error += other.error
+        if len(self.counts) > self.capacity:
+            threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {key: cnt - threshold for key, cnt in self.counts.items() if cnt > threshold}
+            self.error += threshold
+        return self
+
+    def top(self, n: int):
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:n]
+
+
+class ColumnSketch:
+    """Mergeable one-pass summary of a column: exact moments, min/max and missing count,
+    plus distinct-count, quantile and frequent-item sketches."""
+
+    def __init__(self, numeric: bool = True):
+        self.numeric = numeric
+        self.rows = 0
+        self.missing = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.nonfinite = False
+        self.distinct = HyperLogLog()
+        self.quantiles = QuantileSketch()
+        self.frequent = FrequentItems()
+
+    def update(self, col: pd.Series):
+        self.rows += len(col)
+        present = col.dropna()
+        self.missing += len(col) - len(present)
+        self.frequent.update(col)
+        if self.numeric and not pd.api.types.is_numeric_dtype(col):
+            self.numeric = False
+        if self.numeric:
+            values = present.to_numpy(dtype='float64')
+            self.distinct.update(pd.util.hash_array(values))
+            finite = values[np.isfinite(values)]
+            self.nonfinite |= len(finite) != len(values)
+            if len(values):
+                mean = float(values.mean())
+                self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()),
+                                    float(values.min()), float(values.max()))
+            self.quantiles.update(finite)
+        else:
+            self.distinct.update(pd.util.hash_pandas_object(present, index=False).to_numpy())
+
+    def _merge_moments(self, n: int, mean: float, m2: float, lo: float, hi: float):
+        # Chan et al. parallel update of count, mean and sum of squared deviations
+        total = self.n + n
+        if n:
+            delta = mean - self.mean
+            self.mean += delta * n / total
+            self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min, self.max = min(self.min, lo), max(self.max, hi)
+
+    def merge(self, other: 'ColumnSketch') -> 'ColumnSketch':
+        self.numeric = self.numeric and other.numeric
+        self.rows += other.rows
+        self.missing += other.missing
+        self.nonfinite |= other.nonfinite
+        self._merge_moments(other.n, other.mean, other.m2, other.min, other.max)
+        self.distinct.merge(other.distinct)
+        self.quantiles.merge(other.quantiles)
+        self.frequent.merge(other.frequent)
+        return self
+
+    def to_stats(self) -> Dict[str, Any]:
+        """Stats in the /column_stats shape, with `approximate` set and per-metric error bounds."""
+        n_rows, count = self.rows, self.rows - self.missing
+        unique = int(round(min(self.distinct.estimate(), count)))
+        top_items = self.frequent.top(TOP_VALUES)
+        most_common = top_items[0][1] if top_items else 0
+        error_bounds = {
+            'unique_relative_error': self.distinct.relative_error,
+            'count_error': self.frequent.error,  # frequencies are at most this much too low
+        }
+        col_stats: Dict[str, Any] = {'count': count, 'missing_pct': float(self.missing / n_rows * 100) if n_rows else 0.0,
+                                     'unique': unique}
+        outlier_risk = None
+        if self.numeric:
+            std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+            eps = self.quantiles.rank_error
+            col_stats.update({
+                'mean': _num(self.mean) if count else None,
+                'median': self.quantiles.quantile(0.5) if count else None,
+                'std': _num(std) if count else None,
+                'min': _num(self.min) if count else None,
+                'max': _num(self.max) if count else None,
+            })
+            if count and not self.nonfinite:
+                lo, hi = (self.min - 0.5, self.max + 0.5) if self.min == self.max else (self.min, self.max)
+                edges = np.linspace(lo, hi, HIST_BINS + 1)
+                cdf = np.append(self.quantiles.rank(edges[:-1]), 1.0)
+                counts = np.round(np.diff(cdf) * count).astype(int)
+                col_stats['histogram'] = {'bin_edges': edges.tolist(), 'counts': counts.tolist()}
+            else:
+                col_stats['histogram'] = {'bin_edges': [], 'counts': []}
+            outlier_risk = 0.0
+            if count and std > 0:
+                below = self.quantiles.rank(np.array([self.mean - 3 * std]))[0]
+                above = 1 - self.quantiles.rank(np.array([self.mean + 3 * std]), inclusive=True)[0]
+                outlier_risk = float(max(below + above, 0.0))
+            error_bounds.update({
+                'quantile_rank_error': eps,
+                'histogram_count_error': int(math.ceil(2 * eps * count)),
+                'outlier_error': 2 * eps,
+            })
+        else:
+            present = [(key, cnt) for key, cnt in top_items if key is not None]
+            top, freq = present[0] if present else (None, 0)
+            col_stats.update({
+                'top': str(top) if top is not None else None,
+                'freq': int(freq),
+                'value_counts': [{'value': str(key), 'count': int(cnt)} for key, cnt in top_items],
+            })
+        col_stats['approximate'] = True
+        col_stats['error_bounds'] = error_bounds
+        return _finish(col_stats, n_rows, self.missing, unique, most_common, outlier_risk)
+
+
+def sketch_chunk(df: pd.DataFrame) -> Dict[str, ColumnSketch]:
+    sketches = {}
+    for col in df.columns:
+        sketches[col] = ColumnSketch(numeric=pd.api.types.is_numeric_dtype(df[col]))
+        sketches[col].update(df[col])
+    return sketches
+
+
+def merge_sketches(parts: Iterable[Dict[str, ColumnSketch]]) -> Dict[str, ColumnSketch]:
+    merged: Dict[str, ColumnSketch] = {}
+    for part in parts:
+        for col, sketch in part.items():
+            if col in merged:
+                merged[col].merge(sketch)
+            else:
+                merged[col] = sketch
+    return merged
+
+
+def approximate_stats(chunks: Iterable[pd.DataFrame], workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Approximate column stats over an iterable of row chunks, sketched in parallel and merged.
+
+    At most 2 * workers chunks are in flight, so a streamed file is never held in memory whole.
+    """
+    workers = workers or os.cpu_count() or 1
+    merged: Dict[str, ColumnSketch] = {}
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            report('sketch', advance=len(chunk))
+            pending.append(pool.submit(sketch_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                merged = merge_sketches([merged, pending.pop(0).result()])
+        merged = merge_sketches([merged] + [future.result() for future in pending])
+    return {col: sketch.to_stats() for col, sketch in merged.items()}
+
+
+def frame_chunks(df: pd.DataFrame, chunk_rows: int = SKETCH_CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
@@ -0,0 +1,225 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger("dataprepper")
+
+# Global memory budget for in-memory datasets, session histories and dropped-column caches
+MEMORY_BUDGET_BYTES = int(float(os.environ.get('DATAPREPPER_MEMORY_BUDGET_MB', 2048)) * 1024 * 1024)
+# Entries idle for longer than this are deleted, in memory or on disk
+SESSION_TTL_SECONDS = float(os.environ.get('DATAPREPPER_SESSION_TTL', 6 * 3600))
+# 'memory' keeps entries in this process; 'shared' lets several worker processes serve the same sessions
+SESSION_BACKEND = os.environ.get('DATAPREPPER_SESSION_BACKEND', 'memory')
+
+
+def memory_of(value: Any) -> Dict[str, int]:
+    """Bytes held by `value`, keyed by buffer identity so data shared between entries counts once.
+
+    Snapshots and session histories report per column version; frames and series fall
+    back to their object id.
+    """
+    if hasattr(value, 'memory'):
+        return value.memory()
+    if isinstance(value, pd.DataFrame):
+        return {f"{id(value)}:{col}": int(size) for col, size in value.memory_usage(index=False, deep=True).items()}
+    if isinstance(value, pd.Series):
+        return {str(id(value)): int(value.memory_usage(index=False, deep=True))}
+    return {}
+
+
+class MemoryBudget:
+    """Shared byte budget across stores; evicts the least recently used entry of any store."""
+
+    def __init__(self, limit_bytes: int = MEMORY_BUDGET_BYTES):
+        self.limit_bytes = limit_bytes
+        self.stores: List['SessionStore'] = []
+        self.lock = threading.RLock()
+
+    def used(self) -> int:
+        memory: Dict[str, int] = {}
+        for store in self.stores:
+            for sizes in store._sizes.values():
+                memory.update(sizes)
+        return sum(memory.values())
+
+    def _holders(self) -> Counter:
+        """Number of in-memory entries holding each buffer."""
+        return Counter(buffer for store in self.stores for sizes in store._sizes.values() for buffer in sizes)
+
+    def enforce(self, protect=None):
+        with self.lock:
+            for store in self.stores:
+                store.expire()
+            while self.used() > self.limit_bytes:
+                holders = self._holders()
+                # Spilling an entry whose buffers all live on in other entries would free nothing
+                candidates = [
+                    (store._accessed[key], store, key)
+                    for store in self.stores for key in store._memory
+                    if (store, key) != protect and not store._pins.get(key)
+                    and any(holders[buffer] == 1 for buffer in store._sizes.get(key, ()))
+                ]
+                if not candidates:
+                    break
+                _, store, key = min(candidates, key=lambda c: c[0])
+                store.spill(key)
+
+
+class SessionStore:
+    """Dict-like store kept within a MemoryBudget.
+
+    Entries are ordered by last access. When the budget is exceeded the least recently
+    used entries are pickled to `spill_dir` and transparently paged back in on access;
+    entries idle longer than `ttl` seconds are deleted. Call `refresh(key)` after
+    mutating a stored value in place so its size is re-measured.
+    """
+
+    def __init__(self, name: str, budget: MemoryBudget, spill_dir: str, ttl: float = SESSION_TTL_SECONDS,
+                 on_expire: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self._memory: 'OrderedDict[str, Any]' = OrderedDict()
+        self._spilled: Dict[str, str] = {}
+        self._sizes: Dict[str, Dict[str, int]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._pins: Dict[str, int] = {}
+        budget.stores.append(self)
+
+    def __contains__(self, key) -> bool:
+        return key in self._memory or key in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._memory) + len(self._spilled)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._memory) + list(self._spilled))
+
+    def __getitem__(self, key):
+        with self.budget.lock:
+            if key in self._spilled:
+                self._page_in(key)
+            value = self._memory[key]
+            self._memory.move_to_end(key)
+            self._accessed[key] = time.monotonic()
+            return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        with self.budget.lock:
+            self._drop_spill(key)
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            self._accessed[key] = time.monotonic()
+            self._sizes[key] = memory_of(value)
+            self.budget.enforce(protect=(self, key))
+
+    def __delitem__(self, key):
+        with self.budget.lock:
+            if key not in self:
+                raise KeyError(key)
+            self._memory.pop(key, None)
+            self._sizes.pop(key, None)
+            self._accessed.pop(key, None)
+            self._drop_spill(key)
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        if key in self:
+            del self[key]
+        return value
+
+    def setdefault(self, key, default):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def refresh(self, key):
+        """Re-measure an entry after in-place changes and enforce the budget."""
+        with self.budget.lock:
+            if key in self._memory:
+                self._sizes[key] = memory_of(self._memory[key])
+                self._accessed[key] = time.monotonic()
+                self.budget.enforce(protect=(self, key))
+
+    @contextmanager
+    def pinned(self, key):
+        """Keep an entry in memory (never spilled) while a request is working on it."""
+        with self.budget.lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self.budget.lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    def nbytes(self) -> int:
+        memory: Dict[str, int] = {}
+        for sizes in self._sizes.values():
+            memory.update(sizes)
+        return sum(memory.values())
+
+    def spill(self, key):
+        """Move an entry to disk; it is paged back in on the next access."""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{self.name}_{key}.pkl")
+        with open(path, 'wb') as f:
+            pickle.dump(self._memory.pop(key), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._sizes.pop(key, None)
+        self._spilled[key] = path
+        logger.info(f"store {self.name}: spilled {key} to {path}")
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, t in self._accessed.items() if t < cutoff]:
+            logger.info(f"store {self.name}: {key} expired")
+            del self[key]
+            if self.on_expire is not None:
+                self.on_expire(key)
+
+    def _page_in(self, key):
+        path = self._spilled.pop(key)
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.remove(path)
+        self._memory[key] = value
+        self._sizes[key] = memory_of(value)
+        logger.info(f"store {self.name}: paged in {key}")
+        self.budget.enforce(protect=(self, key))
+
+    def _drop_spill(self, key):
+        path = self._spilled.pop(key, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def open_store(name: str, budget: MemoryBudget, data_dir: str, ttl: float = SESSION_TTL_SECONDS,
+               on_expire: Optional[Callable[[str], None]] = None, backend: str = SESSION_BACKEND):
+    """Store for datasets and sessions on the configured backend."""
+    if backend == 'shared':
+        from .shared_store import SharedSessionStore
+        return SharedSessionStore(name, os.path.join(data_dir, 'shared'), ttl, on_expire)
+    if backend == 'memory':
+        return SessionStore(name, budget, os.path.join(data_dir, 'spill'), ttl, on_expire)
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+def open_metadata(name: str, data_dir: str, backend: str = SESSION_BACKEND):
+    """Small per-session/dataset records (no budget, no expiry; cleaned by the stores' on_expire)."""
+    if backend == 'shared':
+        from .shared_store import SharedSessionStore
+        return SharedSessionStore(name, os.path.join(data_dir, 'shared'))
+    return {}
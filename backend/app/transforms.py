@@ -0,0 +1,73 @@
+import uuid
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from .encoders import apply_encoder, encode_method, fit_encoder
+from .kernels import apply_scale, fit_impute, fit_scale
+
+# Actions the session history can record and replay
+HISTORY_ACTIONS = ('drop', 'impute', 'encode', 'scale', 'rename', 'change_dtypes')
+
+
+def make_step(action: str, columns: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    if action not in HISTORY_ACTIONS:
+        raise ValueError(f"Unsupported action for history: {action}")
+    return {'id': uuid.uuid4().hex, 'action': action, 'columns': list(columns), 'params': dict(params or {}), 'fitted': {}}
+
+
+def needs_fit(step: Dict[str, Any]) -> bool:
+    """True if fitting the step needs statistics over the full columns (not just preview rows)."""
+    action, method = step['action'], step['params'].get('method')
+    if action == 'impute':
+        return method != 'constant'
+    if action == 'encode':
+        return encode_method(step['params']) != 'hash'
+    return action == 'scale'
+
+
+def fit_step(df: pd.DataFrame, step: Dict[str, Any], versions: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Compute the data-dependent values a step needs (fill values, vocabularies, scaler params).
+
+    `versions` (column -> version) lets vocabularies be reused from earlier fits of the same data.
+    """
+    action, columns, params = step['action'], step['columns'], step['params']
+    fitted: Dict[str, Any] = {}
+    if action == 'impute':
+        fitted['values'] = fit_impute(df, columns, params)
+    elif action == 'encode':
+        fitted = fit_encoder(df, columns, params, versions)
+    elif action == 'scale':
+        fitted['params'] = fit_scale(df, columns, params)
+    step['fitted'] = fitted
+    return fitted
+
+
+def apply_step(df: pd.DataFrame, step: Dict[str, Any]) -> Tuple[pd.DataFrame, List[str], Dict[str, str]]:
+    """Apply a fitted step. Returns the new frame, the columns it changed or added, and any renames."""
+    action, columns, params, fitted = step['action'], step['columns'], step['params'], step['fitted']
+    if action == 'drop':
+        return df.drop(columns=columns), [], {}
+    if action == 'rename':
+        rename_map = params.get('rename_map', {})
+        return df.rename(columns=rename_map), [], dict(rename_map)
+    if action == 'change_dtypes':
+        dtype_map = params.get('dtype_map', {})
+        for col, dtype in dtype_map.items():
+            if dtype == 'datetime':
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            else:
+                df[col] = df[col].astype(dtype, errors='ignore')
+        return df, list(dtype_map), {}
+    if action == 'impute':
+        for col in columns:
+            value = fitted['values'][col]
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and value is not None and value not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([value])
+            df[col] = df[col].fillna(value)
+        return df, list(columns), {}
+    if action == 'encode':
+        df, changed = apply_encoder(df, step)
+        return df, changed, {}
+    if action == 'scale':
+        return apply_scale(df, columns, params, fitted['params']), list(columns), {}
+    raise ValueError(f"Unsupported action for history: {action}")
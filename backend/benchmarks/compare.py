@@ -0,0 +1,64 @@
+"""Compare two benchmarks.run result files, case by case.
+
+    python -m benchmarks.compare base.json head.json --threshold 1.2
+
+Exits with status 1 if a case's median time or peak RSS grew by more than `threshold`.
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _index(report: Dict[str, Any]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    return {(r['case'], r['rows']): r for r in report['results'] if 'error' not in r}
+
+
+def _ratio(new: Optional[float], old: Optional[float]) -> Optional[float]:
+    return new / old if new is not None and old else None
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float = 1.2) -> List[Dict[str, Any]]:
+    """One row per case run in both reports, with head/base ratios of median time and peak RSS."""
+    old = _index(base)
+    rows = []
+    for key, new in _index(head).items():
+        if key not in old:
+            continue
+        time_ratio = _ratio(new['seconds']['median'], old[key]['seconds']['median'])
+        # RSS includes the interpreter; compare what the case added on top of it
+        memory_ratio = _ratio(new['rss_peak_mb'] - (new['rss_before_mb'] or 0),
+                              old[key]['rss_peak_mb'] - (old[key]['rss_before_mb'] or 0))
+        rows.append({
+            'case': key[0], 'rows': key[1],
+            'base_seconds': old[key]['seconds']['median'], 'head_seconds': new['seconds']['median'],
+            'time_ratio': time_ratio, 'memory_ratio': memory_ratio,
+            'regression': any(r is not None and r > threshold for r in (time_ratio, memory_ratio)),
+        })
+    return rows
+
+
+def _fmt(ratio: Optional[float]) -> str:
+    return '     -' if ratio is None else f'{ratio:6.2f}'
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="ratio of head to base above which a case counts as a regression")
+    args = parser.parse_args(argv)
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    rows = compare(base, head, args.threshold)
+    print(f"{'case':44} {'rows':>10} {'base s':>9} {'head s':>9}   time    mem")
+    for row in rows:
+        print(f"{row['case']:44} {row['rows']:>10} {row['base_seconds']:9.4f} {row['head_seconds']:9.4f} "
+              f"{_fmt(row['time_ratio'])} {_fmt(row['memory_ratio'])}{'  REGRESSION' if row['regression'] else ''}")
+    raise SystemExit(1 if any(row['regression'] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+"""Latency, throughput and peak memory of the crud functions and endpoints on synthetic CSVs.
+
+    python -m benchmarks.run --rows 10k 1m --repeats 3 --out results.json
+    python -m benchmarks.run --rows 10m --cases 'crud.scale*' 'endpoint./rows'
+    python -m benchmarks.compare base.json head.json
+
+Each case is run in a fresh process (unless --no-isolate) so its peak RSS is its own.
+Timings exclude setup; `first` is the cold call, before any per-column cache is warm.
+"""
+import argparse
+import fnmatch
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .synthetic import cached_csv, parse_rows
+
+# Generated CSVs are kept here between runs (they take a while at 10M rows)
+DATA_DIR = os.environ.get('DATAPREPPER_BENCH_DATA', os.path.join(os.path.dirname(__file__), 'data'))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+MB = 1024 * 1024
+
+# name -> setup(path); setup does untimed preparation and returns the call to time
+CASES: Dict[str, Callable[[str], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _on_file(call: Callable[[io.BufferedReader], Any]) -> Callable[[str], Callable[[], Any]]:
+    """Setup for a crud function that reads an upload: the file is reopened on every call."""
+    def setup(path):
+        def run():
+            with open(path, 'rb') as f:
+                result = call(f)
+                # Exports and pipeline applications are generators; drain them
+                if hasattr(result, '__next__'):
+                    for _ in result:
+                        pass
+        return run
+    return setup
+
+
+def _register_crud_cases():
+    from app import crud
+    from app.kernels import SCALE_METHODS
+
+    files = {
+        'crud.preview_csv': lambda f: crud.preview_csv(f, 5),
+        'crud.impute_missing[mean]': lambda f: crud.impute_missing(f, ['amount'], 'mean'),
+        'crud.impute_missing[median]': lambda f: crud.impute_missing(f, ['amount'], 'median'),
+        'crud.impute_missing[mode]': lambda f: crud.impute_missing(f, ['kind'], 'mode'),
+        'crud.encode_categorical[onehot]': lambda f: crud.encode_categorical(f, ['kind'], 'onehot'),
+        'crud.encode_categorical[ordinal]': lambda f: crud.encode_categorical(f, ['group'], 'ordinal'),
+        'crud.encode_categorical[topk]': lambda f: crud.encode_categorical(f, ['group'], 'topk'),
+        'crud.encode_categorical[hash]': lambda f: crud.encode_categorical(f, ['user'], 'hash'),
+        'crud.encode_categorical[frequency]': lambda f: crud.encode_categorical(f, ['user'], 'frequency'),
+        'crud.drop_columns': lambda f: crud.drop_columns(f, ['code']),
+        'crud.filter_rows[value]': lambda f: crud.filter_rows(f, 'kind', 'k0'),
+        'crud.filter_rows[range]': lambda f: crud.filter_rows(f, 'amount', min_value='40', max_value='60'),
+        'crud.filter_rows[regex]': lambda f: crud.filter_rows(f, 'group', regex='^g1'),
+        'crud.filter_rows[where]': lambda f: crud.filter_rows(f, where=json.dumps(
+            {'and': [{'column': 'kind', 'op': 'eq', 'value': 'k1'}, {'column': 'amount', 'op': 'gt', 'value': 50}]})),
+        'crud.rename_columns': lambda f: crud.rename_columns(f, {'amount': 'total'}),
+        'crud.change_dtypes': lambda f: crud.change_dtypes(f, {'count': 'float64'}),
+        'crud.drop_duplicates[first]': lambda f: crud.drop_duplicates(f, ['kind', 'rating']),
+        'crud.drop_duplicates[last]': lambda f: crud.drop_duplicates(f, ['kind', 'rating'], keep='last'),
+        'crud.get_column_stats': lambda f: crud.get_column_stats(f),
+        'crud.get_column_stats[approximate]': lambda f: crud.get_column_stats(f, approximate=True),
+        'crud.pipeline_preview': lambda f: crud.pipeline_preview(f, PIPELINE),
+        'crud.create_session': crud.create_session,
+    }
+    for method in SCALE_METHODS:
+        # Box-Cox needs positive values; id is the one column guaranteed to have them
+        columns = ['id'] if method == 'boxcox' else ['amount', 'score']
+        files[f'crud.scale_numeric[{method}]'] = lambda f, m=method, c=columns: crud.scale_numeric(f, c, m)
+    for name, call in files.items():
+        case(name)(_on_file(call))
+
+    @case('crud.apply_undo_cycle')
+    def apply_undo(path):
+        with open(path, 'rb') as f:
+            session_id = crud.create_session(f)
+
+        def run():
+            for action, columns, params in SESSION_STEPS:
+                crud.apply_transformation(None, session_id, action, columns, params)
+            for _ in SESSION_STEPS:
+                crud.undo_last_transformation(None, session_id)
+        return run
+
+    @case('crud.session_rows[sorted]')
+    def rows(path):
+        with open(path, 'rb') as f:
+            session_id = crud.create_session(f)
+        crud.apply_transformation(None, session_id, 'impute', ['amount'], {'method': 'mean'})
+        return lambda: crud.session_rows(session_id, offset=1000, limit=100, sort='amount')
+
+    @case('crud.export_session[parquet]')
+    def export(path):
+        with open(path, 'rb') as f:
+            session_id = crud.create_session(f)
+        crud.apply_transformation(None, session_id, 'scale', ['amount'], {'method': 'standard'})
+        return lambda: sum(len(part) for part in crud.export_session(session_id, 'parquet'))
+
+
+# Steps of the apply/undo cycle and the pipeline cases
+SESSION_STEPS = [
+    ('impute', ['amount'], {'method': 'mean'}),
+    ('scale', ['amount', 'score'], {'method': 'standard'}),
+    ('encode', ['kind'], {'method': 'ordinal'}),
+    ('drop', ['code'], {}),
+]
+PIPELINE = [
+    {'action': 'impute', 'columns': ['amount'], 'params': {'method': 'median'}},
+    {'action': 'filter', 'columns': ['count'], 'params': {'min_value': 10}},
+    {'action': 'encode', 'columns': ['kind'], 'params': {'method': 'onehot'}},
+    {'action': 'scale', 'columns': ['amount', 'score'], 'params': {'method': 'robust'}},
+    {'action': 'drop', 'columns': ['code']},
+]
+
+
+def _register_endpoint_cases():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.url.path} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    def upload(path) -> str:
+        with open(path, 'rb') as f:
+            return check(client.post('/upload', files={'file': ('data.csv', f, 'text/csv')})).json()['dataset_id']
+
+    def session(path) -> str:
+        dataset_id = upload(path)
+        return check(client.post('/create_session', data={'dataset_id': dataset_id})).json()['session_id']
+
+    @case('endpoint./upload')
+    def upload_case(path):
+        return lambda: upload(path)
+
+    # Preview endpoints on a registered dataset, as the dashboard calls them
+    posts = {
+        '/preview': {},
+        '/impute': {'method': 'mean', 'columns': json.dumps(['amount'])},
+        '/encode': {'method': 'onehot', 'columns': json.dumps(['kind'])},
+        '/scale': {'method': 'standard', 'columns': json.dumps(['amount', 'score'])},
+        '/drop_columns': {'columns': json.dumps(['code'])},
+        '/filter_rows': {'column': 'kind', 'value': 'k0'},
+        '/rename_columns': {'rename_map': json.dumps({'amount': 'total'})},
+        '/change_dtypes': {'dtype_map': json.dumps({'count': 'float64'})},
+        '/drop_duplicates': {'subset': json.dumps(['kind', 'rating'])},
+        '/pipeline': {'steps': json.dumps(PIPELINE)},
+        '/column_stats': {},
+    }
+    for route, data in posts.items():
+        @case(f'endpoint.{route}')
+        def post(path, route=route, data=data):
+            form = {'dataset_id': upload(path), **data}
+            return lambda: check(client.post(route, data=form))
+
+    @case('endpoint./apply_transformation+/undo')
+    def apply_undo(path):
+        session_id = session(path)
+
+        def run():
+            for action, columns, params in SESSION_STEPS:
+                check(client.post('/apply_transformation', data={
+                    'session_id': session_id, 'action': action, 'columns': json.dumps(columns), 'params': json.dumps(params)}))
+            for _ in SESSION_STEPS:
+                check(client.post('/undo', data={'session_id': session_id}))
+        return run
+
+    @case('endpoint./rows')
+    def rows(path):
+        session_id = session(path)
+        return lambda: check(client.get('/rows', params={'session_id': session_id, 'offset': 1000, 'sort': 'amount'}))
+
+    @case('endpoint./export')
+    def export(path):
+        session_id = session(path)
+        return lambda: check(client.get('/export', params={'session_id': session_id, 'format': 'csv'}))
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size (Linux only)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError):
+        return None
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(name: str, path: str, rows: int, repeats: int) -> Dict[str, Any]:
+    """Time `repeats` calls of case `name` on `path`, then trace one more for peak memory."""
+    if not CASES:
+        register_cases()
+    rss_before = _rss_mb()
+    run = CASES[name](path)
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        began = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - began)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = float(np.median(times))
+    return {
+        'case': name, 'rows': rows,
+        'seconds': {'first': times[0], 'min': min(times), 'median': median, 'max': max(times)},
+        'rows_per_second': rows / median if median else None,
+        # Python and NumPy allocations only; Arrow buffers show up in RSS
+        'traced_peak_mb': traced / MB,
+        'rss_before_mb': rss_before,
+        'rss_peak_mb': _max_rss_mb(),
+    }
+
+
+def _isolated(name: str, path: str, rows: int, repeats: int) -> Dict[str, Any]:
+    # A new pool per case: a fresh interpreter, so ru_maxrss covers this case alone
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(measure, name, path, rows, repeats).result()
+
+
+def register_cases():
+    # Per-request INFO logs would swamp the results
+    for name in ('dataprepper', 'httpx'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _register_crud_cases()
+    _register_endpoint_cases()
+
+
+def select(patterns: Optional[List[str]]) -> List[str]:
+    if not CASES:
+        register_cases()
+    if not patterns:
+        return list(CASES)
+    names = [name for name in CASES if name in patterns or any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+    if not names:
+        raise SystemExit(f"No case matches {patterns}; see --list")
+    return names
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'commit': _git('rev-parse', 'HEAD'), 'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def run_suite(sizes: List[str], patterns: Optional[List[str]] = None, repeats: int = 3, seed: int = 0,
+              isolate: bool = True, data_dir: str = DATA_DIR, log=print) -> Dict[str, Any]:
+    """Run the selected cases on a generated CSV of each size; returns the results document."""
+    names = select(patterns)
+    report = {'environment': environment(), 'repeats': repeats, 'seed': seed, 'datasets': {}, 'results': []}
+    for size in sizes:
+        rows = parse_rows(size)
+        path = cached_csv(data_dir, rows, seed=seed)
+        report['datasets'][str(rows)] = {'path': path, 'bytes': os.path.getsize(path)}
+        for name in names:
+            try:
+                result = _isolated(name, path, rows, repeats) if isolate else measure(name, path, rows, repeats)
+            except Exception as e:
+                result = {'case': name, 'rows': rows, 'error': f"{type(e).__name__}: {e}"}
+            report['results'].append(result)
+            if 'error' in result:
+                log(f"{name:44} {rows:>10}  error: {result['error']}")
+            else:
+                log(f"{name:44} {rows:>10}  {result['seconds']['median']:9.4f}s  "
+                    f"{result['rows_per_second']:>14,.0f} rows/s  {result['rss_peak_mb']:8.0f} MB RSS")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', nargs='+', default=['10k'], help="sizes to run: row counts or 10k, 1m, 10m")
+    parser.add_argument('--cases', nargs='+', help="case names or glob patterns (default: all)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-isolate', dest='isolate', action='store_false',
+                        help="run every case in this process (faster; RSS peaks then accumulate)")
+    parser.add_argument('--out', help=f"results file (default: {RESULTS_DIR}/<timestamp>-<commit>.json)")
+    parser.add_argument('--list', action='store_true', help="print the case names and exit")
+    args = parser.parse_args(argv)
+    if args.list:
+        print('\n'.join(select(args.cases)))
+        return
+    report = run_suite(args.rows, args.cases, args.repeats, args.seed, args.isolate)
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{(report['environment']['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Deterministic synthetic CSVs for tests and benchmarks.
+
+The same seed and column spec always give the same bytes: rows are generated in blocks
+of BLOCK_ROWS, each from its own generator seeded with (seed, block number), so a 10M-row
+file is written with one block in memory at a time.
+
+    python -m benchmarks.synthetic 1m data.csv --null-rate 0.1 --cardinality 5000
+"""
+import argparse
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Named sizes accepted wherever a row count is
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+# Rows generated (and written) at a time; part of the seed, so changing it changes the data
+BLOCK_ROWS = 100_000
+KINDS = ('id', 'int', 'float', 'category', 'bool', 'datetime', 'code')
+CRIME_TYPES = ('THEFT', 'BATTERY', 'CRIMINAL DAMAGE', 'NARCOTICS', 'ASSAULT', 'OTHER OFFENSE', 'BURGLARY',
+               'MOTOR VEHICLE THEFT', 'DECEPTIVE PRACTICE', 'ROBBERY', 'CRIMINAL TRESPASS', 'WEAPONS VIOLATION')
+
+
+class Column(NamedTuple):
+    name: str
+    kind: str
+    null_rate: float = 0.0
+    # Distinct values of int and category columns
+    cardinality: int = 100
+    # Values of a category column (else generated names)
+    labels: Optional[tuple] = None
+
+
+def mixed_columns(null_rate: float = 0.05, cardinality: int = 1000) -> List[Column]:
+    """A bit of everything the app handles: numbers with and without gaps, categories of low,
+    chosen and high cardinality, flags, timestamps and unique codes."""
+    return [
+        Column('id', 'id'),
+        Column('count', 'int', 0.0, 100),
+        Column('amount', 'float', null_rate),
+        Column('score', 'float', 0.0),
+        Column('rating', 'int', null_rate, 5),
+        Column('kind', 'category', null_rate, 8),
+        Column('group', 'category', null_rate, cardinality),
+        Column('user', 'category', 0.0, max(cardinality * 100, 10)),
+        Column('flag', 'bool', null_rate),
+        Column('when', 'datetime', null_rate),
+        Column('code', 'code'),
+    ]
+
+
+def crime_columns(null_rate: float = 0.02, cardinality: int = 300) -> List[Column]:
+    """Shaped like the Chicago crime extract the preview endpoints were first written against."""
+    return [
+        Column('ID', 'id'),
+        Column('Case Number', 'code'),
+        Column('Date', 'datetime'),
+        Column('Primary Type', 'category', 0.0, len(CRIME_TYPES), CRIME_TYPES),
+        Column('Arrest', 'bool'),
+        Column('Beat', 'int', null_rate, cardinality),
+        Column('Latitude', 'float', null_rate),
+    ]
+
+
+PRESETS = {'mixed': mixed_columns, 'crime': crime_columns}
+
+
+def parse_rows(rows) -> int:
+    return SIZES[rows.lower()] if isinstance(rows, str) and rows.lower() in SIZES else int(rows)
+
+
+def _values(col: Column, rng: np.random.Generator, start: int, n: int) -> np.ndarray:
+    if col.kind == 'id':
+        return np.arange(start, start + n) + 1000
+    if col.kind == 'int':
+        return rng.integers(0, col.cardinality, n)
+    if col.kind == 'float':
+        return np.round(rng.normal(50.0, 15.0, n), 6)
+    if col.kind == 'category':
+        # Zipf-skewed, like most real categorical columns
+        codes = (rng.zipf(1.3, n) - 1) % col.cardinality
+        if col.labels:
+            return np.array(col.labels, dtype=object)[codes % len(col.labels)]
+        return np.char.add(col.name[:1].lower(), codes.astype(str)).astype(object)
+    if col.kind == 'bool':
+        return rng.random(n) < 0.3
+    if col.kind == 'datetime':
+        seconds = (np.arange(start, start + n) * 600 + rng.integers(0, 600, n)).astype('timedelta64[s]')
+        return np.datetime_as_string(np.datetime64('2023-01-01T00:00:00') + seconds, unit='s').astype(object)
+    if col.kind == 'code':
+        return np.char.add('JA', np.char.zfill(np.arange(start, start + n).astype(str), 8)).astype(object)
+    raise ValueError(f"Unknown column kind: {col.kind}; expected one of {KINDS}")
+
+
+def _column(col: Column, rng: np.random.Generator, start: int, n: int):
+    values = _values(col, rng, start, n)
+    if not col.null_rate:
+        return values
+    gaps = rng.random(n) < col.null_rate
+    if col.kind in ('id', 'int'):
+        return pd.arrays.IntegerArray(values.astype('int64'), gaps)
+    if col.kind == 'float':
+        return np.where(gaps, np.nan, values)
+    values = values.astype(object)
+    values[gaps] = None
+    return values
+
+
+def blocks(rows, columns: Optional[List[Column]] = None, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """The rows as frames of up to BLOCK_ROWS rows each."""
+    rows, columns = parse_rows(rows), columns or mixed_columns()
+    for number, start in enumerate(range(0, rows, BLOCK_ROWS)):
+        rng = np.random.default_rng([seed, number])
+        n = min(BLOCK_ROWS, rows - start)
+        yield pd.DataFrame({col.name: _column(col, rng, start, n) for col in columns})
+
+
+def generate(rows, columns: Optional[List[Column]] = None, seed: int = 0) -> pd.DataFrame:
+    return pd.concat(blocks(rows, columns, seed), ignore_index=True)
+
+
+def write_csv(path: str, rows, columns: Optional[List[Column]] = None, seed: int = 0) -> str:
+    """Write the rows to `path` block by block; returns the path."""
+    with open(path, 'w', newline='') as out:
+        for number, block in enumerate(blocks(rows, columns, seed)):
+            block.to_csv(out, index=False, header=number == 0)
+    return path
+
+
+def cached_csv(directory: str, rows, preset: str = 'mixed', seed: int = 0, **options) -> str:
+    """Path of a generated CSV under `directory`, written on first use."""
+    name = '-'.join([preset, str(parse_rows(rows)), f's{seed}'] + [f'{k}{v}' for k, v in sorted(options.items())])
+    path = os.path.join(directory, f'{name}.csv')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_csv(path + '.partial', rows, PRESETS[preset](**options), seed)
+        os.replace(path + '.partial', path)
+    return path
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', help=f"row count or one of {', '.join(SIZES)}")
+    parser.add_argument('path')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='mixed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--null-rate', type=float)
+    parser.add_argument('--cardinality', type=int)
+    args = parser.parse_args(argv)
+    options: Dict[str, float] = {}
+    if args.null_rate is not None:
+        options['null_rate'] = args.null_rate
+    if args.cardinality is not None:
+        options['cardinality'] = args.cardinality
+    write_csv(args.path, args.rows, PRESETS[args.preset](**options), args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,9 @@
 #!/bin/bash
 cd "$(dirname "$0")"
-uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
\ No newline at end of file
+# WORKERS>1 runs several processes; sessions and job state then live in the shared on-disk backend
+WORKERS=${WORKERS:-1}
+if [ "$WORKERS" -gt 1 ]; then
+  export DATAPREPPER_SESSION_BACKEND=${DATAPREPPER_SESSION_BACKEND:-shared}
+  exec uvicorn app.main:app --workers "$WORKERS" --host 127.0.0.1 --port 8000
+fi
+uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
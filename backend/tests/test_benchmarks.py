@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import filecmp
+import json
+import pandas as pd
+import pytest
+from benchmarks import compare, run, synthetic
+
+def test_generator_is_deterministic_and_honours_the_spec(tmp_path, monkeypatch):
+    monkeypatch.setattr(synthetic, 'BLOCK_ROWS', 3000)
+    columns = synthetic.mixed_columns(null_rate=0.2, cardinality=50)
+    a = synthetic.write_csv(str(tmp_path / 'a.csv'), 10_000, columns, seed=4)
+    b = synthetic.write_csv(str(tmp_path / 'b.csv'), 10_000, columns, seed=4)
+    assert filecmp.cmp(a, b, shallow=False)
+    df = pd.read_csv(a)
+    assert len(df) == 10_000 and df['id'].is_unique and df['code'].is_unique
+    assert df['amount'].isna().mean() == pytest.approx(0.2, abs=0.02)
+    assert df['group'].nunique() <= 50 and df['kind'].nunique() <= 8
+    assert not df['score'].isna().any()
+    assert synthetic.parse_rows('1M') == 1_000_000
+    other = synthetic.generate(10_000, columns, seed=5)
+    assert not other['amount'].equals(df['amount'])
+
+def test_suite_writes_comparable_results(tmp_path):
+    report = run.run_suite(['2000'], ['crud.preview_csv', 'crud.scale_numeric[robust]', 'endpoint./impute'],
+                           repeats=1, isolate=False, data_dir=str(tmp_path), log=lambda line: None)
+    assert [r['case'] for r in report['results']] == ['crud.preview_csv', 'crud.scale_numeric[robust]', 'endpoint./impute']
+    for result in report['results']:
+        assert 'error' not in result, result
+        assert result['rows'] == 2000 and result['seconds']['min'] <= result['seconds']['median']
+        assert result['rows_per_second'] > 0 and result['traced_peak_mb'] >= 0
+    json.dumps(report)
+    slower = json.loads(json.dumps(report))
+    slower['results'][0]['seconds']['median'] *= 2
+    rows = compare.compare(report, slower, threshold=1.5)
+    assert [row['regression'] for row in rows] == [True, False, False]
@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+CSV = b"id,city,score\n1,Austin,10\n2,,\n3,Boston,30\n4,Austin,40\n"
+
+def upload_dataset():
+    response = client.post("/upload", files={"file": ("data.csv", io.BytesIO(CSV), "text/csv")})
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    return response.json()
+
+def test_upload_returns_dataset_id():
+    data = upload_dataset()
+    assert data["dataset_id"], f"Missing dataset_id: {data}"
+    assert data["columns"] == ["id", "city", "score"], f"Unexpected columns: {data['columns']}"
+    assert data["n_rows"] == 4, f"Unexpected row count: {data['n_rows']}"
+
+def test_transform_by_dataset_id_does_not_mutate_dataset():
+    dataset_id = upload_dataset()["dataset_id"]
+    response = client.post(
+        "/impute?rows=4",
+        data={"dataset_id": dataset_id, "method": "constant", "columns": json.dumps(["city"]), "value": "Unknown"}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert response.json()["data"][1][1] == "Unknown", f"Value not imputed: {response.json()}"
+    response = client.post("/preview?rows=4", data={"dataset_id": dataset_id})
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert response.json()["data"][1][1] != "Unknown", "Registered dataset was modified in place"
+
+def test_session_from_dataset_id():
+    dataset_id = upload_dataset()["dataset_id"]
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()["session_id"]
+    response = client.post(
+        "/apply_transformation?rows=4",
+        data={"session_id": session_id, "action": "drop", "columns": json.dumps(["score"])}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert "score" not in response.json()["columns"]
+    stats = client.post("/column_stats", data={"session_id": session_id}).json()["stats"]
+    assert "score" not in stats, f"Stats not computed on session state: {list(stats)}"
+    response = client.post("/undo?rows=4", data={"session_id": session_id})
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert "score" in response.json()["columns"]
+
+def test_unknown_dataset_id():
+    response = client.post("/preview", data={"dataset_id": "missing"})
+    assert response.status_code == 400, f"Status code: {response.status_code}, Response: {response.text}"
+
+def test_session_needs_a_source():
+    response = client.post("/create_session")
+    assert response.status_code == 400, f"Status code: {response.status_code}, Response: {response.text}"
+    assert "dataset_id" in response.json()["detail"]
+
+def test_row_local_preview_reads_only_preview_rows():
+    # A malformed line far below the preview rows would fail a full parse
+    csv = CSV + b"5,Denver,50,extra,fields\n"
+    response = client.post(
+        "/rename_columns?rows=2",
+        files={"file": ("data.csv", io.BytesIO(csv), "text/csv")},
+        data={"rename_map": json.dumps({"city": "town"})}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert response.json()["columns"] == ["id", "town", "score"]
+
+def test_global_statistic_uses_full_column():
+    response = client.post(
+        "/impute?rows=2",
+        files={"file": ("data.csv", io.BytesIO(CSV), "text/csv")},
+        data={"method": "mean", "columns": json.dumps(["score"])}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    assert response.json()["data"][1][2] == (10 + 30 + 40) / 3, f"Mean not computed on full column: {response.json()}"
+
+def test_sampled_upload(tmp_path, monkeypatch):
+    from app import crud
+    monkeypatch.setattr(crud, "DATA_DIR", str(tmp_path))
+    csv = "id,group\n" + "\n".join(f"{i},{'a' if i % 4 else 'b'}" for i in range(2000))
+    response = client.post(
+        "/upload",
+        files={"file": ("big.csv", io.BytesIO(csv.encode()), "text/csv")},
+        data={"sample_size": "200", "seed": "7", "stratify_by": "group"}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    uploaded = response.json()
+    assert uploaded["n_rows"] == 200
+    assert uploaded["sample"] == {"sample_size": 200, "total_rows": 2000, "seed": 7, "stratify_by": "group"}
+    assert os.path.exists(crud.dataset_files[uploaded["dataset_id"]]), "Full upload was not spooled for export"
+    response = client.post("/column_stats", data={"dataset_id": uploaded["dataset_id"]})
+    body = response.json()
+    assert body["sample"]["total_rows"] == 2000
+    assert body["stats"]["group"]["value_counts"][0] == {"value": "a", "count": 150}
+    response = client.post("/preview?rows=3", data={"dataset_id": uploaded["dataset_id"]})
+    assert response.json()["sample"]["sample_size"] == 200
+
+def test_stratified_sample_memory_is_bounded_by_size(monkeypatch):
+    from app import sampling
+    held = []
+    original = sampling._proportional
+    monkeypatch.setattr(sampling, "_proportional", lambda strata, *args: held.append(len(strata)) or original(strata, *args))
+    chunks = (pd.DataFrame({"id": np.arange(start, start + 1000)}) for start in range(0, 20_000, 1000))
+    sample, total = sampling.stratified_sample(chunks, 100, "id")
+    assert len(sample) == 100 and total == 20_000
+    # Every id is its own stratum: only the rows competing for the 100 slots are kept
+    assert max(held) <= 2 * 100 + 1000, f"Pool grew to {max(held)} rows"
@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app import dedup
+from app.dedup import drop_rows, find_duplicates
+from app.main import app
+
+client = TestClient(app)
+
+def make_frame(n=9000):
+    rng = np.random.default_rng(9)
+    return pd.DataFrame({
+        'a': rng.integers(0, 30, n),
+        'b': rng.choice(['x', 'y', None], n),
+        'c': np.where(np.arange(n) % 11 == 0, np.nan, rng.integers(0, 3, n)),
+        'noise': rng.normal(size=n),
+    })
+
+def chunks_of(df, size):
+    # Each chunk gets its own inferred dtypes, as CSV chunks do
+    return lambda: (pd.DataFrame({c: df[c].iloc[i:i + size].tolist() for c in df.columns}) for i in range(0, len(df), size))
+
+@pytest.mark.parametrize('keep', ['first', 'last', 'none'])
+@pytest.mark.parametrize('memory_rows', [10 ** 6, 1000])
+def test_matches_pandas_across_chunks_and_spills(keep, memory_rows):
+    df = make_frame()
+    subset = ['a', 'b', 'c']
+    drop, summary = find_duplicates(chunks_of(df, 700), subset, keep, memory_rows=memory_rows)
+    expected = df.duplicated(subset, keep=False if keep == 'none' else keep)
+    np.testing.assert_array_equal(drop, np.flatnonzero(expected))
+    assert summary['spilled'] == (memory_rows < len(df))
+    assert summary['duplicate_rows'] == df.duplicated(subset).sum()
+    assert summary['duplicate_ratio'] == pytest.approx(df.duplicated(subset).mean())
+    assert summary['duplicate_groups'] == df[df.duplicated(subset, keep=False)].drop_duplicates(subset).shape[0]
+    kept = pd.concat(drop_rows(chunks_of(df, 700)(), drop), ignore_index=True)
+    assert len(kept) == len(df) - expected.sum()
+
+def test_verify_rejects_hash_collisions(monkeypatch):
+    df = make_frame(3000)
+    original = dedup.row_hashes
+    # A 4-bit hash: almost every row collides with some distinct row
+    monkeypatch.setattr(dedup, 'row_hashes', lambda frame, subset=None: original(frame, subset) % np.uint64(16))
+    loose, _ = find_duplicates(lambda: [df], ['a', 'b'])
+    exact, summary = find_duplicates(lambda: [df], ['a', 'b'], verify=True)
+    expected = np.flatnonzero(df.duplicated(['a', 'b']))
+    assert len(loose) > len(expected)
+    np.testing.assert_array_equal(exact, expected)
+    assert summary['verified'] and summary['duplicate_rows'] == len(expected)
+
+def test_large_integers_are_not_merged(monkeypatch):
+    df = pd.DataFrame({'id': [2 ** 53, 2 ** 53 + 1, 5, 2 ** 53 + 1]})
+    drop, _ = find_duplicates(lambda: [df])
+    np.testing.assert_array_equal(drop, [3])
+    # verify compares the values themselves, not a lossy form of them
+    monkeypatch.setattr(dedup, 'row_hashes', lambda frame, subset=None: np.zeros(len(frame), dtype=np.uint64))
+    drop, _ = find_duplicates(chunks_of(df, 2), verify=True)
+    np.testing.assert_array_equal(drop, [3])
+
+def test_endpoints_report_duplicates():
+    df = make_frame()
+    csv = df.to_csv(index=False).encode()
+    response = client.post("/drop_duplicates?rows=10", files={"file": ("t.csv", csv, "text/csv")},
+                           data={"subset": json.dumps(['a', 'b']), "keep": "last"})
+    assert response.status_code == 200, f"Dedup failed: {response.text}"
+    body = response.json()
+    expected = df[~df.duplicated(['a', 'b'], keep='last')]
+    assert [row[3] for row in body['data']] == pytest.approx(expected['noise'].head(10).tolist())
+    assert body['duplicates']['dropped_rows'] == df.duplicated(['a', 'b'], keep='last').sum()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "drop", "columns": "noise", "params": "{}"})
+    stats = client.post("/column_stats", data={"session_id": session_id, "duplicates": True}).json()
+    assert stats['duplicates']['duplicate_rows'] == df.drop(columns='noise').duplicated().sum()
+    assert 'a' in stats['stats']
+    bad = client.post("/drop_duplicates", files={"file": ("t.csv", csv, "text/csv")}, data={"keep": "middle"})
+    assert bad.status_code == 400
@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app import crud, encoders
+from app.chunked import fit_chunked
+from app.main import app
+from app.pipeline import make_pipeline
+from app.serialize import PREVIEW_INDICATOR_COLUMNS
+from app.transforms import apply_step, fit_step, make_step
+
+client = TestClient(app)
+
+def make_frame(n=6000, distinct=1500):
+    rng = np.random.default_rng(3)
+    ids = rng.zipf(1.5, n) % distinct
+    return pd.DataFrame({
+        'user': np.where(np.arange(n) % 50 == 0, None, [f"u{i}" for i in ids]),
+        'city': rng.choice(['oslo', 'lima', 'pune', 'kyiv'], n, p=[0.5, 0.3, 0.15, 0.05]),
+        'x': rng.normal(size=n),
+    })
+
+def encode(df, method, columns=('user',), **params):
+    step = make_step('encode', list(columns), {'method': method, **params})
+    fit_step(df, step)
+    return apply_step(df.copy(), step)[0], step
+
+def test_onehot_is_sparse_and_matches_get_dummies():
+    df = make_frame()
+    result, _ = encode(df, 'onehot')
+    expected = pd.get_dummies(df, columns=['user'])
+    assert list(result.columns) == list(expected.columns)
+    assert all(isinstance(result[c].dtype, pd.SparseDtype) for c in result.columns if c.startswith('user_'))
+    pd.testing.assert_frame_equal(encoders.dense_columns(result), expected)
+    # One stored value per row, whatever the number of categories
+    indicators = [c for c in result.columns if c.startswith('user_')]
+    assert result[indicators].memory_usage().sum() < expected[indicators].memory_usage().sum() / 20
+
+def test_topk_hash_and_count_encodings():
+    df = make_frame()
+    result, step = encode(df, 'topk', top_k=3)
+    top = df['user'].value_counts().head(3).index.tolist()
+    assert step['fitted']['categories']['user'] == top
+    other = df['user'].notna() & ~df['user'].isin(top)
+    assert (result['user_other'].to_numpy() == other.to_numpy()).all()
+    indicators = encoders.dense_columns(result[[f"user_{u}" for u in top] + ['user_other']])
+    assert (indicators.sum(axis=1) == df['user'].notna()).all()
+
+    result, step = encode(df, 'hash', n_features=8)
+    assert step['fitted'] == {} and [c for c in result.columns if c.startswith('user_')] == [f"user_hash{i}" for i in range(8)]
+    hashed = encoders.dense_columns(result[[f"user_hash{i}" for i in range(8)]]).to_numpy()
+    assert (hashed.sum(axis=1) == df['user'].notna()).all()
+    # The same value always lands in the same bucket
+    again, _ = encode(df.iloc[::-1].reset_index(drop=True), 'hash', n_features=8)
+    assert (encoders.dense_columns(again).iloc[::-1].reset_index(drop=True)[result.columns[2:]] ==
+            encoders.dense_columns(result)[result.columns[2:]]).all().all()
+
+    counts = df['city'].value_counts()
+    result, _ = encode(df, 'count', ['city'])
+    assert (result['city'] == df['city'].map(counts)).all()
+    result, _ = encode(df, 'frequency', ['city'])
+    assert np.allclose(result['city'], df['city'].map(counts / counts.sum()))
+    with pytest.raises(ValueError):
+        encode(df, 'target')
+
+@pytest.mark.parametrize('method', ['topk', 'frequency', 'onehot'])
+def test_chunked_vocabularies_match(method):
+    df = make_frame()
+    [expected] = make_pipeline([{'action': 'encode', 'columns': ['user', 'city'], 'params': {'method': method, 'top_k': 5}}])
+    fit_step(df, expected)
+    [step] = make_pipeline([{'action': 'encode', 'columns': ['user', 'city'], 'params': {'method': method, 'top_k': 5}}])
+    fit_chunked(lambda: (df.iloc[i:i + 700] for i in range(0, len(df), 700)), [step])
+    assert step['fitted'] == expected['fitted']
+
+def test_session_encoding_reuses_vocabulary_and_bounds_the_preview(monkeypatch):
+    df = make_frame()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", df.to_csv(index=False).encode(), "text/csv")}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    counted = []
+    original = encoders.vocabulary_from_counts
+    monkeypatch.setattr(encoders, 'vocabulary_from_counts', lambda counts, params: counted.append(1) or original(counts, params))
+    response = client.post("/apply_transformation", data={"session_id": session_id, "action": "encode", "columns": "user",
+                                                          "params": json.dumps({"method": "onehot"})})
+    body = response.json()
+    generated = df['user'].nunique()
+    assert len(body['columns']) == 2 + PREVIEW_INDICATOR_COLUMNS
+    assert body['omitted_columns'] == generated - PREVIEW_INDICATOR_COLUMNS
+    client.post("/undo", data={"session_id": session_id})
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "encode", "columns": "user",
+                                               "params": json.dumps({"method": "ordinal"})})
+    assert len(counted) == 1, "The vocabulary of an unchanged column should be counted once"
+    # Arrow export densifies the indicators
+    client.post("/undo", data={"session_id": session_id})
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "encode", "columns": "city",
+                                               "params": json.dumps({"method": "onehot"})})
+    exported = pd.read_parquet(io.BytesIO(client.get("/export", params={"session_id": session_id, "format": "parquet"}).content))
+    assert exported['city_oslo'].dtype == bool and exported['city_oslo'].sum() == (df['city'] == 'oslo').sum()
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi.testclient import TestClient
+from app import executor
+from app.executor import ExecutorBusy, Lane
+from app.main import app
+
+client = TestClient(app)
+
+def make_lane(workers=1, queue_size=1, timeout=5.0):
+    return Lane('test', lambda: ThreadPoolExecutor(workers), workers, queue_size, timeout)
+
+def test_lane_rejects_when_queue_full():
+    lane = make_lane()
+    release = threading.Event()
+    running = [lane.submit(release.wait), lane.submit(release.wait)]
+    with pytest.raises(ExecutorBusy) as err:
+        lane.submit(release.wait)
+    assert err.value.status_code == 429
+    release.set()
+    for future in running:
+        future.result()
+    assert lane.in_flight == 0, f"Slots leaked: {lane.in_flight}"
+    lane.submit(lambda: None).result()
+
+def test_lane_timeout_keeps_slot_until_done():
+    lane = make_lane(queue_size=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(ExecutorBusy) as err:
+        asyncio.run(lane.run(release.wait))
+    assert err.value.status_code == 503
+    assert lane.in_flight == 1, "Timed-out job must hold its slot while still running"
+    release.set()
+    deadline = time.time() + 2
+    while lane.in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert lane.in_flight == 0
+
+def test_event_loop_not_blocked():
+    lane = make_lane(workers=2)
+    async def main():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        task = asyncio.create_task(ticker())
+        await lane.run(time.sleep, 0.3)
+        task.cancel()
+        return ticks
+    assert asyncio.run(main()) > 10, "Event loop stalled while a job ran"
+
+def test_saturated_endpoint_returns_429(monkeypatch):
+    lane = make_lane(workers=1, queue_size=0)
+    release = threading.Event()
+    lane.submit(release.wait)
+    monkeypatch.setattr(executor, 'cpu_lane', lane)
+    csv = b"a,b\n1,2\n3,\n"
+    response = client.post("/impute", files={"file": ("t.csv", csv, "text/csv")}, data={"method": "mean", "columns": "b"})
+    release.set()
+    assert response.status_code == 429, f"Expected 429, got {response.status_code}: {response.text}"
+    assert response.headers.get("retry-after") == "1"
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gzip
+import io
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from app import crud
+from app.main import app
+
+client = TestClient(app)
+
+def make_frame(n=2500):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'x': np.where(np.arange(n) % 7 == 0, np.nan, rng.normal(size=n)),
+        'kind': rng.choice(['a', 'b', 'c'], n),
+        'count': rng.integers(0, 100, n),
+    })
+
+def make_session(df, **upload):
+    csv = df.to_csv(index=False).encode()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}, data=upload).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "impute", "columns": "x",
+                                               "params": '{"method": "mean"}'})
+    return session_id
+
+def test_export_formats_roundtrip():
+    df = make_frame()
+    session_id = make_session(df)
+    expected = crud.session_history[session_id].state().to_frame()
+    # CSV has no dtypes: compare against the plain text/numeric frame
+    as_text = expected.astype({'kind': 'str'})
+    csv = client.get("/export", params={"session_id": session_id})
+    assert csv.headers['content-type'].startswith('text/csv')
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(csv.content)), as_text, check_dtype=False)
+    gz = client.get("/export", params={"session_id": session_id, "compression": "gzip"}).content
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(gzip.decompress(gz))), as_text, check_dtype=False)
+    zst = client.get("/export", params={"session_id": session_id, "compression": "zstd"}).content
+    raw = pa.CompressedInputStream(pa.BufferReader(zst), 'zstd').read()
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(raw)), as_text, check_dtype=False)
+    parquet = client.get("/export", params={"session_id": session_id, "format": "parquet"}).content
+    pd.testing.assert_frame_equal(pq.read_table(pa.BufferReader(parquet)).to_pandas(), expected)
+    feather = client.get("/export", params={"session_id": session_id, "format": "feather"}).content
+    pd.testing.assert_frame_equal(ipc.open_file(pa.BufferReader(feather)).read_all().to_pandas(), expected)
+
+def test_export_streams_in_chunks():
+    df = make_frame()
+    session_id = make_session(df)
+    parts = list(crud.export_session(session_id, 'parquet', chunk_rows=500))
+    assert len([p for p in parts if p]) >= 5, f"Expected one part per chunk, got {len(parts)}"
+    table = pq.read_table(pa.BufferReader(b''.join(parts)))
+    assert table.num_rows == len(df) and pq.ParquetFile(pa.BufferReader(b''.join(parts))).num_row_groups == 5
+
+def test_sampled_session_exports_every_row():
+    df = make_frame()
+    session_id = make_session(df, sample_size=100)
+    assert len(crud.session_history[session_id].state()) == 100
+    exported = pd.read_csv(io.BytesIO(client.get("/export", params={"session_id": session_id}).content))
+    assert len(exported) == len(df), f"Expected all {len(df)} rows, got {len(exported)}"
+    assert exported['x'].isna().sum() == 0, "Imputation not replayed over the full upload"
+
+def test_export_rejects_unknown_format():
+    session_id = make_session(make_frame(100))
+    response = client.get("/export", params={"session_id": session_id, "format": "xlsx"})
+    assert response.status_code == 400
+    response = client.get("/export", params={"session_id": session_id, "format": "parquet", "compression": "gzip"})
+    assert response.status_code == 400
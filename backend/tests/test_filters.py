@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app import crud
+from app.filters import ColumnIndex, Query, mask, parse_where
+from app.main import app
+
+client = TestClient(app)
+
+def make_frame(n=5000):
+    rng = np.random.default_rng(11)
+    return pd.DataFrame({
+        'x': np.where(np.arange(n) % 7 == 0, np.nan, rng.normal(size=n).round(2)),
+        'count': rng.integers(0, 50, n),
+        'kind': pd.Categorical(rng.choice(['beta', 'alpha', 'gamma', None], n)),
+        'name': rng.choice(['north-1', 'south-2', 'east-3', 'west-4'], n),
+    })
+
+CONDITIONS = [
+    {'column': 'count', 'op': 'eq', 'value': '7'},
+    {'column': 'count', 'op': 'ne', 'value': 7},
+    {'column': 'x', 'op': 'lt', 'value': '-0.5'},
+    {'column': 'x', 'op': 'ge', 'value': 1.25},
+    {'column': 'x', 'op': 'between', 'min': -1, 'max': '0.5'},
+    {'column': 'kind', 'op': 'in', 'values': ['alpha', 'gamma', 'zeta']},
+    {'column': 'kind', 'op': 'gt', 'value': 'alpha'},
+    {'column': 'kind', 'op': 'isnull'},
+    {'column': 'name', 'op': 'regex', 'value': '^(north|west)'},
+    {'column': 'x', 'op': 'notnull'},
+]
+
+@pytest.mark.parametrize('cond', CONDITIONS, ids=lambda c: f"{c['column']}-{c['op']}")
+def test_index_lookups_match_a_scan(cond):
+    df = make_frame()
+    index = ColumnIndex(df[cond['column']])
+    expected = np.flatnonzero(mask(cond, df))
+    assert len(expected), f"Condition matches nothing: {cond}"
+    np.testing.assert_array_equal(index.rows(cond), expected)
+    assert index.count(cond) == len(expected)
+
+def test_compound_expressions_run_most_selective_first():
+    df = make_frame()
+    where = parse_where(json.dumps({'and': [
+        {'column': 'x', 'op': 'notnull'},
+        {'or': [{'column': 'name', 'op': 'regex', 'value': 'south'}, {'column': 'kind', 'op': 'eq', 'value': 'beta'}]},
+        {'column': 'count', 'op': 'eq', 'value': '3'},
+    ]}))
+    indexes = {col: ColumnIndex(df[col]) for col in df.columns}
+    query = Query(indexes.__getitem__, len(df))
+    np.testing.assert_array_equal(query.rows(where), np.flatnonzero(mask(where, df)))
+    # The equality is by far the most selective, so it runs first and the rest only check its rows
+    assert query.plan[0] == {'condition': "count eq '3'", 'via': 'index', 'rows': int((df['count'] == 3).sum())}
+    assert {entry['via'] for entry in query.plan[1:]} == {'probe'}
+    with pytest.raises(ValueError):
+        parse_where({'column': 'x', 'op': 'like', 'value': 1})
+
+def test_string_form_values_compare_as_numbers():
+    df = make_frame()
+    csv = df.to_csv(index=False).encode()
+    response = client.post("/filter_rows", files={"file": ("t.csv", csv, "text/csv")},
+                           data={"column": "count", "min_value": "10", "max_value": "12"})
+    assert response.status_code == 200, f"Filter failed: {response.text}"
+    assert response.json()['matched_rows'] == df['count'].between(10, 12).sum()
+    bad = client.post("/filter_rows", files={"file": ("t.csv", csv, "text/csv")}, data={"column": "count", "value": "ten"})
+    assert bad.status_code == 400 and 'numeric' in bad.json()['detail']
+
+def test_filtered_windows_build_each_index_once(monkeypatch):
+    df = make_frame()
+    csv = df.to_csv(index=False).encode()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    built = []
+    original = ColumnIndex.groups
+    def spy(self):
+        if self._groups is None:
+            built.append(self.col.name)
+        return original(self)
+    monkeypatch.setattr(ColumnIndex, 'groups', spy)
+    where = {'or': [{'column': 'count', 'op': 'in', 'values': [1, 2]}, {'column': 'name', 'op': 'eq', 'value': 'east-3'}]}
+    expected = df[mask(where, df)].sort_values('x', kind='stable', na_position='last')
+    for offset in (0, 50):
+        body = client.get("/rows", params={"session_id": session_id, "where": json.dumps(where), "sort": "x",
+                                           "offset": offset, "limit": 50}).json()
+        assert body['positions'] == expected.index[offset:offset + 50].tolist()
+        assert body['total_rows'] == len(expected)
+    where['or'][0]['values'] = [3]
+    client.get("/rows", params={"session_id": session_id, "where": json.dumps(where)})
+    assert sorted(built) == ['count', 'name'], f"Indexes should be reused across filters, built {built}"
+    # A dataset is filtered through its own indexes
+    response = client.post("/filter_rows", data={"dataset_id": dataset_id, "where": json.dumps(where)})
+    assert response.json()['matched_rows'] == mask(where, df).sum()
+    assert client.get("/rows", params={"session_id": session_id, "where": '{"column": "nope", "op": "isnull"}'}).status_code == 400
+
+def test_numeric_categories_with_missing_values_filter_and_sort():
+    col = pd.Series(pd.Categorical([1, 10, 2, None]), name='n')
+    df = col.to_frame()
+    for cond, expected in [({'column': 'n', 'op': 'gt', 'value': '2'}, [1]), ({'column': 'n', 'op': 'isnull'}, [3]),
+                           ({'column': 'n', 'op': 'in', 'values': [1, 2]}, [0, 2])]:
+        np.testing.assert_array_equal(np.flatnonzero(mask(cond, df)), expected)
+        np.testing.assert_array_equal(ColumnIndex(col).rows(cond), expected)
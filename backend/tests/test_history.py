@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+from app import crud
+from app.history import Snapshot, SessionHistory, history_nbytes
+
+def make_session(n=1000):
+    df = pd.DataFrame({
+        'when': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'kind': pd.Categorical(np.where(np.arange(n) % 2, 'a', 'b')),
+        'value': np.where(np.arange(n) % 10 == 0, np.nan, np.arange(n, dtype=float)),
+        'other': np.arange(n, dtype=float),
+    })
+    dataset_id = 'test-' + str(n)
+    crud.datasets[dataset_id] = Snapshot.from_frame(df)
+    return crud.create_dataset_session(dataset_id), df
+
+def test_undo_preserves_dtypes():
+    session_id, df = make_session()
+    crud.apply_transformation(None, session_id, 'impute', ['value'], {'method': 'mean'})
+    crud.apply_transformation(None, session_id, 'impute', ['other'], {'method': 'constant', 'value': 0})
+    crud.undo_last_transformation(None, session_id)
+    state = crud.session_history[session_id].state().to_frame()
+    assert state['when'].dtype == df['when'].dtype, f"Datetime dtype lost: {state['when'].dtype}"
+    assert isinstance(state['kind'].dtype, pd.CategoricalDtype), f"Category dtype lost: {state['kind'].dtype}"
+    assert state['value'].isna().sum() == 0
+
+def test_snapshots_share_unchanged_columns():
+    session_id, df = make_session()
+    history = crud.session_history[session_id]
+    for _ in range(10):
+        history.apply('impute', ['value'], {'method': 'mean'})
+    single = Snapshot.from_frame(df).nbytes()
+    assert history.checkpoints[0].versions['when'] == history.state().versions['when']
+    # Ten edits of one column cost at most ten copies of that column, not of the dataset
+    assert history.nbytes() <= single + 10 * df['value'].nbytes, "Unchanged columns were copied per history entry"
+
+def test_undo_redo_replays_from_checkpoints():
+    df = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': ['x', None, 'y'], 'c': [1, 2, 3]})
+    history = SessionHistory(Snapshot.from_frame(df), checkpoint_every=2)
+    history.apply('impute', ['a'], {'method': 'mean'})
+    history.apply('rename', [], {'rename_map': {'c': 'd'}})
+    history.apply('impute', ['b'], {'method': 'constant', 'value': 'z'})
+    history.apply('scale', ['a'], {'method': 'minmax'})
+    history.apply('drop', ['b'], {})
+    final = history.state().to_frame()
+    for _ in range(5):
+        history.undo()
+    assert history.state().to_frame().equals(df), "Undo to the start did not restore the base data"
+    assert not history.can_undo and history.can_redo
+    for _ in range(5):
+        history.redo()
+    assert history.state().to_frame().equals(final), "Redo did not reproduce the same state"
+    history.undo()
+    assert list(history.state().columns) == ['a', 'b', 'd']
+    assert history.state().to_frame()['b'].tolist() == ['x', 'z', 'y']
+
+def test_history_length_is_bounded():
+    df = pd.DataFrame({'a': np.arange(10, dtype=float)})
+    history = SessionHistory(Snapshot.from_frame(df), checkpoint_every=2, max_checkpoints=2, max_steps=6)
+    for i in range(20):
+        history.apply('impute', ['a'], {'method': 'constant', 'value': i})
+    assert len(history.records) == 6
+    assert len(history.checkpoints) <= 3
+    for _ in range(6):
+        history.undo()
+    assert not history.can_undo
+
+def test_redo_endpoint():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    client = TestClient(app)
+    session_id, _ = make_session(10)
+    response = client.post("/apply_transformation", data={"session_id": session_id, "action": "drop", "columns": '["other"]'})
+    assert response.json()["can_undo"] is True
+    response = client.post("/undo", data={"session_id": session_id})
+    assert response.json()["can_redo"] is True
+    response = client.post("/redo", data={"session_id": session_id})
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    data = response.json()
+    assert "other" not in data["columns"] and data["can_redo"] is False
+
+def test_snapshot_frame_edits_do_not_leak():
+    snapshot = Snapshot.from_frame(pd.DataFrame({'a': [1.0, np.nan]}))
+    df = snapshot.to_frame()
+    df['a'] = df['a'].fillna(5.0)
+    assert snapshot.to_frame()['a'].isna().sum() == 1, "Editing a materialized frame changed the snapshot"
+
+def test_row_local_steps_are_not_materialized():
+    session_id, df = make_session(100)
+    history = crud.session_history[session_id]
+    preview, _, _ = crud.apply_transformation(None, session_id, 'drop', ['other'], {}, rows=3)
+    crud.apply_transformation(None, session_id, 'impute', ['value'], {'method': 'constant', 'value': -1})
+    assert history._current_step == 0, "Row-local steps should stay pending until the full state is needed"
+    assert 'other' not in preview.columns and len(preview) == 3
+    state = history.state().to_frame()
+    assert history._current_step == 2
+    assert (state['value'] == -1).sum() == 10
+
+def test_column_stats_recompute_only_changed_columns(monkeypatch):
+    session_id, _ = make_session(200)
+    profiled = []
+    original = crud.profile_frame
+    def spy(df):
+        profiled.append(list(df.columns))
+        return original(df)
+    monkeypatch.setattr(crud, 'profile_frame', spy)
+    crud.get_column_stats(None, session_id=session_id)
+    crud.apply_transformation(None, session_id, 'impute', ['value'], {'method': 'median'})
+    stats = crud.get_column_stats(None, session_id=session_id)
+    assert profiled[-1] == ['value'], f"Expected only the imputed column to be profiled, got {profiled[-1]}"
+    assert stats['value']['missing_pct'] == 0.0
+    crud.undo_last_transformation(None, session_id)
+    crud.get_column_stats(None, session_id=session_id)
+    crud.redo_transformation(session_id)
+    crud.get_column_stats(None, session_id=session_id)
+    assert len(profiled) == 2, f"Undo/redo should be served from the cache: {profiled}"
+
+def test_undo_rename_with_missing_source_column():
+    df = pd.DataFrame({'a': [1.0, 2.0], 'b': [3.0, 4.0]})
+    history = SessionHistory(Snapshot.from_frame(df))
+    history.apply('rename', [], {'rename_map': {'zzz': 'a', 'b': 'c'}})
+    assert list(history.state().columns) == ['a', 'c']
+    history.undo()
+    assert list(history.state().columns) == ['a', 'b'], "Undo renamed a column the rename never touched"
+    assert history.state().to_frame().equals(df)
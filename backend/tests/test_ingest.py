@@ -0,0 +1,113 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import bz2
+import gzip
+import io
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+from app import ingest
+from app.main import app
+
+client = TestClient(app)
+
+CSV = (
+    "id,when,name,score,flag,empty\n"
+    "1,2024-01-01,alpha,1.5,True,\n"
+    "2,2024-01-02,,2.5,False,\n"
+    "3,2024-01-03,gamma,,True,\n"
+).encode()
+
+def zstd(data):
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, 'zstd') as out:
+        out.write(data)
+    return sink.getvalue().to_pybytes()
+
+def test_engines_agree_with_pandas():
+    expected = pd.read_csv(io.BytesIO(CSV))
+    for engine in ingest.ENGINES:
+        df = ingest.read_csv(io.BytesIO(CSV), engine=engine)
+        pd.testing.assert_frame_equal(df, expected, obj=f"engine={engine}")
+
+def test_compressed_uploads_are_transparent():
+    expected = pd.read_csv(io.BytesIO(CSV))
+    for name, data in [('gz', gzip.compress(CSV)), ('bz2', bz2.compress(CSV)), ('zst', zstd(CSV))]:
+        pd.testing.assert_frame_equal(ingest.read_csv(io.BytesIO(data)), expected, obj=name)
+        chunks = list(ingest.iter_csv(io.BytesIO(data), 2))
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected, obj=f"{name} chunks")
+    response = client.post("/upload", files={"file": ("t.csv.gz", gzip.compress(CSV), "application/gzip")})
+    assert response.status_code == 200, response.text
+    assert response.json()['n_rows'] == 3
+
+def test_delimiter_and_encoding_sniffed():
+    text = "name;city;amount\nJosé;Zürich;1,5\nRenée;Köln;2\n"
+    df = ingest.read_csv(io.BytesIO(text.encode('cp1252')))
+    assert df.columns.tolist() == ['name', 'city', 'amount'], f"Delimiter not sniffed: {df.columns.tolist()}"
+    assert df['city'].tolist() == ['Zürich', 'Köln'], f"Encoding not sniffed: {df['city'].tolist()}"
+    dialect = ingest.sniff(b'\xef\xbb\xbfa\tb\n1\t2\n')
+    assert dialect == ingest.Dialect('\t', 'utf-8-sig')
+
+def test_explicit_dialect_overrides_sniffing():
+    data = b"a|b\n1|2\n"
+    df = ingest.read_csv(io.BytesIO(data), delimiter=',')
+    assert df.columns.tolist() == ['a|b']
+
+def test_throughput_logged(caplog):
+    with caplog.at_level(logging.INFO, logger="dataprepper"):
+        ingest.read_csv(io.BytesIO(gzip.compress(CSV)))
+    assert any('MB/s' in r.message and 'codec=gzip' in r.message for r in caplog.records), "No throughput log line"
+
+def test_compact_frame_is_lossless_and_smaller():
+    n = 10_000
+    df = pd.DataFrame({
+        'small': np.arange(n) % 100,
+        'whole': np.where(np.arange(n) % 9 == 0, np.nan, np.arange(n) % 5000).astype(float),
+        'precise': np.linspace(0, 1, n) / 3,
+        'kind': np.array(['THEFT', 'BATTERY', 'ASSAULT'])[np.arange(n) % 3],
+        'ident': [f"JA{i:06d}" for i in range(n)],
+        'mixed': [1 if i % 2 else 'x' for i in range(n)],
+    })
+    compact = ingest.compact_frame(df)
+    assert compact['small'].dtype == np.int8
+    assert compact['whole'].dtype == np.float64 and compact['precise'].dtype == np.float64, "Floats were narrowed"
+    assert isinstance(compact['kind'].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_string_dtype(compact['ident']) and not isinstance(compact['ident'].dtype, pd.CategoricalDtype)
+    assert compact['mixed'].dtype == object
+    for col in df.columns:
+        assert compact[col].astype(object).equals(df[col].astype(object)) or np.allclose(compact[col], df[col], equal_nan=True), f"{col} changed"
+    shrinkable = ['small', 'kind']
+    before = df[shrinkable].memory_usage(deep=True).sum()
+    after = compact[shrinkable].memory_usage(deep=True).sum()
+    assert after < before / 3, f"Expected at least 3x smaller, got {before} -> {after}"
+
+def test_column_stats_reports_memory():
+    csv = "kind,value\n" + "".join(f"{'ab'[i % 2]},{i % 7}\n" for i in range(1000))
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv.encode(), "text/csv")},
+                             data={"compact": "true"}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "impute", "columns": "kind",
+                                               "params": '{"method": "constant", "value": "c"}'})
+    memory = client.post("/column_stats", data={"session_id": session_id}).json()['memory']
+    assert memory['columns']['kind']['dtype'] == 'category' and memory['columns']['value']['dtype'] == 'int8'
+    assert memory['total_bytes'] == sum(c['bytes'] for c in memory['columns'].values())
+
+@pytest.mark.parametrize('compact', [None, 'true'])
+def test_compaction_does_not_change_results(compact):
+    csv = b"x,k\n1.0,a\n2.0,b\n4.0,c\n,d\n"
+    data = {"compact": compact} if compact else {}
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}, data=data).json()['dataset_id']
+    response = client.post("/impute?rows=4", data={"dataset_id": dataset_id, "method": "mean", "columns": "x"})
+    assert response.json()['data'][3][0] == 7 / 3
+
+def test_quoted_newlines_across_parser_blocks():
+    n = 200_000
+    df = pd.DataFrame({'id': np.arange(n), 'note': [f"line {i}\nmore, text" if i % 7 == 0 else f"n{i}" for i in range(n)]})
+    csv = df.to_csv(index=False).encode()
+    assert len(csv) > 2 * (1 << 20), "Needs more than one pyarrow block"
+    for engine in ingest.ENGINES:
+        pd.testing.assert_frame_equal(ingest.read_csv(io.BytesIO(csv), engine=engine), df, check_dtype=False, obj=f"engine={engine}")
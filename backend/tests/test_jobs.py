@@ -0,0 +1,107 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app import jobs
+from app.main import app
+from app.jobs import submit_job, cancel_job, report
+from app.shared_store import SharedSessionStore
+
+client = TestClient(app)
+
+def make_csv(n=5000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'x': rng.normal(size=n), 'kind': rng.choice(['a', 'b', 'c'], n)})
+    return df.to_csv(index=False).encode()
+
+def wait_for(job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = client.get(f"/jobs/{job_id}").json()
+        if state['status'] in ('done', 'failed', 'cancelled'):
+            return state
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+def test_stats_job_matches_endpoint():
+    csv = make_csv()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    response = client.post("/jobs", data={"kind": "column_stats", "dataset_id": dataset_id})
+    assert response.status_code == 202, response.text
+    state = wait_for(response.json()['job_id'])
+    assert state['status'] == 'done', f"Job did not succeed: {state}"
+    result = client.get(f"/jobs/{state['job_id']}/result").json()
+    direct = client.post("/column_stats", data={"dataset_id": dataset_id}).json()
+    assert result == direct, "Job result differs from the /column_stats response"
+
+def test_job_reports_rows_processed():
+    csv = make_csv()
+    params = json.dumps({"approximate": True})
+    job_id = client.post("/jobs", data={"kind": "column_stats", "params": params},
+                         files={"file": ("t.csv", csv, "text/csv")}).json()['job_id']
+    state = wait_for(job_id)
+    assert state['progress']['phase'] == 'sketch' and state['progress']['processed'] == 5000, f"Unexpected progress: {state['progress']}"
+
+def test_failed_job_reports_error():
+    job_id = client.post("/jobs", data={"kind": "no_such_kind", "dataset_id": "x"}).json()['job_id']
+    state = wait_for(job_id)
+    assert state['status'] == 'failed'
+    assert client.get(f"/jobs/{job_id}/result").status_code == 400
+
+def test_cancel_stops_running_job():
+    started = threading.Event()
+    def work():
+        started.set()
+        for i in range(10_000):
+            report('loop', processed=i)
+            time.sleep(0.001)
+        return 'finished'
+    job = submit_job('test', work)
+    started.wait(5)
+    cancel_job(job.id)
+    state = wait_for(job.id)
+    assert state['status'] == 'cancelled', f"Job not cancelled: {state}"
+    assert client.get(f"/jobs/{job.id}/result").status_code == 409
+
+def test_events_stream_ends_with_final_state():
+    def work():
+        for i in range(5):
+            report('loop', processed=i, total=5)
+            time.sleep(0.02)
+        return 'ok'
+    job = submit_job('test', work)
+    lines = client.get(f"/jobs/{job.id}/events", params={"interval": 0.01}).text.strip().split("\n")
+    assert json.loads(lines[-1])['status'] == 'done', f"Last event: {lines[-1]}"
+    assert client.get(f"/jobs/{job.id}/result").json() == 'ok'
+
+def test_unknown_job_is_404():
+    assert client.get("/jobs/nope").status_code == 404
+
+def test_other_workers_poll_and_cancel_through_shared_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'shared_jobs', SharedSessionStore('jobs', str(tmp_path)))
+    monkeypatch.setattr(jobs, 'SHARED_SYNC_SECONDS', 0.01)
+    started = threading.Event()
+    def work():
+        started.set()
+        for i in range(10_000):
+            report('loop', processed=i)
+            time.sleep(0.001)
+    job = submit_job('test', work)
+    started.wait(5)
+    # Another worker: it only sees the shared records
+    local = jobs.jobs
+    monkeypatch.setattr(jobs, 'jobs', OrderedDict())
+    time.sleep(0.05)
+    state = client.get(f"/jobs/{job.id}").json()
+    assert state['status'] == 'running' and state['progress']['processed'] > 0, f"Unexpected state: {state}"
+    assert client.post(f"/jobs/{job.id}/cancel").status_code == 200
+    state = wait_for(job.id)
+    assert state['status'] == 'cancelled', f"Job not cancelled: {state}"
+    assert local[job.id].status == 'cancelled'
+    assert client.get(f"/jobs/{job.id}/result").status_code == 409
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app import kernels
+from app.chunked import fit_chunked
+from app.main import app
+from app.pipeline import make_pipeline
+from app.transforms import apply_step, fit_step, make_step
+
+client = TestClient(app)
+
+def make_frame(n=5000):
+    rng = np.random.default_rng(11)
+    gaps = np.arange(n) % 13 == 0
+    return pd.DataFrame({
+        'x': np.where(gaps, np.nan, rng.normal(5, 2, n)),
+        'pos': rng.lognormal(1, 0.6, n),
+        'count': pd.array(np.where(gaps[::-1], None, rng.integers(-40, 90, n)), dtype='Int64'),
+        'small': rng.integers(0, 100, n).astype('int8'),
+    })
+
+def scale(df, method, columns=('x', 'pos', 'count', 'small')):
+    step = make_step('scale', list(columns), {'method': method})
+    fit_step(df, step)
+    return apply_step(df.copy(), step)[0], step
+
+@pytest.mark.parametrize('method,scaler', [('minmax', 'MinMaxScaler'), ('standard', 'StandardScaler'),
+                                           ('robust', 'RobustScaler'), ('maxabs', 'MaxAbsScaler')])
+def test_scalers_match_sklearn_with_missing_values(method, scaler):
+    preprocessing = pytest.importorskip('sklearn.preprocessing')
+    df = make_frame()
+    result, _ = scale(df, method)
+    expected = getattr(preprocessing, scaler)().fit_transform(df.to_numpy(dtype='float64', na_value=np.nan))
+    np.testing.assert_allclose(result.to_numpy(dtype='float64'), expected, rtol=1e-9, atol=1e-12)
+    # The int8 column is widened before shifting, not overflowed
+    assert result['small'].dtype == 'float64'
+
+def test_log_and_boxcox():
+    df = make_frame()
+    result, _ = scale(df, 'log', ['x'])
+    expected = np.log1p(df['x'].where(df['x'] > -1))
+    np.testing.assert_allclose(result['x'], expected)
+    result, step = scale(df, 'boxcox', ['pos'])
+    # lognormal data: the maximum-likelihood lambda is close to 0, i.e. a log transform
+    lam = step['fitted']['params']['pos']['lambda']
+    assert abs(lam) <= 0.1
+    expected = np.log(df['pos']) if lam == 0 else (df['pos'] ** lam - 1) / lam
+    np.testing.assert_allclose(result['pos'], expected)
+    with pytest.raises(ValueError, match='positive'):
+        scale(df, 'boxcox', ['x'])
+    with pytest.raises(ValueError, match='Unknown scaling method'):
+        scale(df, 'zscore')
+
+@pytest.mark.parametrize('method', ['minmax', 'standard', 'robust', 'maxabs', 'boxcox'])
+def test_chunked_scaler_fit_matches_in_memory(method):
+    df = make_frame()
+    columns = ['pos'] if method == 'boxcox' else ['x', 'count', 'small']
+    [exact] = make_pipeline([{'action': 'scale', 'columns': columns, 'params': {'method': method}}])
+    [merged] = make_pipeline([{'action': 'scale', 'columns': columns, 'params': {'method': method}}])
+    fit_step(df, exact)
+    fit_chunked(lambda: (df.iloc[i:i + 600] for i in range(0, len(df), 600)), [merged])
+    pd.testing.assert_series_equal(pd.json_normalize(merged['fitted']).iloc[0], pd.json_normalize(exact['fitted']).iloc[0])
+
+def test_impute_kernel_matches_pandas():
+    df = make_frame()
+    fitted = kernels.fit_impute(df, ['x', 'count'], {'method': 'mean'})
+    assert fitted == pytest.approx({'x': df['x'].mean(), 'count': df['count'].mean()})
+    fitted = kernels.fit_impute(df, ['x', 'count'], {'method': 'median'})
+    assert fitted == pytest.approx({'x': df['x'].median(), 'count': df['count'].median()})
+
+def test_scale_endpoint_rejects_unknown_methods():
+    csv = make_frame().to_csv(index=False).encode()
+    response = client.post("/scale", files={"file": ("t.csv", csv, "text/csv")}, data={"method": "robust", "columns": "x"})
+    assert response.status_code == 200, f"Scale failed: {response.text}"
+    response = client.post("/scale", files={"file": ("t.csv", csv, "text/csv")}, data={"method": "zscore", "columns": "x"})
+    assert response.status_code == 400
@@ -0,0 +1,104 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+from app.pipeline import make_pipeline, run_pipeline
+
+client = TestClient(app)
+
+def make_frame(n=3000):
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        'x': np.where(np.arange(n) % 5 == 0, np.nan, rng.normal(10, 3, n)),
+        'y': np.where(np.arange(n) % 9 == 0, np.nan, rng.uniform(0, 1, n)),
+        'kind': rng.choice(['a', 'b', 'c', 'd'], n),
+        'count': rng.integers(0, 100, n),
+        'junk': rng.normal(size=n),
+    })
+
+STEPS = [
+    {'action': 'impute', 'columns': ['x'], 'params': {'method': 'mean'}},
+    {'action': 'impute', 'columns': ['y'], 'params': {'method': 'median'}},
+    {'action': 'encode', 'columns': ['kind'], 'params': {'method': 'onehot'}},
+    {'action': 'scale', 'columns': ['x', 'junk'], 'params': {'method': 'standard'}},
+    {'action': 'rename', 'params': {'rename_map': {'count': 'count'}}},
+    {'action': 'filter', 'columns': ['count'], 'params': {'min_value': 50}},
+    {'action': 'drop', 'columns': ['junk']},
+]
+
+def test_optimized_plan_matches_unoptimized_result():
+    df = make_frame()
+    expected, _ = run_pipeline(df.copy(), make_pipeline(STEPS), optimized=False)
+    result, summary = run_pipeline(df.copy(), make_pipeline(STEPS))
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+    actions = [entry['action'] for entry in summary['plan']]
+    # Drop and filter run first, the two imputations are one fill, the identity rename is gone
+    assert actions == ['drop', 'filter', 'impute', 'encode', 'scale'], f"Unexpected plan: {actions}"
+    assert summary['plan'][2]['steps'] == [0, 1]
+    assert summary['plan'][4]['columns'] == ['x'], "Scaling a column dropped later should be skipped"
+    assert {r['reason'] for r in summary['removed']} == {'no effect'}
+    assert summary['plan'][1]['rows'] == (df['count'] >= 50).sum()
+    assert all(entry['ms'] >= 0 for entry in summary['plan'])
+
+def test_fits_see_rows_before_a_later_filter():
+    df = make_frame()
+    steps = make_pipeline([
+        {'action': 'scale', 'columns': ['count'], 'params': {'method': 'minmax'}},
+        {'action': 'filter', 'columns': ['kind'], 'params': {'value': 'a'}},
+    ])
+    result, summary = run_pipeline(df, steps)
+    assert [entry['action'] for entry in summary['plan']] == ['filter', 'scale']
+    expected = (df['count'] - df['count'].min()) / (df['count'].max() - df['count'].min())
+    pd.testing.assert_series_equal(result['count'], expected[df['kind'] == 'a'], check_names=False)
+
+def test_pipeline_endpoint():
+    df = make_frame()
+    csv = df.to_csv(index=False).encode()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    response = client.post("/pipeline", data={"dataset_id": dataset_id, "steps": json.dumps(STEPS)})
+    assert response.status_code == 200, f"Pipeline failed: {response.text}"
+    body = response.json()
+    assert 'junk' not in body['columns'] and 'kind_a' in body['columns']
+    assert body['n_rows'] == (df['count'] >= 50).sum()
+    assert set(body['timings']) == {'parse_ms', 'fit_ms', 'run_ms', 'total_ms'}
+    bad = client.post("/pipeline", data={"dataset_id": dataset_id,
+                                         "steps": json.dumps([{'action': 'drop', 'columns': ['nope']}])})
+    assert bad.status_code == 400 and 'nope' in bad.json()['detail']
+
+def test_saved_pipeline_replays_fitted_values_on_new_files():
+    train = make_frame()
+    csv = train.to_csv(index=False).encode()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    for action, columns, params in [('impute', 'x', {'method': 'mean'}), ('encode', 'kind', {'method': 'ordinal'}),
+                                    ('scale', 'y', {'method': 'minmax'}), ('drop', 'junk', {})]:
+        client.post("/apply_transformation", data={"session_id": session_id, "action": action, "columns": columns,
+                                                   "params": json.dumps(params)})
+    artifact = client.post("/save_pipeline", data={"session_id": session_id}).json()
+    assert artifact['input_columns'] == ['x', 'kind', 'y', 'junk']
+    assert client.get(f"/pipelines/{artifact['pipeline_id']}").json() == artifact
+    # New data with other statistics and a category the session never saw
+    new = make_frame(1000).iloc[::-1].reset_index(drop=True)
+    new.loc[:9, 'kind'] = 'z'
+    new['y'] = new['y'] * 10
+    body = new.to_csv(index=False).encode()
+    response = client.post("/apply_pipeline", files={"file": ("new.csv", body, "text/csv")},
+                           data={"pipeline_id": artifact['pipeline_id']})
+    assert response.status_code == 200, f"Apply failed: {response.text}"
+    result = pd.read_csv(io.BytesIO(response.content))
+    y_min, y_max = train['y'].min(), train['y'].max()
+    assert np.allclose(result['x'], new['x'].fillna(train['x'].mean()))
+    assert np.allclose(result['y'], (new['y'] - y_min) / (y_max - y_min), equal_nan=True)
+    assert (result['kind'][:10] == -1).all() and 'junk' not in result.columns
+    # The artifact itself can be sent instead of an id; chunk size does not change the output
+    from app import crud
+    parts = crud.apply_pipeline(io.BytesIO(body), artifact=artifact, chunk_rows=100)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(b''.join(parts))), result)
+    missing = client.post("/apply_pipeline", files={"file": ("bad.csv", b"a,b\n1,2\n", "text/csv")},
+                          data={"pipeline": json.dumps(artifact)})
+    assert missing.status_code == 400 and 'missing' in missing.json()['detail']
@@ -5,17 +5,20 @@ import io
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from benchmarks.synthetic import crime_columns, write_csv
 
 client = TestClient(app)
 
-def test_preview_endpoint():
-    # Use a small sample of the real CSV for testing
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path), f"Test CSV not found: {csv_path}"
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    # Same columns as the crime extract these tests were written against
+    return write_csv(str(tmp_path_factory.mktemp('data') / 'crimes.csv'), 2000, crime_columns())
+
+def test_preview_endpoint(csv_path):
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/preview?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")}
+            files={"file": ("crimes.csv", f, "text/csv")}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
     data = response.json()
@@ -25,14 +28,12 @@ def test_preview_endpoint():
     assert isinstance(data["columns"], list), f"Columns is not a list: {data['columns']}"
     assert isinstance(data["data"], list), f"Data is not a list: {data['data']}"
 
-def test_impute_endpoint():
+def test_impute_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/impute?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"method": "mean", "columns": json.dumps(["ID"]), "value": ""}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -41,14 +42,12 @@ def test_impute_endpoint():
     assert "data" in data, f"Response missing data: {data}"
     assert len(data["data"]) <= 3, f"Returned too many rows: {len(data['data'])}"
 
-def test_encode_endpoint():
+def test_encode_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/encode?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"method": "onehot", "columns": json.dumps(["Primary Type"])}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -57,14 +56,12 @@ def test_encode_endpoint():
     assert "data" in data, f"Response missing data: {data}"
     assert len(data["data"]) <= 3, f"Returned too many rows: {len(data['data'])}"
 
-def test_scale_endpoint():
+def test_scale_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/scale?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"method": "minmax", "columns": json.dumps(["ID"])}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -73,14 +70,12 @@ def test_scale_endpoint():
     assert "data" in data, f"Response missing data: {data}"
     assert len(data["data"]) <= 3, f"Returned too many rows: {len(data['data'])}"
 
-def test_drop_columns_endpoint():
+def test_drop_columns_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/drop_columns?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"columns": json.dumps(["ID"])}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -90,9 +85,7 @@ def test_drop_columns_endpoint():
     assert len(data["data"]) <= 3, f"Returned too many rows: {len(data['data'])}"
     assert "ID" not in data["columns"], f"Column 'ID' was not dropped: {data['columns']}"
 
-def test_filter_rows_endpoint():
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
+def test_filter_rows_endpoint(csv_path):
     # Use a value from the first row for a deterministic test
     import pandas as pd
     df = pd.read_csv(csv_path, nrows=1)
@@ -101,7 +94,7 @@ def test_filter_rows_endpoint():
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/filter_rows?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"column": test_col, "value": str(test_val)}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -114,10 +107,8 @@ def test_filter_rows_endpoint():
     for row in data["data"]:
         assert str(row[col_idx]) == str(test_val), f"Row does not match filter: {row}"
 
-def test_rename_columns_endpoint():
+def test_rename_columns_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     # Use the first column and rename it
     import pandas as pd
     df = pd.read_csv(csv_path, nrows=1)
@@ -126,7 +117,7 @@ def test_rename_columns_endpoint():
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/rename_columns?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"rename_map": json.dumps({old_col: new_col})}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -134,10 +125,8 @@ def test_rename_columns_endpoint():
     assert new_col in data["columns"], f"Renamed column not found: {data['columns']}"
     assert old_col not in data["columns"], f"Old column still present: {data['columns']}"
 
-def test_change_dtypes_endpoint():
+def test_change_dtypes_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     import pandas as pd
     df = pd.read_csv(csv_path, nrows=1)
     # Try to convert the first column to string (should always succeed)
@@ -145,7 +134,7 @@ def test_change_dtypes_endpoint():
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/change_dtypes?rows=3",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"dtype_map": json.dumps({col: "str"})}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -156,15 +145,13 @@ def test_change_dtypes_endpoint():
     for row in data["data"]:
         assert isinstance(row[col_idx], str) or row[col_idx] is None, f"Value is not string: {row[col_idx]}"
 
-def test_drop_duplicates_endpoint():
+def test_drop_duplicates_endpoint(csv_path):
     import json
-    csv_path = os.path.join(os.path.dirname(__file__), '../../chicago_crime_data.csv')
-    assert os.path.exists(csv_path)
     # No subset: drop all duplicate rows
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/drop_duplicates?rows=10",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"subset": ""}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -178,7 +165,7 @@ def test_drop_duplicates_endpoint():
     with open(csv_path, 'rb') as f:
         response = client.post(
             "/drop_duplicates?rows=10",
-            files={"file": ("chicago_crime_data.csv", f, "text/csv")},
+            files={"file": ("crimes.csv", f, "text/csv")},
             data={"subset": json.dumps([col])}
         )
     assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+from app.profiling import profile_frame
+
+def test_numeric_profile_matches_pandas():
+    rng = np.random.default_rng(0)
+    values = np.where(rng.random(500) < 0.2, np.nan, rng.normal(10, 2, 500))
+    df = pd.DataFrame({'x': values, 'k': rng.integers(0, 7, 500)})
+    stats = profile_frame(df)
+    x = df['x']
+    assert stats['x']['count'] == x.count()
+    assert np.isclose(stats['x']['mean'], x.mean())
+    assert np.isclose(stats['x']['median'], x.median())
+    assert np.isclose(stats['x']['std'], x.std())
+    assert stats['x']['unique'] == x.nunique()
+    counts, edges = np.histogram(x.dropna(), bins=20)
+    assert stats['x']['histogram']['counts'] == counts.tolist()
+    assert np.allclose(stats['x']['histogram']['bin_edges'], edges)
+    assert stats['k']['data_issues']['constant'] == df['k'].value_counts().iloc[0] / 500
+
+def test_categorical_profile_and_recommendations():
+    df = pd.DataFrame({'c': ['b', 'a', 'a', 'b', None, None, None, None, None, None, None]})
+    stats = profile_frame(df)['c']
+    assert stats['top'] == 'a' and stats['freq'] == 2, f"Tie should resolve like mode(): {stats}"
+    assert stats['unique'] == 2
+    assert stats['value_counts'][0]['count'] == 7
+    assert 'Consider dropping this column due to excessive missing data.' in stats['recommendations']
+
+def test_empty_and_all_missing_columns():
+    stats = profile_frame(pd.DataFrame({'a': [np.nan, np.nan], 'b': [1.0, 1.0]}))
+    assert stats['a']['mean'] is None and stats['a']['histogram'] == {'bin_edges': [], 'counts': []}
+    assert stats['b']['std'] == 0.0 and stats['b']['data_issues']['outlier'] == 0.0
+    assert profile_frame(pd.DataFrame({'a': pd.Series([], dtype=float)}))['a']['count'] == 0
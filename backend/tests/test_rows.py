@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app import crud
+from app.history import Snapshot
+from app.main import app
+
+client = TestClient(app)
+
+def make_session(n=20000):
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        'x': np.where(np.arange(n) % 10 == 0, np.nan, rng.normal(size=n)),
+        'kind': rng.choice(['b', 'a', 'c'], n),
+        'id': np.arange(n),
+    })
+    csv = df.to_csv(index=False).encode()
+    dataset_id = client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}).json()['dataset_id']
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    return session_id, df
+
+def test_windows_follow_offset_and_limit():
+    session_id, df = make_session()
+    body = client.get("/rows", params={"session_id": session_id, "offset": 15000, "limit": 50}).json()
+    assert body['total_rows'] == len(df) and body['positions'] == list(range(15000, 15050))
+    assert [row[2] for row in body['data']] == list(range(15000, 15050))
+    assert client.get("/rows", params={"session_id": session_id, "limit": 10 ** 6}).status_code == 400
+
+def test_sorted_windows_reuse_the_permutation(monkeypatch):
+    session_id, df = make_session()
+    calls = []
+    original = Snapshot.sort_order
+    def spy(self, column, descending=False):
+        calls.append(column)
+        return original(self, column, descending)
+    monkeypatch.setattr(Snapshot, 'sort_order', spy)
+    expected = df.sort_values('x', ascending=False, kind='stable', na_position='last')
+    for offset in (0, 100, 19990):
+        body = client.get("/rows", params={"session_id": session_id, "offset": offset, "limit": 100,
+                                           "sort": "x", "descending": True}).json()
+        assert body['positions'] == expected.index[offset:offset + 100].tolist()
+    assert calls == ['x'], f"Scrolling should reuse the sort permutation, sorted {calls}"
+    assert body['data'][-1][0] is None, "Missing values sort last"
+    # A step on another column keeps the permutation; a step on the sort column invalidates it
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "encode", "columns": "kind",
+                                               "params": '{"method": "ordinal"}'})
+    client.get("/rows", params={"session_id": session_id, "sort": "x", "descending": True})
+    client.post("/apply_transformation", data={"session_id": session_id, "action": "impute", "columns": "x",
+                                               "params": '{"method": "constant", "value": 0}'})
+    body = client.get("/rows", params={"session_id": session_id, "sort": "x", "descending": True, "limit": 5}).json()
+    assert calls == ['x', 'x'] and body['data'][0][0] == df['x'].max()
+
+def test_categorical_columns_sort_by_value():
+    session_id, _ = make_session(300)
+    window, _, _ = crud.session_rows(session_id, 0, 300, sort='kind')
+    assert window['kind'].astype(str).tolist() == sorted(window['kind'].astype(str))
+
+def test_numeric_categories_with_missing_values_sort_by_value():
+    snapshot = Snapshot.from_frame(pd.DataFrame({'n': pd.Categorical([1, 10, 2, None])}))
+    assert snapshot.sort_order('n').tolist() == [0, 2, 1, 3]
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from fastapi.testclient import TestClient
+from app.main import app
+from app.serialize import ARROW_MEDIA_TYPE, ARROW_METADATA_KEY, payload
+
+client = TestClient(app)
+
+def make_frame(n=50):
+    return pd.DataFrame({
+        'x': np.where(np.arange(n) % 3 == 0, np.nan, np.arange(n) / 2),
+        'y': np.where(np.arange(n) % 4 == 0, np.inf, -np.arange(n, dtype=float)),
+        'n': np.arange(n),
+        'kind': pd.Series(np.where(np.arange(n) % 5 == 0, None, 'k'), dtype='str'),
+    })
+
+def upload(df):
+    csv = df.to_csv(index=False).encode()
+    return client.post("/upload", files={"file": ("t.csv", csv, "text/csv")}, data={"compact": "false"}).json()['dataset_id']
+
+def test_payload_layouts_are_json_safe():
+    df = make_frame(8)
+    rows = payload(df)
+    assert rows['data'][0] == [None, None, 0, None] and rows['data'][1] == [0.5, -1.0, 1, 'k']
+    columns = payload(df, 'columns', sample=None)
+    assert columns['layout'] == 'columns' and columns['data'][2] == list(range(8))
+    assert isinstance(columns['data'][2][0], int), "numpy scalars should become Python values"
+    json.dumps(rows, allow_nan=False)
+
+def test_preview_negotiates_columnar_json_and_arrow():
+    df = make_frame()
+    dataset_id = upload(df)
+    rows = client.post("/preview", data={"dataset_id": dataset_id}, params={"rows": 20}).json()
+    columnar = client.post("/preview", data={"dataset_id": dataset_id}, params={"rows": 20, "layout": "columns"}).json()
+    assert [list(r) for r in zip(*columnar['data'])] == rows['data']
+    response = client.post("/preview", data={"dataset_id": dataset_id}, params={"rows": 20},
+                           headers={"Accept": ARROW_MEDIA_TYPE})
+    assert response.headers['content-type'] == ARROW_MEDIA_TYPE
+    table = ipc.open_stream(pa.BufferReader(response.content)).read_all()
+    pd.testing.assert_frame_equal(table.to_pandas(), df.head(20), check_dtype=False)
+    assert json.loads(table.schema.metadata[ARROW_METADATA_KEY]) == {'sample': None}
+
+def test_session_responses_carry_extra_fields_in_every_format():
+    dataset_id = upload(make_frame())
+    session_id = client.post("/create_session", data={"dataset_id": dataset_id}).json()['session_id']
+    form = {"session_id": session_id, "action": "impute", "columns": "x", "params": '{"method": "mean"}'}
+    body = client.post("/apply_transformation", data=form, params={"layout": "columns"}).json()
+    assert body['can_undo'] is True and None not in body['data'][0]
+    response = client.post("/undo", data={"session_id": session_id}, headers={"Accept": ARROW_MEDIA_TYPE})
+    table = ipc.open_stream(pa.BufferReader(response.content)).read_all()
+    extra = json.loads(table.schema.metadata[ARROW_METADATA_KEY])
+    assert extra['can_undo'] is False and extra['can_redo'] is True
+    assert table.column('x').to_pandas().isna().any(), "Undo should bring the missing values back"
+
+def test_object_columns_of_a_registered_dataset_serialize():
+    # A flag with gaps stays an object column, which to_numpy hands back as a read-only view
+    df = pd.DataFrame({'flag': [True, None, False] * 10, 'n': range(30)})
+    dataset_id = upload(df)
+    response = client.post("/preview?rows=4", data={"dataset_id": dataset_id})
+    assert response.status_code == 200, f"Preview failed: {response.text}"
+    assert [row[0] for row in response.json()['data']] == [True, None, False, True]
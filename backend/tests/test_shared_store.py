@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import multiprocessing
+import time
+import numpy as np
+import pandas as pd
+from app.history import Snapshot, SessionHistory
+from app.shared_store import SharedSessionStore
+
+def make_frame(n=1000):
+    return pd.DataFrame({
+        'value': np.where(np.arange(n) % 10 == 0, np.nan, np.arange(n, dtype=float)),
+        'kind': pd.Categorical(np.where(np.arange(n) % 2, 'a', 'b')),
+        'name': [f"row{i}" for i in range(n)],
+        'mixed': [1 if i % 2 else 'x' for i in range(n)],
+    })
+
+def test_workers_see_each_others_sessions(tmp_path):
+    # Two store instances on one directory behave like two uvicorn workers
+    worker_a = SharedSessionStore('session', str(tmp_path))
+    worker_b = SharedSessionStore('session', str(tmp_path))
+    df = make_frame()
+    worker_a['s'] = SessionHistory(Snapshot.from_frame(df))
+    history = worker_b['s']
+    history.apply('impute', ['value'], {'method': 'mean'})
+    worker_b.refresh('s')
+    state = worker_a['s'].state().to_frame()
+    assert state['value'].isna().sum() == 0, "Worker A did not see worker B's step"
+    assert isinstance(state['kind'].dtype, pd.CategoricalDtype), f"Category dtype lost: {state['kind'].dtype}"
+    assert state['mixed'].tolist() == df['mixed'].tolist(), "Mixed-type column changed on the round trip"
+    worker_a['s'].undo()
+    worker_a.refresh('s')
+    assert worker_b['s'].state().to_frame().equals(df), "Undo on worker A not visible to worker B"
+
+def test_shared_columns_stored_once(tmp_path):
+    store = SharedSessionStore('dataset', str(tmp_path))
+    sessions = SharedSessionStore('session', str(tmp_path))
+    base = Snapshot.from_frame(make_frame())
+    store['d'] = base
+    sessions['s'] = SessionHistory(base)
+    files = os.listdir(tmp_path / 'columns')
+    assert len(files) == len(base.columns), f"Expected one file per column version, got {files}"
+    loaded = SharedSessionStore('dataset', str(tmp_path))['d']
+    assert not loaded.data['value'].to_numpy().flags.writeable, "Numeric column was copied instead of memory-mapped"
+    del store['d']
+    assert len(os.listdir(tmp_path / 'columns')) == len(base.columns), "Column still used by a session was deleted"
+    del sessions['s']
+    assert not os.listdir(tmp_path / 'columns'), "Unreferenced column files left on disk"
+
+def test_sparse_indicator_columns_round_trip(tmp_path):
+    worker_a = SharedSessionStore('session', str(tmp_path))
+    worker_b = SharedSessionStore('session', str(tmp_path))
+    df = make_frame()
+    worker_a['s'] = SessionHistory(Snapshot.from_frame(df))
+    history = worker_a['s']
+    history.apply('encode', ['kind'], {'method': 'onehot'})
+    history.state()
+    worker_a.refresh('s')
+    state = worker_b['s'].state().to_frame()
+    assert isinstance(state['kind_a'].dtype, pd.SparseDtype), f"Indicator stored densely: {state['kind_a'].dtype}"
+    assert state['kind_a'].sparse.to_dense().tolist() == (df['kind'] == 'a').tolist()
+
+def _apply_steps(root, worker, steps):
+    store = SharedSessionStore('session', root)
+    for i in range(steps):
+        with store.pinned('s'):
+            history = store['s']
+            time.sleep(0.01)  # widen the window between reading and writing the revision
+            history.apply('impute', ['value'], {'method': 'constant', 'value': worker * 100 + i})
+            store.refresh('s')
+
+def test_workers_never_lose_concurrent_steps(tmp_path):
+    store = SharedSessionStore('session', str(tmp_path))
+    store['s'] = SessionHistory(Snapshot.from_frame(make_frame(50)))
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_apply_steps, args=(str(tmp_path), w, 5)) for w in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert len(store['s'].records) == 10, "A step applied by one worker overwrote the other's"
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+from app.sketches import HyperLogLog, QuantileSketch, FrequentItems, approximate_stats, frame_chunks
+
+client = TestClient(app)
+
+def test_hyperloglog_within_error_bound_and_mergeable():
+    values = np.arange(200_000)
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(pd.util.hash_array(values[:120_000]))
+    b.update(pd.util.hash_array(values[80_000:]))
+    estimate = a.merge(b).estimate()
+    assert abs(estimate - 200_000) / 200_000 < 4 * a.relative_error, f"Estimate off: {estimate}"
+
+def test_quantile_sketch_rank_error():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=100_000)
+    parts = [QuantileSketch(seed=i) for i in range(4)]
+    for part, chunk in zip(parts, np.array_split(values, 4)):
+        part.update(chunk)
+    sketch = parts[0]
+    for part in parts[1:]:
+        sketch.merge(part)
+    for q in (0.1, 0.5, 0.9):
+        true_rank = (values < sketch.quantile(q)).mean()
+        assert abs(true_rank - q) < 2 * sketch.rank_error, f"q={q} rank={true_rank}"
+
+def test_frequent_items_error_bound():
+    values = pd.Series(np.concatenate([np.repeat(['hot'], 5000), np.arange(20_000).astype(str)]))
+    summary = FrequentItems(capacity=16)
+    shuffled = values.sample(frac=1, random_state=0)
+    for start in range(0, len(shuffled), 3000):
+        summary.update(shuffled.iloc[start:start + 3000])
+    key, count = summary.top(1)[0]
+    assert key == 'hot' and 5000 - summary.error <= count <= 5000
+
+def test_approximate_stats_shape_and_bounds():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({'x': rng.normal(size=20_000), 'c': rng.choice(['a', 'b'], 20_000)})
+    stats = approximate_stats(frame_chunks(df, 3000))
+    assert stats['x']['approximate'] is True
+    assert 'quantile_rank_error' in stats['x']['error_bounds']
+    assert stats['x']['count'] == 20_000 and np.isclose(stats['x']['mean'], df['x'].mean())
+    assert sum(stats['x']['histogram']['counts']) == 20_000
+    assert stats['c']['unique'] == 2 and stats['c']['top'] == df['c'].value_counts().index[0]
+
+def test_column_stats_endpoint_approximate():
+    csv = "a,b\n" + "\n".join(f"{i},{'x' if i % 3 else 'y'}" for i in range(1000))
+    response = client.post(
+        "/column_stats",
+        files={"file": ("data.csv", io.BytesIO(csv.encode()), "text/csv")},
+        data={"approximate": "true"}
+    )
+    assert response.status_code == 200, f"Status code: {response.status_code}, Response: {response.text}"
+    stats = response.json()["stats"]
+    assert stats["a"]["approximate"] and stats["a"]["min"] == 0 and stats["a"]["max"] == 999
+    assert "unique_relative_error" in stats["b"]["error_bounds"]
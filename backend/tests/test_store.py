@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import numpy as np
+import pandas as pd
+from app.history import Snapshot, SessionHistory
+from app.store import MemoryBudget, SessionStore
+
+def make_snapshot(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return Snapshot.from_frame(pd.DataFrame({'a': rng.random(n), 'b': rng.integers(0, 100, n)}))
+
+def test_lru_entry_spills_and_pages_back(tmp_path):
+    one = make_snapshot().nbytes()
+    budget = MemoryBudget(limit_bytes=int(one * 2.5))
+    store = SessionStore('test', budget, str(tmp_path))
+    store['x'] = make_snapshot(seed=1)
+    store['y'] = make_snapshot(seed=2)
+    store['x']  # x is now more recently used than y
+    store['z'] = make_snapshot(seed=3)
+    assert 'y' in store._spilled, f"Expected least recently used entry to spill, spilled: {list(store._spilled)}"
+    assert budget.used() <= budget.limit_bytes, f"Budget exceeded: {budget.used()} > {budget.limit_bytes}"
+    paged = store['y'].to_frame()
+    assert paged.equals(make_snapshot(seed=2).to_frame()), "Spilled entry changed on the round trip"
+    assert 'y' not in store._spilled and len(store) == 3
+
+def test_shared_columns_counted_once(tmp_path):
+    budget = MemoryBudget(limit_bytes=10 ** 9)
+    datasets = SessionStore('dataset', budget, str(tmp_path))
+    sessions = SessionStore('session', budget, str(tmp_path))
+    base = make_snapshot()
+    datasets['d'] = base
+    sessions['s'] = SessionHistory(base)
+    assert budget.used() == base.nbytes(), f"Shared columns double counted: {budget.used()} vs {base.nbytes()}"
+    sessions['s'].apply('scale', ['a'], {'method': 'minmax'})
+    sessions['s'].state()
+    sessions.refresh('s')
+    assert budget.used() == base.nbytes() + base.data['a'].nbytes
+
+def test_idle_entries_expire(tmp_path):
+    expired = []
+    budget = MemoryBudget(limit_bytes=10 ** 9)
+    store = SessionStore('test', budget, str(tmp_path), ttl=0.05, on_expire=expired.append)
+    store['old'] = make_snapshot(100)
+    store.spill('old')
+    time.sleep(0.1)
+    store['new'] = make_snapshot(100)
+    assert 'old' not in store and 'new' in store, f"Unexpected keys: {list(store)}"
+    assert expired == ['old']
+    assert not os.listdir(tmp_path), "Expired spill file left on disk"
+
+def test_paged_in_entries_share_columns(tmp_path):
+    budget = MemoryBudget(limit_bytes=10 ** 9)
+    datasets = SessionStore('dataset', budget, str(tmp_path))
+    sessions = SessionStore('session', budget, str(tmp_path))
+    datasets['d'] = make_snapshot()
+    for key in 'abc':
+        sessions[key] = SessionHistory(datasets['d'])
+    datasets.spill('d')
+    for key in 'abc':
+        sessions.spill(key)
+    column = datasets['d'].data['a'].to_numpy()
+    for key in 'abc':
+        assert np.shares_memory(sessions[key].state().data['a'].to_numpy(), column), f"Session {key} paged in a copy"
+    assert budget.used() == make_snapshot().nbytes()
+
+def test_entries_sharing_every_column_are_not_spilled(tmp_path):
+    one = make_snapshot().nbytes()
+    budget = MemoryBudget(limit_bytes=10 ** 9)
+    datasets = SessionStore('dataset', budget, str(tmp_path))
+    sessions = SessionStore('session', budget, str(tmp_path))
+    datasets['d'] = make_snapshot()
+    sessions['s'] = SessionHistory(datasets['d'])
+    budget.limit_bytes = one // 2
+    sessions.refresh('s')
+    # Spilling the dataset frees nothing while the session holds its columns
+    assert 'd' in datasets._memory and not datasets._spilled
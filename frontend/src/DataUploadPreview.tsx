@@ -21,9 +21,11 @@ const DataUploadPreview: React.FC = () => {
   const [selectedColumns, setSelectedColumns] = useState<string[]>([]);
   const [action, setAction] = useState<string>('');
   const [sessionId, setSessionId] = useState<string | null>(null);
+  const [datasetId, setDatasetId] = useState<string | null>(null);
   const [imputeMethod, setImputeMethod] = useState<string>('mean');
   const [imputeConstant, setImputeConstant] = useState<string>('');
   const [canUndo, setCanUndo] = useState(false);
+  const [canRedo, setCanRedo] = useState(false);
   const [undoCount, setUndoCount] = useState<number>(0);
   const [colStats, setColStats] = useState<any>({});
   const [statsColumns, setStatsColumns] = useState<string[]>([]);
@@ -60,10 +62,21 @@ const DataUploadPreview: React.FC = () => {
       setRows([]);
       setError(null);
       setSessionId(null);
-      // Create a session for this file
-      const formData = new FormData();
-      formData.append('file', newFile);
+      setDatasetId(null);
+      // Upload the file once; every later request references it by dataset_id
+      const uploadData = new FormData();
+      uploadData.append('file', newFile);
       try {
+        const uploadResponse = await fetch('http://127.0.0.1:8000/upload', {
+          method: 'POST',
+          body: uploadData,
+        });
+        if (!uploadResponse.ok) throw new Error(await uploadResponse.text());
+        const uploaded = await uploadResponse.json();
+        setDatasetId(uploaded.dataset_id);
+        // Create a session for this dataset
+        const formData = new FormData();
+        formData.append('dataset_id', uploaded.dataset_id);
         const response = await fetch('http://127.0.0.1:8000/create_session', {
           method: 'POST',
           body: formData,
@@ -72,6 +85,7 @@ const DataUploadPreview: React.FC = () => {
         const data = await response.json();
         setSessionId(data.session_id);
         setCanUndo(false);
+        setCanRedo(false);
       } catch (err: any) {
         setError('Failed to create session: ' + (err.message || err));
       }
@@ -79,11 +93,11 @@ const DataUploadPreview: React.FC = () => {
   };
 
   const handleUpload = async () => {
-    if (!file) return;
+    if (!file || !datasetId) return;
     setLoading(true);
     setError(null);
     const formData = new FormData();
-    formData.append('file', file);
+    formData.append('dataset_id', datasetId);
     formData.append('rows', '10');
     try {
       const response = await fetch(API_URL + '?rows=10', {
@@ -123,7 +137,6 @@ const DataUploadPreview: React.FC = () => {
     setLoading(true);
     setError(null);
     const formData = new FormData();
-    formData.append('file', file);
     formData.append('session_id', sessionId);
     formData.append('action', action);
     formData.append('columns', JSON.stringify(selectedColumns));
@@ -158,6 +171,7 @@ const DataUploadPreview: React.FC = () => {
       setColumns(gridCols);
       setRows(gridRows);
       setCanUndo(true);
+      setCanRedo(false);
       setUndoCount(undoCount + 1);
       setSelectedColumns([]); // Reset column selection after action
     } catch (err: any) {
@@ -172,7 +186,6 @@ const DataUploadPreview: React.FC = () => {
     setLoading(true);
     setError(null);
     const formData = new FormData();
-    formData.append('file', file);
     formData.append('session_id', sessionId);
     try {
       const response = await fetch('http://127.0.0.1:8000/undo?rows=10', {
@@ -197,6 +210,7 @@ const DataUploadPreview: React.FC = () => {
       setRows(gridRows);
       setUndoCount(undoCount - 1);
       setCanUndo(!!data.can_undo);
+      setCanRedo(!!data.can_redo);
       await fetchColumnStats(file, false); // preserve customizations
     } catch (err: any) {
       setError(err.message || 'Undo failed');
@@ -206,8 +220,52 @@ const DataUploadPreview: React.FC = () => {
     }
   };
 
+  const handleRedo = async () => {
+    if (!sessionId) return;
+    setLoading(true);
+    setError(null);
+    const formData = new FormData();
+    formData.append('session_id', sessionId);
+    try {
+      const response = await fetch('http://127.0.0.1:8000/redo?rows=10', {
+        method: 'POST',
+        body: formData,
+      });
+      if (!response.ok) throw new Error(await response.text());
+      const data = await response.json();
+      const gridCols = data.columns.map((col: string, idx: number) => ({
+        field: col,
+        headerName: col,
+        width: 150,
+      }));
+      const gridRows = data.data.map((row: any[], idx: number) => {
+        const rowObj: any = { id: idx };
+        data.columns.forEach((col: string, i: number) => {
+          rowObj[col] = row[i];
+        });
+        return rowObj;
+      });
+      setColumns(gridCols);
+      setRows(gridRows);
+      setUndoCount(undoCount + 1);
+      setCanUndo(!!data.can_undo);
+      setCanRedo(!!data.can_redo);
+      await fetchColumnStats(file, false); // preserve customizations
+    } catch (err: any) {
+      setError(err.message || 'Redo failed');
+      setCanRedo(false);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   // Export current data as CSV
   const handleExportCSV = () => {
+    if (sessionId) {
+      // The backend streams the full processed data, not just the preview rows
+      window.open(`http://127.0.0.1:8000/export?session_id=${encodeURIComponent(sessionId)}&format=csv`);
+      return;
+    }
     if (columns.length === 0 || rows.length === 0) return;
     const csvRows = [];
     // Header
@@ -225,7 +283,11 @@ const DataUploadPreview: React.FC = () => {
   const fetchColumnStats = async (fileObj: File | null, resetOnMissing = false) => {
     if (!fileObj) return;
     const formData = new FormData();
-    formData.append('file', fileObj);
+    if (datasetId) {
+      formData.append('dataset_id', datasetId);
+    } else {
+      formData.append('file', fileObj);
+    }
     if (sessionId) {
       formData.append('session_id', sessionId);
     }
@@ -639,7 +701,6 @@ const DataUploadPreview: React.FC = () => {
     setLoading(true);
     setError(null);
     const formData = new FormData();
-    formData.append('file', file);
     formData.append('session_id', sessionId);
     formData.append('action', action);
     formData.append('columns', JSON.stringify(columns));
@@ -668,6 +729,7 @@ const DataUploadPreview: React.FC = () => {
       setColumns(gridCols);
       setRows(gridRows);
       setCanUndo(true);
+      setCanRedo(false);
       setUndoCount(undoCount + 1);
       // Mark this recommendation as dismissed
       setDismissedRecs(prev => {
@@ -826,6 +888,17 @@ const DataUploadPreview: React.FC = () => {
               Undo
             </Button>
           </FormControl>
+          <FormControl>
+            <Button
+              variant="outlined"
+              color="secondary"
+              sx={{ ml: 2 }}
+              onClick={handleRedo}
+              disabled={loading || !sessionId || !canRedo}
+            >
+              Redo
+            </Button>
+          </FormControl>
           <FormControl>
             <Button
               variant="outlined"